@@ -1,10 +1,273 @@
+from datetime import datetime, timedelta
+
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ChangeList
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth import get_user_model
-from .models import HydroponicSystem, Measurement
+from django.core.cache import cache
+from django.db.models import Max, Min, OuterRef, Subquery
+from django.utils.timezone import make_aware
+from .authentication import revoke_keys
+from .models import AlertEvent, AlertRule, DeviceKey, HydroponicSystem, Measurement, SystemLatestState
+from .pagination import LAST_CURSOR, EstimatedCountPaginator, InvalidCursor, decode_cursor, paginate
 
 User = get_user_model()
 
+# Parametr adresu z kursorem strony listy pomiarów
+CURSOR_VAR = 'cursor'
+# Mnożnik zakresu czasu, gdy strona pomiarów nie mieści się w bieżącym zakresie
+WINDOW_GROWTH = 8
+TIME_BOUNDS_CACHE_KEY = 'admin-measurement-time-bounds'
+
+
+def measurement_time_bounds():
+    """
+    Zwraca krotkę (najstarszy, najnowszy) czas pomiaru w bazie albo None, gdy nie ma pomiarów.
+    Najstarszy pomiar każdego systemu to jeden odczyt indeksu (system, timestamp), najnowszy pochodzi
+    z SystemLatestState – bez skanowania tabeli pomiarów. Wynik jest przechowywany w pamięci podręcznej.
+    """
+    bounds = cache.get(TIME_BOUNDS_CACHE_KEY)
+    if bounds is None:
+        first = Measurement.objects.filter(hydroponic_system=OuterRef('pk')).order_by('timestamp').values('timestamp')[:1]
+        first = HydroponicSystem.all_objects.aggregate(first=Min(Subquery(first)))['first']
+        last = SystemLatestState.objects.aggregate(last=Max('timestamp'))['last']
+        bounds = (first, max(last or first, first)) if first is not None else ()
+        cache.set(TIME_BOUNDS_CACHE_KEY, bounds, settings.ADMIN_TIME_BOUNDS_CACHE_TTL)
+    return bounds or None
+
+
+class InputFilter(admin.SimpleListFilter):
+    """
+    Filtr z polem tekstowym zamiast listy wszystkich wartości – przy tysiącach systemów czy użytkowników
+    pełna lista w panelu bocznym byłaby wczytywana przy każdym otwarciu listy.
+    """
+    template = 'admin/api/input_filter.html'
+    placeholder = ''
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def choices(self, changelist):
+        # Pozostałe parametry listy (filtry, wyszukiwanie, sortowanie) przekazywane są w ukrytych polach formularza
+        hidden = [
+            (name, value)
+            for name, values in changelist.filter_params.items()
+            if name not in (self.parameter_name, CURSOR_VAR)
+            for value in values
+        ]
+        yield {
+            'selected': self.value() is None,
+            'query_string': changelist.get_query_string(remove=[self.parameter_name, CURSOR_VAR]),
+            'display': 'Wszystkie',
+            'hidden': hidden,
+            'value': self.value() or '',
+        }
+
+
+class SystemFilter(InputFilter):
+    """Filtr pomiarów po identyfikatorze albo nazwie systemu."""
+    title = 'system'
+    parameter_name = 'system'
+    placeholder = 'ID lub nazwa systemu'
+
+    def queryset(self, request, queryset):
+        value = (self.value() or '').strip()
+        if not value:
+            return queryset
+        if value.isdigit():
+            return queryset.filter(hydroponic_system_id=int(value))
+        # Identyfikatory z małej tabeli systemów – zapytanie o pomiary używa indeksu (system, timestamp)
+        system_ids = list(HydroponicSystem.all_objects.filter(name__iexact=value).values_list('id', flat=True))
+        return queryset.filter(hydroponic_system_id__in=system_ids)
+
+
+class OwnerFilter(InputFilter):
+    """Filtr systemów po identyfikatorze albo nazwie właściciela."""
+    title = 'właściciel'
+    parameter_name = 'owner'
+    placeholder = 'ID lub nazwa użytkownika'
+
+    def queryset(self, request, queryset):
+        value = (self.value() or '').strip()
+        if not value:
+            return queryset
+        if value.isdigit():
+            return queryset.filter(owner_id=int(value))
+        return queryset.filter(owner__username=value)
+
+
+def _format_period(parts):
+    return '-'.join(f"{part:02d}" for part in parts)
+
+
+class PeriodFilter(admin.SimpleListFilter):
+    """
+    Zawężanie pomiarów do roku, miesiąca i dnia (jak date_hierarchy). Lista lat wynika z zakresu czasu
+    pomiarów (measurement_time_bounds), a miesiące i dni z kalendarza – bez zapytań DISTINCT po tabeli pomiarów.
+    Wybrany okres to warunek na zakres `timestamp` (indeks BRIN, partycje, indeks (system, timestamp)).
+    """
+    title = 'okres pomiaru'
+    parameter_name = 'period'
+
+    @staticmethod
+    def _parse(value):
+        """
+        Zamienia wartość "RRRR", "RRRR-MM" albo "RRRR-MM-DD" na listę liczb; rzuca ValueError dla innych.
+        """
+        parts = [int(part) for part in value.split('-')]
+        if not 1 <= len(parts) <= 3:
+            raise ValueError(value)
+        datetime(*parts, *[1] * (3 - len(parts)))  # Sprawdza poprawność daty
+        return parts
+
+    @staticmethod
+    def _range(parts):
+        year, month, day = [*parts, 1, 1][:3]
+        start = datetime(year, month, day)
+        if len(parts) == 3:
+            end = start + timedelta(days=1)
+        elif len(parts) == 2:
+            end = datetime(year + month // 12, month % 12 + 1, 1)
+        else:
+            end = datetime(year + 1, 1, 1)
+        return make_aware(start), make_aware(end)
+
+    def lookups(self, request, model_admin):
+        bounds = measurement_time_bounds()
+        if bounds is None:
+            return ()
+        first, last = bounds
+        try:
+            parts = self._parse(self.value()) if self.value() else []
+        except ValueError:
+            return ()
+
+        if not parts:
+            return [(str(year), str(year)) for year in range(last.year, first.year - 1, -1)]
+        # Powrót do okresu nadrzędnego (miesiąca albo roku)
+        parent = [(_format_period(parts[:-1]), f"‹ {_format_period(parts[:-1])}")] if len(parts) > 1 else []
+        if len(parts) == 3:
+            return [*parent, (self.value(), _format_period(parts))]
+        if len(parts) == 1:
+            children = [[*parts, month] for month in range(12, 0, -1)]
+        else:
+            start, end = self._range(parts)
+            children = [[*parts, day] for day in range((end - start).days, 0, -1)]
+        # Tylko okresy, w których mogą być pomiary
+        return [*parent, *(
+            (_format_period(child), _format_period(child))
+            for child in children
+            if self._range(child)[0] <= last and self._range(child)[1] > first
+        )]
+
+    def has_output(self):
+        return bool(self.value()) or super().has_output()  # Wybrany okres jest stosowany także bez listy okresów
+
+    def selected_range(self):
+        """
+        Zakres czasu [początek, koniec) wybranego okresu albo None.
+        """
+        if not self.value():
+            return None
+        try:
+            return self._range(self._parse(self.value()))
+        except ValueError:
+            raise IncorrectLookupParameters(self.value())
+
+    def queryset(self, request, queryset):
+        selected = self.selected_range()
+        if selected is None:
+            return queryset
+        start, end = selected
+        return queryset.filter(timestamp__gte=start, timestamp__lt=end)
+
+
+class KeysetChangeList(ChangeList):
+    """
+    Lista pomiarów sortowana po czasie stronicowana kursorem (api.pagination.paginate) zamiast numerem strony –
+    głęboka strona kosztuje tyle co pierwsza, bez OFFSET. Strona czytana jest z ograniczonego zakresu czasu
+    (ADMIN_KEYSET_WINDOW), poszerzanego aż do zebrania pełnej strony, więc nawet bez filtra systemu zapytanie
+    czyta tylko bloki tabeli z tego zakresu (indeks BRIN) zamiast sortować całą tabelę.
+    Przy sortowaniu po innym polu lista działa jak zwykle.
+    """
+
+    def __init__(self, request, *args, **kwargs):
+        self.cursor = request.GET.get(CURSOR_VAR)
+        self.keyset_page = None
+        super().__init__(request, *args, **kwargs)
+        # Kursor nie jest przenoszony do odnośników filtrów i sortowania
+        self.params.pop(CURSOR_VAR, None)
+        self.filter_params.pop(CURSOR_VAR, None)
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    def _windowed_page(self, descending):
+        """
+        Strona od kursora w danej kolejności, czytana z rosnącego zakresu czasu od pozycji kursora.
+        """
+        bounds = measurement_time_bounds()
+        if bounds is None:
+            return paginate(self.queryset, self.cursor, self.list_per_page, descending)
+        first, last = bounds
+        for spec in self.filter_specs:
+            selected = spec.selected_range() if isinstance(spec, PeriodFilter) else None
+            if selected is not None:  # Zakres zaczyna się w wybranym okresie, a nie od najnowszego pomiaru
+                first, last = max(first, selected[0]), min(last, selected[1])
+        if not self.cursor:
+            backwards, anchor = False, last if descending else first
+        elif self.cursor == LAST_CURSOR:
+            backwards, anchor = True, first if descending else last
+        else:
+            anchor, _, backwards = decode_cursor(self.cursor)
+        towards_past = descending != backwards
+
+        window = timedelta(seconds=settings.ADMIN_KEYSET_WINDOW)
+        while True:
+            if towards_past and anchor - window > first:
+                queryset = self.queryset.filter(timestamp__gte=anchor - window)
+            elif not towards_past and anchor + window < last:
+                queryset = self.queryset.filter(timestamp__lte=anchor + window)
+            else:  # Zakres obejmuje wszystkie pomiary
+                return paginate(self.queryset, self.cursor, self.list_per_page, descending)
+            page = paginate(queryset, self.cursor, self.list_per_page, descending)
+            # Pełna strona z kolejnym wierszem w zakresie jest taka sama jak bez ograniczenia zakresu
+            if page.has_previous if backwards else page.has_next:
+                return page
+            window *= WINDOW_GROWTH
+
+    def get_results(self, request):
+        ordering = self.get_ordering(request, self.queryset)
+        if self.show_all or not ordering or ordering[0] not in ('timestamp', '-timestamp'):
+            return super().get_results(request)
+
+        try:
+            page = self._windowed_page(descending=ordering[0] == '-timestamp')
+        except InvalidCursor:
+            raise IncorrectLookupParameters(self.cursor)
+
+        paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        self.result_count = paginator.count
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.full_result_count = None
+        self.result_list = page.object_list
+        self.can_show_all = False
+        self.multi_page = page.has_other_pages
+        self.paginator = paginator
+        self.keyset_page = page
+        self.first_url = self.get_query_string(remove=[CURSOR_VAR])
+        self.last_url = self.get_query_string({CURSOR_VAR: LAST_CURSOR})
+        self.next_url = page.has_next and self.get_query_string({CURSOR_VAR: page.next_cursor})
+        self.previous_url = page.has_previous and self.get_query_string({CURSOR_VAR: page.previous_cursor})
+
 
 @admin.register(User)
 class CustomUserAdmin(UserAdmin):
@@ -20,12 +283,83 @@ class HydroponicSystemAdmin(admin.ModelAdmin):
     """Panel administracyjny systemów hydroponicznych."""
     list_display = ("id", "name", "owner", "location", "created_at")
     search_fields = ("name", "owner__username")
-    list_filter = ("owner",)  # Możliwość filtrowania po właścicielu
+    list_filter = (OwnerFilter,)  # Filtrowanie po właścicielu (pole tekstowe zamiast listy wszystkich użytkowników)
+    list_select_related = ("owner",)
+    autocomplete_fields = ("owner",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(Measurement)
 class MeasurementAdmin(admin.ModelAdmin):
-    """Panel administracyjny pomiarów systemów hydroponicznych."""
+    """
+    Panel administracyjny pomiarów systemów hydroponicznych.
+    Lista jest przygotowana na tabelę z setkami milionów wierszy: stronicowanie kursorem po czasie,
+    szacowana liczba wyników, filtry bez pełnych list wartości i sortowanie tylko po indeksowanym czasie.
+    """
     list_display = ("id", "hydroponic_system", "timestamp", "ph", "temperature", "tds")
+    list_filter = (SystemFilter, PeriodFilter)  # Możliwość filtrowania po systemie i okresie
+    list_select_related = ("hydroponic_system",)
+    autocomplete_fields = ("hydroponic_system",)
+    search_fields = ("hydroponic_system__name",)
+    search_help_text = "Nazwa systemu albo jej fragment."
+    ordering = ("-timestamp",)
+    sortable_by = ("timestamp",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Wyszukiwanie po nazwie systemu: pasujące systemy wybierane są z małej tabeli systemów,
+        a pomiary filtrowane ich identyfikatorami (bez złączenia z wzorcem LIKE dla każdego pomiaru).
+        """
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        system_ids = list(
+            HydroponicSystem.all_objects.filter(name__icontains=search_term).values_list('id', flat=True)
+        )
+        return queryset.filter(hydroponic_system_id__in=system_ids), False
+
+
+@admin.register(DeviceKey)
+class DeviceKeyAdmin(admin.ModelAdmin):
+    """Panel administracyjny kluczy urządzeń (tworzenie: komenda create_device_key)."""
+    list_display = ("key_id", "hydroponic_system", "name", "created_at", "revoked_at")
+    search_fields = ("key_id", "name", "hydroponic_system__name")
+    list_filter = ("revoked_at",)
+    list_select_related = ("hydroponic_system",)
+    readonly_fields = ("key_id", "hydroponic_system", "created_at", "revoked_at")
+    actions = ("revoke",)
+
+    def has_add_permission(self, request):
+        return False  # Token jest pokazywany tylko raz, przy tworzeniu komendą
+
+    @admin.action(description="Unieważnij wybrane klucze")
+    def revoke(self, request, queryset):
+        revoked = revoke_keys(queryset)
+        self.message_user(request, f"Unieważniono klucze: {revoked}")
+
+
+@admin.register(AlertRule)
+class AlertRuleAdmin(admin.ModelAdmin):
+    """Panel administracyjny reguł alertów."""
+    list_display = ("id", "hydroponic_system", "metric", "min_value", "max_value", "sustained_minutes", "is_active", "state")
+    list_filter = ("metric", "state", "is_active")
+    list_select_related = ("hydroponic_system",)
+    autocomplete_fields = ("hydroponic_system",)
+    search_fields = ("hydroponic_system__name",)
+
+
+@admin.register(AlertEvent)
+class AlertEventAdmin(admin.ModelAdmin):
+    """Panel administracyjny zdarzeń alertów."""
+    list_display = ("id", "rule", "hydroponic_system", "kind", "value", "measured_at", "created_at")
+    list_filter = ("kind",)
+    list_select_related = ("rule", "hydroponic_system")
     search_fields = ("hydroponic_system__name",)
-    list_filter = ("hydroponic_system",)  # Możliwość filtrowania po systemie
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
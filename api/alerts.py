@@ -0,0 +1,237 @@
+"""
+Reguły alertów sprawdzane przy zapisie pomiarów.
+Definicje aktywnych reguł trzymane są w pamięci procesu jako tablice NumPy posortowane po systemie
+(odświeżane co ALERT_RULE_CACHE_TTL sekund i po każdej zmianie reguły w tym procesie).
+Stan reguł (ok / pending / firing) nie jest przechowywany w procesie – przy wielu procesach byłby nieaktualny.
+Reguły systemów partii są blokowane w bazie (SELECT ... FOR UPDATE) i przeprowadzane od stanu z bazy,
+więc procesy zapisujące pomiary tego samego systemu przetwarzają je po kolei.
+Partia pomiarów jest łączona z regułami swoich systemów i porównywana z granicami
+operacjami na całych tablicach; pętla w Pythonie obejmuje tylko reguły, których stan może się zmienić.
+"""
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .models import AlertEvent, AlertRule
+
+# Kolejność wartości w macierzy pomiarów
+METRICS = ('ph', 'temperature', 'tds')
+
+OK, PENDING, FIRING = 0, 1, 2
+STATE_CODES = {'ok': OK, 'pending': PENDING, 'firing': FIRING}
+STATE_NAMES = {code: name for name, code in STATE_CODES.items()}
+
+
+class RuleSet:
+    """
+    Definicje aktywnych reguł w układzie kolumnowym, posortowane po identyfikatorze systemu (tylko do odczytu).
+    """
+
+    def __init__(self, rows):
+        rows = sorted(rows, key=lambda row: row[1])
+        self.ids = np.array([row[0] for row in rows], dtype=np.int64)
+        self.system_ids = np.array([row[1] for row in rows], dtype=np.int64)
+        self.metrics = np.array([METRICS.index(row[2]) for row in rows], dtype=np.int64)
+        self.low = np.array([-np.inf if row[3] is None else row[3] for row in rows], dtype=np.float64)
+        self.high = np.array([np.inf if row[4] is None else row[4] for row in rows], dtype=np.float64)
+        self.hysteresis = np.array([row[5] for row in rows], dtype=np.float64)
+        self.sustained = np.array([row[6] * 60 for row in rows], dtype=np.float64)
+        self.loaded_at = time.monotonic()
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def load(cls):
+        return cls(AlertRule.objects.filter(is_active=True).values_list(
+            'id', 'hydroponic_system_id', 'metric', 'min_value', 'max_value',
+            'hysteresis', 'sustained_minutes',
+        ))
+
+
+_rules = None
+_rules_lock = threading.Lock()
+
+
+def get_rules():
+    """
+    Zwraca reguły z pamięci procesu, wczytując je ponownie po upływie ALERT_RULE_CACHE_TTL.
+    """
+    global _rules
+    with _rules_lock:
+        if _rules is None or time.monotonic() - _rules.loaded_at > settings.ALERT_RULE_CACHE_TTL:
+            _rules = RuleSet.load()
+        return _rules
+
+
+@receiver([post_save, post_delete], sender=AlertRule)
+def invalidate_rules(**kwargs):
+    """
+    Po zatwierdzeniu zmiany reguły w tym procesie wymusza ponowne wczytanie reguł.
+    """
+    transaction.on_commit(_clear_rules)
+
+
+def _clear_rules():
+    global _rules
+    with _rules_lock:
+        _rules = None
+
+
+def _pairs(rules, system_ids):
+    """
+    Łączy pomiary z regułami ich systemów.
+    Zwraca równej długości tablice indeksów (pomiar, reguła).
+    """
+    first = np.searchsorted(rules.system_ids, system_ids, side='left')
+    counts = np.searchsorted(rules.system_ids, system_ids, side='right') - first
+    total = int(counts.sum())
+    if not total:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    reading_index = np.repeat(np.arange(len(system_ids)), counts)
+    # Kolejne reguły systemu dla każdego pomiaru: first[i], first[i] + 1, ...
+    offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    return reading_index, np.repeat(first, counts) + offsets
+
+
+def _locked_states(system_ids, breached_ids):
+    """
+    Blokuje do końca transakcji reguły systemów partii, których stan może się zmienić – przekroczone w partii
+    albo w stanie innym niż "ok" – i zwraca ich stan z bazy: {id: (stan, początek przekroczenia)}.
+    Pozostałe reguły są w stanie "ok" i pomiary bez przekroczenia go nie zmieniają.
+    """
+    rows = (
+        AlertRule.objects.select_for_update()
+        .filter(Q(id__in=breached_ids) | ~Q(state='ok'), hydroponic_system_id__in=system_ids, is_active=True)
+        .order_by('id').values_list('id', 'state', 'breach_started_at')
+    )
+    return {
+        rule_id: (STATE_CODES[state], np.nan if started is None else started.timestamp())
+        for rule_id, state, started in rows
+    }
+
+
+def _transition(state, started, sustained, readings):
+    """
+    Przeprowadza regułę od stanu `state` przez kolejne pomiary (czas, wartość, przekroczenie, powrót)
+    w kolejności czasu. Zwraca stan końcowy, początek przekroczenia i listę zmian (rodzaj zdarzenia, czas, wartość).
+    """
+    changes = []
+    for timestamp, value, breach, clear in readings:
+        if state == OK and breach:
+            state, started = PENDING, timestamp
+        if state == PENDING:
+            if not breach:
+                state, started = OK, np.nan
+            elif timestamp - started >= sustained:
+                state = FIRING
+                changes.append(('triggered', timestamp, value))
+        elif state == FIRING and clear:
+            state, started = OK, np.nan
+            changes.append(('resolved', timestamp, value))
+    return state, started, changes
+
+
+def _save_state(rule_id, state, started):
+    breach_started_at = None if np.isnan(started) else datetime.fromtimestamp(started, timezone.utc)
+    AlertRule.objects.filter(id=rule_id).update(state=STATE_NAMES[state], breach_started_at=breach_started_at)
+
+
+def evaluate(measurements):
+    """
+    Sprawdza reguły alertów dla partii zapisanych pomiarów.
+    Wywoływana w transakcji zapisu – blokady reguł trwają do jej zakończenia, a wycofanie zapisu
+    wycofuje też zmiany stanu. Zdarzenia trafiają do tabeli AlertEvent,
+    a po zatwierdzeniu transakcji – do funkcji z ALERT_HOOKS.
+    """
+    rules = get_rules()
+    if not len(rules) or not measurements:
+        return []
+
+    system_ids = np.fromiter((m.hydroponic_system_id for m in measurements), dtype=np.int64, count=len(measurements))
+    reading_index, rule_index = _pairs(rules, system_ids)
+    if not len(rule_index):
+        return []
+
+    values = np.array([[m.ph, m.temperature, m.tds] for m in measurements], dtype=np.float64)
+    pair_values = values[reading_index, rules.metrics[rule_index]]
+    low, high, hysteresis = rules.low[rule_index], rules.high[rule_index], rules.hysteresis[rule_index]
+    breach = (pair_values < low) | (pair_values > high)
+    clear = (pair_values >= low + hysteresis) & (pair_values <= high - hysteresis)
+
+    # Stan reguł z bazy; niezablokowane reguły bez przekroczenia są w stanie "ok",
+    # a przekroczone, ale niezablokowane – usunięte lub wyłączone od wczytania definicji (-1)
+    candidates = np.unique(rule_index)
+    breached = np.unique(rule_index[breach])
+    locked = _locked_states(np.unique(rules.system_ids[candidates]).tolist(), rules.ids[breached].tolist())
+    states = np.full(len(rules), -1, dtype=np.int8)
+    states[candidates] = OK
+    states[breached] = -1
+    started_at = np.full(len(rules), np.nan, dtype=np.float64)
+    if locked:
+        locked_ids = np.fromiter(locked, dtype=np.int64, count=len(locked))
+        positions = np.flatnonzero(np.isin(rules.ids, locked_ids))
+        for position in positions.tolist():
+            states[position], started_at[position] = locked[int(rules.ids[position])]
+
+    # Pary, które mogą zmienić stan reguły: przekroczenie przy "ok", dowolny pomiar przy "pending",
+    # powrót do zakresu przy "firing". Pozostałe reguły nie wymagają dalszej pracy.
+    pair_states = states[rule_index]
+    relevant = np.select([pair_states == OK, pair_states == FIRING, pair_states == PENDING], [breach, clear, True], False)
+    if not relevant.any():
+        return []
+
+    # Pary reguł-kandydatów posortowane po regule, a w ramach reguły po czasie pomiaru
+    timestamps = np.array([m.timestamp.timestamp() for m in measurements], dtype=np.float64)
+    selected = np.flatnonzero(np.isin(rule_index, np.unique(rule_index[relevant])))
+    selected = selected[np.lexsort((timestamps[reading_index[selected]], rule_index[selected]))]
+    candidates, starts = np.unique(rule_index[selected], return_index=True)
+    groups = np.split(selected, starts[1:])
+
+    events = []
+    for candidate, group in zip(candidates.tolist(), groups):
+        readings = zip(
+            timestamps[reading_index[group]].tolist(),
+            pair_values[group].tolist(),
+            breach[group].tolist(),
+            clear[group].tolist(),
+        )
+        old_state, old_started = int(states[candidate]), float(started_at[candidate])
+        state, started, changes = _transition(old_state, old_started, rules.sustained[candidate], readings)
+        unchanged = state == old_state and (started == old_started or (np.isnan(started) and np.isnan(old_started)))
+        if unchanged and not changes:
+            continue
+
+        rule_id = int(rules.ids[candidate])
+        _save_state(rule_id, state, started)
+        events.extend(
+            AlertEvent(
+                rule_id=rule_id,
+                hydroponic_system_id=int(rules.system_ids[candidate]),
+                kind=kind,
+                value=value,
+                measured_at=datetime.fromtimestamp(timestamp, timezone.utc),
+            )
+            for kind, timestamp, value in changes
+        )
+
+    if events:
+        AlertEvent.objects.bulk_create(events)
+        transaction.on_commit(lambda: run_hooks(events))
+    return events
+
+
+def run_hooks(events):
+    """
+    Przekazuje zapisane zdarzenia do funkcji wskazanych w ALERT_HOOKS (ścieżki importu).
+    """
+    for path in settings.ALERT_HOOKS:
+        import_string(path)(events)
@@ -0,0 +1,339 @@
+"""
+Archiwum kolumnowe starych pomiarów.
+Komenda archive_measurements przenosi całe miesiące pomiarów starszych niż MEASUREMENT_ARCHIVE_AFTER_DAYS
+do segmentów – po jednym katalogu na system i miesiąc (np. system-7/20250101-1a2b3c4d/) z osobnym plikiem .npy na kolumnę
+(id, time w mikrosekundach od 1970-01-01 UTC, ph, temperature, tds) i plikiem manifest.json.
+Wiersze segmentu są posortowane po (czas, id). Spisem segmentów jest tabela MeasurementArchive – zapis
+segmentu i usunięcie jego wierszy z bazy odbywa się w jednej transakcji.
+
+Odczyt (lista pomiarów w API, widok szczegółów systemu, eksport) łączy wiersze z bazy z wierszami archiwum
+(ArchivedRows). Pliki są mapowane do pamięci, zakres czasu wyznacza wyszukiwanie binarne po kolumnie time,
+a filtry wartości sprawdzane są wektorowo – odczyt długiego zakresu jest sekwencyjny i bez kopiowania.
+Pliki nie są kompresowane, bo tylko nieskompresowane tablice można mapować; kompresję może zapewnić system plików.
+"""
+import functools
+import heapq
+import json
+import os
+import shutil
+import uuid
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models.functions import TruncMonth
+
+from .models import Measurement, MeasurementArchive
+
+# Kolumny wierszy archiwum – w tej samej kolejności co wiersze listy pomiarów i eksportu
+COLUMNS = ('id', 'hydroponic_system_id', 'timestamp', 'ph', 'temperature', 'tds')
+METRICS = ('ph', 'temperature', 'tds')
+FILE_DTYPES = {'id': np.int64, 'time': np.int64, 'ph': np.float64, 'temperature': np.float64, 'tds': np.float64}
+
+# Liczba wierszy segmentu sprawdzanych naraz przy szukaniu strony
+CHUNK_SIZE = 65536
+
+ArchivedMeasurement = namedtuple('ArchivedMeasurement', COLUMNS)
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MEASUREMENT_TABLE = Measurement._meta.db_table
+
+
+def is_enabled():
+    return settings.MEASUREMENT_ARCHIVE_ROOT is not None
+
+
+def _micros(moment):
+    return (moment - EPOCH) // timedelta(microseconds=1)
+
+
+def _moment(micros):
+    return EPOCH + timedelta(microseconds=micros)
+
+
+def _directory(path):
+    return Path(settings.MEASUREMENT_ARCHIVE_ROOT) / path
+
+
+# --- Zapis -------------------------------------------------------------------------------------------------------
+
+def archive_cutoff(moment, days=None):
+    """
+    Granica archiwizacji: początek miesiąca (UTC), w którym wypada chwila `days` (domyślnie
+    MEASUREMENT_ARCHIVE_AFTER_DAYS) dni przed `moment`. Archiwizowane są tylko całe miesiące – inaczej każde
+    uruchomienie dokładałoby do bieżącego miesiąca kolejny segment z kilkoma nowymi dniami.
+    """
+    days = settings.MEASUREMENT_ARCHIVE_AFTER_DAYS if days is None else days
+    boundary = (moment - timedelta(days=days)).astimezone(timezone.utc)
+    return boundary.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def pending_months(system_id, cutoff):
+    """
+    Początki miesięcy (UTC), w których system ma w bazie pomiary starsze niż granica.
+    """
+    return list(
+        Measurement.objects.filter(hydroponic_system_id=system_id, timestamp__lt=cutoff)
+        .annotate(month=TruncMonth('timestamp', tzinfo=timezone.utc))
+        .values_list('month', flat=True).distinct().order_by('month')
+    )
+
+
+def _next_month(month):
+    return month.replace(year=month.year + month.month // 12, month=month.month % 12 + 1)
+
+
+def _read_range(system_id, start, end):
+    """
+    Czyta pomiary systemu z zakresu [start, end) posortowane po (czas, id) jako słownik kolumn plików.
+    Zwraca None, gdy zakres jest pusty.
+    """
+    rows = (
+        Measurement.objects.filter(hydroponic_system_id=system_id, timestamp__gte=start, timestamp__lt=end)
+        .order_by('timestamp', 'id').values_list('id', 'timestamp', *METRICS)
+        .iterator(chunk_size=settings.MEASUREMENT_EXPORT_CHUNK_SIZE)
+    )
+    values = {name: [] for name in FILE_DTYPES}
+    for pk, moment, ph, temperature, tds in rows:
+        values['id'].append(pk)
+        values['time'].append(_micros(moment))
+        values['ph'].append(ph)
+        values['temperature'].append(temperature)
+        values['tds'].append(tds)
+    if not values['id']:
+        return None
+    return {name: np.array(column, dtype=FILE_DTYPES[name]) for name, column in values.items()}
+
+
+def _write_files(directory, columns, manifest):
+    """
+    Zapisuje kolumny do katalogu tymczasowego i przenosi go na miejsce docelowe (segment pojawia się w całości).
+    """
+    temporary = directory.with_name(f".{directory.name}.tmp")
+    temporary.mkdir(parents=True)
+    for name, values in columns.items():
+        with open(temporary / f"{name}.npy", 'wb') as handle:
+            np.save(handle, values)
+            handle.flush()
+            os.fsync(handle.fileno())
+    (temporary / 'manifest.json').write_text(json.dumps(manifest, indent=2))
+    os.rename(temporary, directory)
+
+
+def archive_month(system_id, month, cutoff):
+    """
+    Przenosi pomiary systemu z miesiąca `month` starsze niż granica do nowego segmentu.
+    Zwraca utworzony MeasurementArchive albo None, gdy nie ma czego archiwizować.
+    """
+    start, end = month, min(_next_month(month), cutoff)
+    with transaction.atomic():
+        columns = _read_range(system_id, start, end)
+        if columns is None:
+            return None
+
+        path = f"system-{system_id}/{month:%Y%m%d}-{uuid.uuid4().hex[:8]}"
+        count = len(columns['id'])
+        first, last = _moment(int(columns['time'][0])), _moment(int(columns['time'][-1]))
+        directory = _directory(path)
+        _write_files(directory, columns, {
+            'system': system_id,
+            'count': count,
+            'first_timestamp': first.isoformat(),
+            'last_timestamp': last.isoformat(),
+            'columns': {name: np.dtype(dtype).str for name, dtype in FILE_DTYPES.items()},
+            'time_unit': 'us',
+        })
+        try:
+            segment = MeasurementArchive.objects.create(
+                hydroponic_system_id=system_id, path=path, first_timestamp=first, last_timestamp=last,
+                last_id=int(columns['id'][-1]), count=count,
+            )
+            ids = columns['id'].tolist()
+            with connection.cursor() as cursor:
+                for offset in range(0, count, settings.MEASUREMENT_RETENTION_BATCH_SIZE):
+                    cursor.execute(
+                        f"DELETE FROM {MEASUREMENT_TABLE} WHERE id = ANY(%s)",
+                        [ids[offset:offset + settings.MEASUREMENT_RETENTION_BATCH_SIZE]],
+                    )
+        except Exception:
+            shutil.rmtree(directory, ignore_errors=True)
+            raise
+    return segment
+
+
+def _remove_segments(segments):
+    segments = list(segments)
+    MeasurementArchive.objects.filter(id__in=[segment.id for segment in segments]).delete()
+    if is_enabled():
+        for segment in segments:
+            shutil.rmtree(_directory(segment.path), ignore_errors=True)
+    return len(segments)
+
+
+def remove_system(system_id):
+    """
+    Usuwa segmenty archiwum systemu (przy usuwaniu systemu).
+    """
+    removed = _remove_segments(MeasurementArchive.objects.filter(hydroponic_system_id=system_id))
+    if is_enabled():
+        shutil.rmtree(_directory(f"system-{system_id}"), ignore_errors=True)
+    return removed
+
+
+def expired_segments(moment):
+    """
+    Segmenty, których wszystkie pomiary wygasły według okresu przechowywania systemu
+    (raw_retention_days albo MEASUREMENT_RAW_RETENTION_DAYS).
+    """
+    default = settings.MEASUREMENT_RAW_RETENTION_DAYS
+    expired = []
+    for segment in MeasurementArchive.objects.select_related('hydroponic_system'):
+        days = segment.hydroponic_system.raw_retention_days
+        days = default if days is None else days
+        if days is not None and segment.last_timestamp < moment - timedelta(days=days):
+            expired.append(segment)
+    return expired
+
+
+def drop_expired(moment):
+    """
+    Usuwa wygasłe segmenty archiwum. Zwraca liczbę usuniętych segmentów.
+    """
+    return _remove_segments(expired_segments(moment))
+
+
+def newest_position(system_id):
+    """
+    Pozycja (czas, id) najnowszego zarchiwizowanego pomiaru systemu albo None.
+    """
+    return (
+        MeasurementArchive.objects.filter(hydroponic_system_id=system_id)
+        .order_by('-last_timestamp', '-last_id').values_list('last_timestamp', 'last_id').first()
+    )
+
+
+# --- Odczyt ------------------------------------------------------------------------------------------------------
+
+@functools.lru_cache(maxsize=settings.MEASUREMENT_ARCHIVE_OPEN_SEGMENTS)
+def _open(path):
+    """
+    Mapuje kolumny segmentu do pamięci (tylko do odczytu).
+    """
+    directory = _directory(path)
+    return {name: np.load(directory / f"{name}.npy", mmap_mode='r') for name in FILE_DTYPES}
+
+
+def _to_rows(system_id, columns, indexes):
+    """
+    Zamienia wybrane wiersze segmentu na krotki ArchivedMeasurement.
+    """
+    values = [columns[name][indexes].tolist() for name in ('id', 'time', *METRICS)]
+    return [
+        ArchivedMeasurement(pk, system_id, _moment(micros), ph, temperature, tds)
+        for pk, micros, ph, temperature, tds in zip(*values)
+    ]
+
+
+class ArchivedRows:
+    """
+    Pomiary archiwum wskazane querysetem segmentów (np. systemów użytkownika) i filtrami
+    z parse_measurement_filters. Spis segmentów pobierany jest jednym zapytaniem przy pierwszym użyciu.
+    """
+
+    def __init__(self, segments, filters):
+        self.filters = filters
+        self._queryset = segments
+
+    @functools.cached_property
+    def segments(self):
+        if not is_enabled():
+            return []
+        queryset, filters = self._queryset, self.filters
+        if filters['system'] is not None:
+            queryset = queryset.filter(hydroponic_system_id=filters['system'])
+        if filters['start'] is not None:
+            queryset = queryset.filter(last_timestamp__gte=filters['start'])
+        if filters['end'] is not None:
+            queryset = queryset.filter(first_timestamp__lt=filters['end'])
+        return list(queryset.values_list('path', 'hydroponic_system_id', 'first_timestamp', 'last_timestamp'))
+
+    def _bounds(self, times, low=None, high=None):
+        """
+        Zakres indeksów [lo, hi) wierszy w granicach czasu z filtrów i z dodatkowych granic (włącznie).
+        """
+        start, end = self.filters['start'], self.filters['end']
+        lo = 0 if start is None else int(np.searchsorted(times, _micros(start), 'left'))
+        hi = len(times) if end is None else int(np.searchsorted(times, _micros(end), 'left'))
+        if low is not None:
+            lo = max(lo, int(np.searchsorted(times, _micros(low), 'left')))
+        if high is not None:
+            hi = min(hi, int(np.searchsorted(times, _micros(high), 'right')))
+        return lo, hi
+
+    def _mask(self, columns, lo, hi, position, descending):
+        """
+        Wiersze z zakresu [lo, hi) spełniające filtry wartości i leżące za pozycją kursora.
+        """
+        mask = np.ones(hi - lo, dtype=bool)
+        for field, (low, high) in self.filters['ranges'].items():
+            values = columns[field][lo:hi]
+            if low is not None:
+                mask &= values >= low
+            if high is not None:
+                mask &= values <= high
+        if position is not None:
+            times, ids = columns['time'][lo:hi], columns['id'][lo:hi]
+            moment, pk = _micros(position[0]), position[1]
+            mask &= ~((times == moment) & ((ids >= pk) if descending else (ids <= pk)))
+        return mask
+
+    def page(self, position, descending, limit, stop=None):
+        """
+        Do `limit` pierwszych w danej kolejności wierszy archiwum leżących za pozycją (czas, id);
+        `stop` to pozycja, za którą wiersze i tak nie zmieszczą się na stronie (pomija całe segmenty).
+        """
+        selected = []
+        for path, system_id, first, last in self.segments:
+            if stop is not None and (last < stop[0] if descending else first > stop[0]):
+                continue
+            if position is not None and (first > position[0] if descending else last < position[0]):
+                continue
+            columns = _open(path)
+            times = columns['time']
+            if descending:
+                lo, hi = self._bounds(times, stop and stop[0], position and position[0])
+            else:
+                lo, hi = self._bounds(times, position and position[0], stop and stop[0])
+
+            found, count = [], 0
+            # Fragmenty od właściwego końca zakresu, aż do zebrania `limit` wierszy
+            edges = range(hi, lo, -CHUNK_SIZE) if descending else range(lo, hi, CHUNK_SIZE)
+            for edge in edges:
+                chunk_lo, chunk_hi = (max(lo, edge - CHUNK_SIZE), edge) if descending else (edge, min(hi, edge + CHUNK_SIZE))
+                indexes = np.flatnonzero(self._mask(columns, chunk_lo, chunk_hi, position, descending)) + chunk_lo
+                found.append(indexes[::-1] if descending else indexes)
+                count += len(indexes)
+                if count >= limit:
+                    break
+            if count:
+                selected.extend(_to_rows(system_id, columns, np.concatenate(found)[:limit]))
+
+        selected.sort(key=lambda row: (row.timestamp, row.id), reverse=descending)
+        return selected[:limit]
+
+    def _iter_segment(self, path, system_id):
+        columns = _open(path)
+        lo, hi = self._bounds(columns['time'])
+        for chunk_lo in range(lo, hi, CHUNK_SIZE):
+            chunk_hi = min(hi, chunk_lo + CHUNK_SIZE)
+            indexes = np.flatnonzero(self._mask(columns, chunk_lo, chunk_hi, None, False)) + chunk_lo
+            yield from _to_rows(system_id, columns, indexes)
+
+    def iterate(self, key):
+        """
+        Wszystkie wiersze archiwum w rosnącej kolejności klucza `key` (np. czas i id) – do eksportu.
+        """
+        return heapq.merge(*(self._iter_segment(path, system_id) for path, system_id, *_ in self.segments), key=key)
@@ -0,0 +1,185 @@
+"""
+Uwierzytelnianie urządzeń (czujników) kluczami podpisanymi HMAC.
+Token ma postać "<key_id>.<podpis>", gdzie podpis to HMAC-SHA256 identyfikatora klucza
+kluczem DEVICE_KEY_SECRET. Podpis sprawdzany jest bez bazy danych, a przypisanie klucza
+do systemu i jego ważność – w pamięci procesu (LRU z czasem życia DEVICE_KEY_CACHE_TTL).
+Nagłówek żądania: "Authorization: Device <token>".
+"""
+import base64
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.timezone import now
+from rest_framework import authentication, exceptions
+
+from .models import DeviceKey
+
+KEYWORD = 'Device'
+
+
+def _signature(key_id):
+    secret = (settings.DEVICE_KEY_SECRET or settings.SECRET_KEY).encode()
+    digest = hmac.new(secret, key_id.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).decode().rstrip('=')
+
+
+def make_token(key_id):
+    """
+    Zwraca token urządzenia dla identyfikatora klucza.
+    """
+    return f"{key_id}.{_signature(key_id)}"
+
+
+def verify_token(token):
+    """
+    Sprawdza podpis tokenu i zwraca identyfikator klucza albo None.
+    """
+    key_id, _, signature = token.partition('.')
+    if not key_id or not signature:
+        return None
+    if not hmac.compare_digest(signature, _signature(key_id)):
+        return None
+    return key_id
+
+
+class DevicePrincipal:
+    """
+    Tożsamość uwierzytelnionego urządzenia (request.user).
+    Urządzenie może wyłącznie zapisywać pomiary do swojego systemu.
+    """
+
+    is_authenticated = True
+    is_anonymous = False
+    is_active = True
+    is_staff = False
+    is_superuser = False
+    pk = id = None
+
+    def __init__(self, key_id, hydroponic_system_id, owner_id):
+        self.key_id = key_id
+        self.hydroponic_system_id = hydroponic_system_id
+        self.owner_id = owner_id
+
+    def __str__(self):
+        return f"device:{self.key_id}"
+
+
+class KeyCache:
+    """
+    Pamięć podręczna LRU z czasem życia wpisów.
+    Przechowuje także brak klucza (None), żeby unieważnione klucze nie odpytywały bazy przy każdym żądaniu.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Zwraca krotkę (trafienie, wartość).
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+key_cache = KeyCache(settings.DEVICE_KEY_CACHE_SIZE, settings.DEVICE_KEY_CACHE_TTL)
+
+
+def load_principal(key_id):
+    """
+    Zwraca DevicePrincipal dla aktywnego klucza albo None; korzysta z pamięci podręcznej.
+    """
+    hit, principal = key_cache.get(key_id)
+    if hit:
+        return principal
+
+    row = (
+        DeviceKey.objects.filter(key_id=key_id, revoked_at__isnull=True, hydroponic_system__deleted_at__isnull=True)
+        .values_list('hydroponic_system_id', 'hydroponic_system__owner_id')
+        .first()
+    )
+    principal = DevicePrincipal(key_id, *row) if row else None
+    key_cache.set(key_id, principal)
+    return principal
+
+
+def create_key(hydroponic_system, name=''):
+    """
+    Tworzy klucz urządzenia i zwraca krotkę (klucz, token). Token nie jest zapisywany w bazie.
+    """
+    device_key = DeviceKey.objects.create(
+        hydroponic_system=hydroponic_system, key_id=secrets.token_hex(8), name=name
+    )
+    return device_key, make_token(device_key.key_id)
+
+
+def revoke_keys(queryset):
+    """
+    Unieważnia klucze i usuwa je z pamięci podręcznej bieżącego procesu.
+    Pozostałe procesy przestają je akceptować najpóźniej po DEVICE_KEY_CACHE_TTL sekundach.
+    """
+    key_ids = list(queryset.filter(revoked_at__isnull=True).values_list('key_id', flat=True))
+    DeviceKey.objects.filter(key_id__in=key_ids).update(revoked_at=now())
+    for key_id in key_ids:
+        key_cache.discard(key_id)
+    return len(key_ids)
+
+
+class DeviceKeyAuthentication(authentication.BaseAuthentication):
+    """
+    Uwierzytelnianie nagłówkiem "Authorization: Device <token>".
+    Przy ciepłej pamięci podręcznej nie wykonuje żadnego zapytania do bazy.
+    """
+
+    def authenticate(self, request):
+        header = authentication.get_authorization_header(request).split()
+        if not header or header[0].lower() != KEYWORD.lower().encode():
+            return None  # Inny schemat – próbują kolejne klasy uwierzytelniania
+        if len(header) != 2:
+            raise exceptions.AuthenticationFailed("Niepoprawny nagłówek uwierzytelniania urządzenia.")
+
+        try:
+            token = header[1].decode('ascii')
+        except UnicodeDecodeError:
+            raise exceptions.AuthenticationFailed("Niepoprawny token urządzenia.")
+
+        key_id = verify_token(token)
+        if key_id is None:
+            raise exceptions.AuthenticationFailed("Niepoprawny token urządzenia.")
+        principal = load_principal(key_id)
+        if principal is None:
+            raise exceptions.AuthenticationFailed("Klucz urządzenia jest nieaktywny.")
+        return principal, key_id
+
+    def authenticate_header(self, request):
+        return KEYWORD
@@ -0,0 +1,243 @@
+"""
+Bufor zapisu pomiarów (write-behind).
+Przy MEASUREMENT_INGEST_MODE = 'buffered' pomiary po walidacji trafiają do ograniczonego
+bufora w pamięci procesu, a wątek w tle zapisuje je partiami – gdy uzbiera się
+MEASUREMENT_BUFFER_BATCH_SIZE wierszy albo najstarszy czeka MEASUREMENT_BUFFER_MAX_DELAY sekund.
+Pomiary niezapisane w chwili awarii procesu są tracone; przy zwykłym zamknięciu bufor jest opróżniany.
+Gdy baza jest niedostępna (utrata połączenia, przełączenie serwera), partia wraca na początek bufora,
+a zapis jest ponawiany z rosnącą przerwą (MEASUREMENT_BUFFER_RETRY_DELAY … MEASUREMENT_BUFFER_RETRY_MAX_DELAY);
+w tym czasie bufor się zapełnia i API odpowiada 503.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import DatabaseError, DataError, IntegrityError, close_old_connections, connection
+
+from .ingest import write_measurements
+from .metrics import record_ingest
+
+logger = logging.getLogger(__name__)
+
+# Błędy wynikające z danych pomiaru – taki pomiar jest odrzucany; inne błędy bazy są ponawiane
+DATA_ERRORS = (IntegrityError, DataError)
+
+
+class BufferFull(Exception):
+    """
+    Bufor jest pełny i nie zwolnił miejsca w dozwolonym czasie.
+    """
+
+
+class IngestBuffer:
+    """
+    Ograniczony bufor pomiarów opróżniany partiami przez wątek w tle.
+    """
+
+    def __init__(self, max_rows, batch_size, max_delay, put_timeout, retry_delay, max_retry_delay):
+        self.max_rows = max_rows
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.put_timeout = put_timeout
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+
+        self._rows = deque()
+        self._oldest = None  # Czas dodania najstarszego oczekującego pomiaru
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()  # Jeden zapis naraz (wątek w tle lub zamknięcie)
+        self._closed = False
+
+        # Liczniki od uruchomienia procesu
+        self.queued = 0  # Przyjęte do bufora
+        self.written = 0  # Zapisane w bazie
+        self.dropped = 0  # Odrzucone (pełny bufor, błędne dane) lub utracone (baza niedostępna przy zamknięciu)
+        self.batches = 0  # Wykonane zapisy partii
+        self.retries = 0  # Partie zwrócone do bufora po błędzie bazy
+
+        self._thread = threading.Thread(target=self._run, name="measurement-ingest-buffer", daemon=True)
+        self._thread.start()
+
+    def put(self, measurements):
+        """
+        Dodaje pomiary do bufora. Gdy brakuje miejsca, czeka do `put_timeout` sekund
+        i rzuca BufferFull – wywołujący powinien poprosić klienta o ponowienie.
+        """
+        deadline = time.monotonic() + self.put_timeout
+        with self._changed:
+            while len(self._rows) + len(measurements) > self.max_rows and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.dropped += len(measurements)
+                    raise BufferFull()
+                self._changed.wait(remaining)
+            if self._closed:
+                self.dropped += len(measurements)
+                raise BufferFull()
+
+            if not self._rows:
+                self._oldest = time.monotonic()
+            self._rows.extend(measurements)
+            self.queued += len(measurements)
+            if len(self._rows) >= self.batch_size:
+                self._changed.notify_all()
+
+    def _take_batch(self):
+        """
+        Zdejmuje z bufora partię do zapisu; wywoływana z założoną blokadą.
+        """
+        batch = [self._rows.popleft() for _ in range(min(self.batch_size, len(self._rows)))]
+        self._oldest = time.monotonic() if self._rows else None
+        self._changed.notify_all()  # Zwolniło się miejsce dla oczekujących w put()
+        return batch
+
+    def _requeue(self, measurements):
+        """
+        Zwraca niezapisane pomiary na początek bufora; są zapisywane od razu po przerwie.
+        """
+        with self._lock:
+            self._rows.extendleft(reversed(measurements))
+            self._oldest = time.monotonic() - self.max_delay
+            self.retries += 1
+
+    def _write(self, batch):
+        """
+        Zapisuje partię i zwraca pomiary, których nie zapisano z powodu błędu bazy (do ponowienia).
+        Jeśli zapis całości nie powiedzie się z powodu danych, pomiary zapisywane są pojedynczo, żeby jeden
+        błędny wiersz (np. pomiar usuniętego systemu) nie przepadł z całą partią. Inne błędy (utrata połączenia,
+        przełączenie serwera) nie odrzucają niczego – wtedy każdy zapis pojedynczy też by się nie powiódł.
+        """
+        close_old_connections()
+        created = written = 0
+        pending, error = [], None
+        try:
+            created = len(write_measurements(batch))
+            written = len(batch)
+        except DATA_ERRORS:
+            logger.exception("Zapis partii %d pomiarów nie powiódł się, ponawiam pojedynczo", len(batch))
+            for index, measurement in enumerate(batch):
+                try:
+                    created += len(write_measurements([measurement]))
+                    written += 1
+                except DATA_ERRORS:
+                    pass
+                except DatabaseError as exc:
+                    pending, error = batch[index:], exc
+                    break
+        except DatabaseError as exc:
+            pending, error = batch, exc
+        if pending:
+            logger.warning("Baza danych niedostępna, %d pomiarów czeka na ponowienie zapisu", len(pending), exc_info=error)
+            connection.close()  # Kolejna próba nawiąże nowe połączenie
+        rejected = len(batch) - written - len(pending)
+        if written or rejected:
+            record_ingest('buffer', created=created, duplicates=written - created, rejected=rejected)
+        with self._lock:
+            self.written += written
+            self.dropped += rejected
+            self.batches += 1
+        return pending
+
+    def _run(self):
+        delay = 0
+        while True:
+            with self._changed:
+                while not self._closed:
+                    if len(self._rows) >= self.batch_size:
+                        break
+                    if self._rows and time.monotonic() - self._oldest >= self.max_delay:
+                        break
+                    timeout = self.max_delay if not self._rows else self.max_delay - (time.monotonic() - self._oldest)
+                    self._changed.wait(max(timeout, 0.01))
+                if self._closed:
+                    break
+                batch = self._take_batch()
+            with self._flush_lock:
+                pending = self._write(batch)
+            if not pending:
+                delay = 0
+                continue
+            self._requeue(pending)
+            delay = min(delay * 2 or self.retry_delay, self.max_retry_delay)
+            with self._changed:
+                self._changed.wait_for(lambda: self._closed, timeout=delay)
+        connection.close()  # Połączenie wątku w tle nie jest zamykane przez obsługę żądań
+
+    def flush(self):
+        """
+        Zapisuje wszystkie oczekujące pomiary w bieżącym wątku.
+        """
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    if not self._rows:
+                        return
+                    batch = self._take_batch()
+                pending = self._write(batch)
+                if pending:
+                    # Wywoływana przy zamknięciu procesu – nie ma już kiedy ponowić zapisu
+                    with self._lock:
+                        lost = len(pending) + len(self._rows)
+                        self._rows.clear()
+                        self.dropped += lost
+                    logger.error("Baza danych niedostępna przy zamykaniu, utracono %d pomiarów z bufora", lost)
+                    return
+
+    def close(self):
+        """
+        Zatrzymuje wątek w tle i zapisuje pozostałe pomiary (wywoływane przy zamknięciu procesu).
+        """
+        with self._changed:
+            self._closed = True
+            self._changed.notify_all()
+        self._thread.join(timeout=5)
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pending": len(self._rows),
+                "queued": self.queued,
+                "written": self.written,
+                "dropped": self.dropped,
+                "batches": self.batches,
+                "retries": self.retries,
+            }
+
+
+_buffer = None
+_buffer_pid = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    """
+    Zwraca bufor bieżącego procesu, tworząc go przy pierwszym użyciu
+    (także po fork() w procesie roboczym gunicorna).
+    """
+    global _buffer, _buffer_pid
+    with _buffer_lock:
+        if _buffer is None or _buffer_pid != os.getpid():
+            _buffer = IngestBuffer(
+                max_rows=settings.MEASUREMENT_BUFFER_MAX_ROWS,
+                batch_size=settings.MEASUREMENT_BUFFER_BATCH_SIZE,
+                max_delay=settings.MEASUREMENT_BUFFER_MAX_DELAY,
+                put_timeout=settings.MEASUREMENT_BUFFER_PUT_TIMEOUT,
+                retry_delay=settings.MEASUREMENT_BUFFER_RETRY_DELAY,
+                max_retry_delay=settings.MEASUREMENT_BUFFER_RETRY_MAX_DELAY,
+            )
+            _buffer_pid = os.getpid()
+            atexit.register(_buffer.close)
+        return _buffer
+
+
+def is_buffered():
+    """
+    Sprawdza, czy pomiary z API i symulatora czujnika mają trafiać do bufora.
+    """
+    return settings.MEASUREMENT_INGEST_MODE == 'buffered'
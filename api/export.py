@@ -0,0 +1,143 @@
+"""
+Strumieniowy eksport historii pomiarów do CSV lub NDJSON.
+Wiersze czytane są kursorem po stronie serwera i wysyłane porcjami, więc zużycie pamięci
+nie zależy od liczby eksportowanych pomiarów.
+
+Pod ASGI Django wczytałby synchroniczny strumień w całości przed wysłaniem pierwszego bajtu,
+dlatego eksport jest wtedy podawany jako strumień asynchroniczny pobierający kolejne porcje
+przez sync_to_async – w wątku żądania, który trzyma transakcję i kursor.
+"""
+import heapq
+import json
+import zlib
+from operator import itemgetter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from rest_framework.negotiation import BaseContentNegotiation
+
+# Kolumny eksportu w kolejności
+EXPORT_FIELDS = ('id', 'hydroponic_system_id', 'timestamp', 'ph', 'temperature', 'tds')
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+# Rozmiar porcji tekstu przekazywanej do serwera (ok. 64 KB)
+_FLUSH_SIZE = 64 * 1024
+
+
+class IgnoreClientContentNegotiation(BaseContentNegotiation):
+    """
+    Negocjacja treści dla eksportu – format wybiera parametr `output`, a nie nagłówek Accept.
+    """
+
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+def _iter_rows(queryset, ordering, archived=None):
+    """
+    Czyta wiersze kursorem po stronie serwera w ramach jednej transakcji
+    (kursor bez WITH HOLD nie jest materializowany przez PostgreSQL w całości).
+    Wiersze archiwum (archive.ArchivedRows) są scalane z nimi w tej samej kolejności.
+    """
+    with transaction.atomic():
+        rows = (
+            queryset.order_by(*ordering)
+            .values_list(*EXPORT_FIELDS)
+            .iterator(chunk_size=settings.MEASUREMENT_EXPORT_CHUNK_SIZE)
+        )
+        if archived is not None and archived.segments:
+            key = itemgetter(*(EXPORT_FIELDS.index(field) for field in ordering))
+            rows = heapq.merge(archived.iterate(key), rows, key=key)
+        yield from rows
+
+
+def _csv_line(row):
+    pk, system_id, timestamp, ph, temperature, tds = row
+    return f"{pk},{system_id},{timestamp.isoformat()},{ph!r},{temperature!r},{tds!r}\n"
+
+
+def _ndjson_line(row):
+    pk, system_id, timestamp, ph, temperature, tds = row
+    return json.dumps({
+        'id': pk,
+        'hydroponic_system': system_id,
+        'timestamp': timestamp.isoformat(),
+        'ph': ph,
+        'temperature': temperature,
+        'tds': tds,
+    }) + "\n"
+
+
+def _encode(rows, output):
+    """
+    Zamienia wiersze na porcje tekstu w wybranym formacie.
+    """
+    line = _csv_line if output == 'csv' else _ndjson_line
+    buffer = ['id,hydroponic_system,timestamp,ph,temperature,tds\n'] if output == 'csv' else []
+    size = 0
+    for row in rows:
+        text = line(row)
+        buffer.append(text)
+        size += len(text)
+        if size >= _FLUSH_SIZE:
+            yield ''.join(buffer).encode()
+            buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer).encode()
+
+
+def _gzip(chunks):
+    """
+    Kompresuje strumień porcji do formatu gzip bez buforowania całości.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+async def _async_chunks(chunks):
+    """
+    Podaje porcje synchronicznego strumienia serwerowi ASGI po jednej. Wywołania thread_sensitive trafiają
+    do wątku obsługującego żądanie, więc transakcja i kursor strumienia działają na tym samym połączeniu.
+    """
+    next_chunk = sync_to_async(next)
+    try:
+        while (chunk := await next_chunk(chunks, None)) is not None:
+            yield chunk
+    finally:
+        await sync_to_async(chunks.close)()  # Zamyka kursor i transakcję także po rozłączeniu klienta
+
+
+def export_response(queryset, output, compress, filename, ordering=('timestamp', 'id'), archived=None,
+                    asynchronous=False):
+    """
+    Buduje StreamingHttpResponse z eksportem pomiarów z querysetu (i z archiwum, jeśli podano `archived`).
+    Kolejność `ordering` może zawierać tylko rosnące pola z EXPORT_FIELDS.
+    `asynchronous=True` dla żądań obsługiwanych przez serwer ASGI.
+    """
+    chunks = _encode(_iter_rows(queryset, ordering, archived), output)
+    filename = f"{filename}.{output}"
+    if compress:
+        chunks = _gzip(chunks)
+        filename += '.gz'
+        content_type = 'application/gzip'
+    else:
+        content_type = f"{EXPORT_FORMATS[output]}; charset=utf-8"
+    if asynchronous:
+        chunks = _async_chunks(chunks)
+
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,115 @@
+"""
+Filtrowanie pomiarów po czasie, systemie i wartościach.
+Wspólne dla API pomiarów, widoku szczegółów systemu i eksportu pomiarów.
+Wszystkie warunki porównują bezpośrednio kolumny (bez rzutowania czasu na datę),
+dzięki czemu zakres czasu korzysta z indeksu (system, timestamp) albo indeksu BRIN.
+"""
+from datetime import datetime, time, timedelta
+
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.timezone import is_naive, make_aware
+from rest_framework.filters import BaseFilterBackend
+
+# Pola, po których można filtrować wartości pomiarów
+VALUE_FILTER_FIELDS = ('ph', 'temperature', 'tds')
+
+
+def parse_bound(value, end=False):
+    """
+    Zamienia datę albo datę z czasem na świadomy strefy datetime (None dla pustej lub niepoprawnej wartości).
+    Sama data jako koniec zakresu oznacza początek następnego dnia, więc zakres [początek, koniec) jest półotwarty.
+    """
+    if not value:
+        return None
+    try:
+        moment = parse_datetime(value)
+        if moment is None:
+            day = parse_date(value)
+            if day is None:
+                return None
+            moment = datetime.combine(day + timedelta(days=1) if end else day, time.min)
+    except ValueError:
+        return None  # Poprawny format, ale nieistniejąca data
+    return make_aware(moment) if is_naive(moment) else moment
+
+
+def _parse_float(value):
+    try:
+        return float(value) if value not in (None, '') else None
+    except ValueError:
+        return None  # Ignorowanie błędów konwersji
+
+
+def _tighter(current, value, pick):
+    return value if current is None else current if value is None else pick(current, value)
+
+
+def parse_measurement_filters(params):
+    """
+    Odczytuje filtry z parametrów zapytania:
+    start_date i end_date (data – koniec włącznie, albo data z czasem – koniec wyłącznie),
+    <pole>_min i <pole>_max dla ph, temperature i tds (dowolnie wiele pól naraz),
+    filter_type, min_value i max_value (zakres jednego pola z formularza) oraz system.
+    Niepoprawne wartości są ignorowane.
+    """
+    ranges = {}
+    for field in VALUE_FILTER_FIELDS:
+        ranges[field] = [_parse_float(params.get(f'{field}_min')), _parse_float(params.get(f'{field}_max'))]
+
+    filter_type = params.get('filter_type', '')
+    min_value, max_value = _parse_float(params.get('min_value')), _parse_float(params.get('max_value'))
+    if filter_type in VALUE_FILTER_FIELDS:
+        bounds = ranges[filter_type]
+        bounds[0], bounds[1] = _tighter(bounds[0], min_value, max), _tighter(bounds[1], max_value, min)
+
+    system = params.get('system', '')
+    start = parse_bound(params.get('start_date'))
+    end = parse_bound(params.get('end_date'), end=True)
+    return {
+        'start': start,
+        'end': end,
+        'system': int(system) if system.isdigit() else None,
+        'ranges': {field: tuple(bounds) for field, bounds in ranges.items() if bounds != [None, None]},
+        # Wartości do ponownego wyświetlenia w formularzu
+        'start_date': params.get('start_date', '') if start else '',
+        'end_date': params.get('end_date', '') if end else '',
+        'filter_type': filter_type,
+        'min_value': min_value,
+        'max_value': max_value,
+    }
+
+
+def has_filters(filters):
+    """
+    Czy filtry zawężają pomiary (a nie tylko zawierają puste pola formularza).
+    """
+    return any(filters[key] is not None for key in ('start', 'end', 'system')) or bool(filters['ranges'])
+
+
+def filter_measurements(queryset, filters):
+    """
+    Zawęża queryset pomiarów według filtrów zwróconych przez parse_measurement_filters.
+    Granice równe 0 są uwzględniane tak samo jak pozostałe.
+    """
+    conditions = {}
+    if filters['system'] is not None:
+        conditions['hydroponic_system_id'] = filters['system']
+    if filters['start'] is not None:
+        conditions['timestamp__gte'] = filters['start']
+    if filters['end'] is not None:
+        conditions['timestamp__lt'] = filters['end']
+    for field, (low, high) in filters['ranges'].items():
+        if low is not None:
+            conditions[f'{field}__gte'] = low
+        if high is not None:
+            conditions[f'{field}__lte'] = high
+    return queryset.filter(**conditions) if conditions else queryset
+
+
+class MeasurementFilterBackend(BaseFilterBackend):
+    """
+    Backend filtrów DRF dla pomiarów (parametry jak w parse_measurement_filters).
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        return filter_measurements(queryset, parse_measurement_filters(request.query_params))
@@ -0,0 +1,344 @@
+"""
+Okno ostatnich pomiarów w pamięci współdzielonej wszystkich procesów serwera na jednym węźle.
+Plik HOT_WINDOW_PATH (domyślnie w /dev/shm) jest mapowany przez mmap i podzielony na sloty;
+każdy slot to bufor cykliczny HOT_WINDOW_SIZE ostatnich pomiarów jednego systemu (system % liczba slotów).
+Zapis po zatwierdzeniu transakcji pomiarów odbywa się pod blokadą fcntl slotu, a odczyt bez blokad –
+licznik sekwencji (seqlock) pozwala wykryć zapis w trakcie kopiowania i powtórzyć odczyt.
+
+Slot pamięta też "znak wodny": największą pozycję (czas, id) pomiaru systemu, którego w slocie nie ma.
+Strona najnowszych pomiarów jest zwracana z pamięci tylko wtedy, gdy wszystkie jej wiersze leżą
+powyżej znaku wodnego, więc wynik jest taki sam jak z bazy; w pozostałych przypadkach (pusty slot,
+slot zajęty przez inny system, restart węzła) odczyt wraca do PostgreSQL.
+Okno zakłada, że zapisy i odczyty systemu obsługuje ten sam węzeł (jak kanał na żywo w live.py).
+"""
+import fcntl
+import hashlib
+import mmap
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import archive
+from .models import Measurement
+from .pagination import KeysetPage, encode_cursor
+
+MAGIC = b'HYDWIN01'
+HEADER_SIZE = 64
+
+HEADER_DTYPE = np.dtype([
+    ('magic', 'S8'), ('slots', '<i8'), ('capacity', '<i8'), ('database', '<i8'), ('reserved', '<i8', 4),
+])
+SLOT_HEADER_DTYPE = np.dtype([
+    ('system_id', '<i8'),  # System zajmujący slot (0 – slot pusty)
+    ('seq', '<u8'),  # Licznik sekwencji: nieparzysty w trakcie zapisu
+    ('count', '<u8'),  # Liczba zapisanych rekordów (pozycja zapisu = count % capacity)
+    ('mark_time', '<i8'),  # Znak wodny: czas (mikrosekundy od epoki) ...
+    ('mark_id', '<i8'),  # ... i id najnowszego pomiaru spoza slotu
+    ('reserved', '<i8', 3),
+])
+RECORD_DTYPE = np.dtype([
+    ('id', '<i8'), ('time', '<i8'), ('ph', '<f8'), ('temperature', '<f8'), ('tds', '<f8'),
+])
+METRICS = ('ph', 'temperature', 'tds')
+
+# Znak wodny slotu, poza którym system nie ma żadnych pomiarów
+NO_MARK = np.iinfo(np.int64).min
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+# Liczba prób odczytu kolidującego z zapisem przed rezygnacją na rzecz bazy
+READ_RETRIES = 5
+
+
+def _micros(moment):
+    return (moment - _EPOCH) // _MICROSECOND
+
+
+def _moment(micros):
+    return _EPOCH + timedelta(microseconds=int(micros))
+
+
+def _database_identity():
+    """
+    Identyfikator bazy danych zapisany w nagłówku pliku; po odtworzeniu bazy (np. testowej)
+    pod tą samą nazwą zmienia się jej oid, więc okno nie zwróci pomiarów ze starej bazy.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT oid FROM pg_database WHERE datname = current_database()")
+        oid = cursor.fetchone()[0]
+    database = settings.DATABASES['default']
+    raw = f"{database.get('HOST')}:{database.get('PORT')}/{database.get('NAME')}/{oid}".encode()
+    return int.from_bytes(hashlib.blake2b(raw, digest_size=8).digest(), 'little', signed=True)
+
+
+class HotWindow:
+    """
+    Bufory cykliczne ostatnich pomiarów systemów w pliku mapowanym do pamięci.
+    """
+
+    def __init__(self, path, slots, capacity, database):
+        self.capacity = capacity
+        self.slot_dtype = np.dtype([('header', SLOT_HEADER_DTYPE), ('records', RECORD_DTYPE, (capacity,))])
+        self.slot_size = self.slot_dtype.itemsize
+        size = HEADER_SIZE + slots * self.slot_size
+
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        with self._locked(0, HEADER_SIZE):
+            if os.fstat(self._fd).st_size != size:
+                os.ftruncate(self._fd, size)  # Nowy plik jest wypełniony zerami, czyli pustymi slotami
+            self._mmap = mmap.mmap(self._fd, size)
+            self.slots = np.ndarray((slots,), dtype=self.slot_dtype, buffer=self._mmap, offset=HEADER_SIZE)
+            header = np.ndarray((), dtype=HEADER_DTYPE, buffer=self._mmap)
+            expected = (MAGIC, slots, capacity, database)
+            if (header['magic'], header['slots'], header['capacity'], header['database']) != expected:
+                # Nowy plik, inny układ albo inna baza danych – zaczynamy od pustych slotów
+                headers = self.slots['header']
+                headers['system_id'] = 0
+                headers['count'] = 0
+                header['magic'], header['slots'], header['capacity'], header['database'] = expected
+        self._lock = threading.Lock()
+
+    def _slot_index(self, system_id):
+        return system_id % len(self.slots)
+
+    @contextmanager
+    def _locked(self, offset, length):
+        """
+        Wyłączny dostęp do zakresu pliku między procesami (blokada fcntl).
+        """
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, length, offset)
+        try:
+            yield
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, length, offset)
+
+    @contextmanager
+    def _writing(self, index):
+        """
+        Zapis slotu: blokada wątków procesu, blokada fcntl slotu i nieparzysty licznik sekwencji na czas zmian.
+        """
+        with self._lock, self._locked(HEADER_SIZE + index * self.slot_size, self.slot_size):
+            header = self.slots[index]['header']
+            header['seq'] += 1
+            try:
+                yield self.slots[index]
+            finally:
+                header['seq'] += 1
+
+    def _snapshot(self, system_id):
+        """
+        Spójna kopia rekordów slotu systemu posortowana od najnowszych i znak wodny (czas, id).
+        Zwraca None, gdy slot należy do innego systemu albo odczyt stale koliduje z zapisem.
+        """
+        slot = self.slots[self._slot_index(system_id)]
+        header = slot['header']
+        for _ in range(READ_RETRIES):
+            before = int(header['seq'])
+            if before % 2:
+                continue
+            owner, count = int(header['system_id']), int(header['count'])
+            mark = (int(header['mark_time']), int(header['mark_id']))
+            records = slot['records'][:min(count, self.capacity)].copy()
+            if int(header['seq']) != before:
+                continue
+            if owner != system_id:
+                return None
+            order = np.lexsort((-records['id'], -records['time']))
+            return records[order], mark
+        return None
+
+    def latest(self, system_id, limit):
+        """
+        Zwraca do `limit` najnowszych pomiarów systemu (tablica rekordów, od najnowszych) oraz informację,
+        czy istnieją starsze; None, jeśli okno nie zawiera na pewno wszystkich tych pomiarów.
+        """
+        snapshot = self._snapshot(system_id)
+        if snapshot is None:
+            return None
+        records, (mark_time, mark_id) = snapshot
+        # Rekordy powyżej znaku wodnego – żaden pomiar spoza slotu nie jest od nich nowszy
+        above = (records['time'] > mark_time) | ((records['time'] == mark_time) & (records['id'] > mark_id))
+        trusted = int(np.argmin(above)) if not above.all() else len(records)
+        if trusted < limit and mark_time != NO_MARK:
+            return None
+        return records[:limit], len(records) > limit or mark_time != NO_MARK
+
+    def _seed(self, slot, system_id):
+        """
+        Przejmuje slot dla systemu i wypełnia go najnowszymi pomiarami z bazy.
+        """
+        rows = list(
+            Measurement.objects.filter(hydroponic_system_id=system_id)
+            .order_by('-timestamp', '-id')
+            .values_list('id', 'timestamp', *METRICS)[:self.capacity + 1]
+        )
+        header = slot['header']
+        header['system_id'] = system_id
+        header['count'] = 0
+        if len(rows) > self.capacity:
+            outside = rows.pop()
+            header['mark_time'], header['mark_id'] = _micros(outside[1]), outside[0]
+        else:
+            # Starsze pomiary systemu mogą być w archiwum kolumnowym – wtedy okno nie zawiera całej historii
+            archived = archive.newest_position(system_id)
+            header['mark_time'], header['mark_id'] = (_micros(archived[0]), archived[1]) if archived else (NO_MARK, 0)
+        records = np.array([(pk, _micros(moment), *values) for pk, moment, *values in reversed(rows)], RECORD_DTYPE)
+        self._append(slot, records)
+
+    def _append(self, slot, records):
+        """
+        Dopisuje rekordy do bufora cyklicznego, przesuwając znak wodny o rekordy, które z niego wypadły.
+        """
+        if not len(records):
+            return
+        header = slot['header']
+        count = int(header['count'])
+        capacity = self.capacity
+        stored = min(count, capacity)
+
+        overflow = stored + len(records) - capacity
+        if overflow > 0:
+            # Wypadają najstarsze zapisane rekordy, a przy bardzo dużej partii także jej początek
+            start = (count - stored) % capacity
+            old = np.take(slot['records'], np.arange(start, start + min(overflow, stored)) % capacity)
+            dropped = np.concatenate((old, records[:max(0, len(records) - capacity)]))
+            newest = dropped[np.lexsort((dropped['id'], dropped['time']))[-1]]
+            mark = (int(header['mark_time']), int(header['mark_id']))
+            if (int(newest['time']), int(newest['id'])) > mark:
+                header['mark_time'], header['mark_id'] = newest['time'], newest['id']
+            records = records[-capacity:]
+
+        positions = (count + np.arange(len(records))) % capacity
+        slot['records'][positions] = records
+        header['count'] = count + len(records)
+
+    def record(self, measurements):
+        """
+        Dopisuje zapisane (zatwierdzone) pomiary do slotów ich systemów.
+        Slot zajęty przez inny system albo pusty jest najpierw wypełniany z bazy.
+        """
+        by_system = {}
+        for measurement in measurements:
+            by_system.setdefault(measurement.hydroponic_system_id, []).append(measurement)
+
+        for system_id, items in sorted(by_system.items()):
+            records = np.array(
+                [(m.id, _micros(m.timestamp), m.ph, m.temperature, m.tds) for m in items], RECORD_DTYPE
+            )
+            index = self._slot_index(system_id)
+            with self._writing(index) as slot:
+                if int(slot['header']['system_id']) != system_id:
+                    # Pomiary partii są już zatwierdzone, więc trafiają do slotu razem z resztą z bazy
+                    self._seed(slot, system_id)
+                    continue
+                stored = min(int(slot['header']['count']), self.capacity)
+                present = slot['records']['id'][:stored] if stored < self.capacity else slot['records']['id']
+                self._append(slot, records[~np.isin(records['id'], present)])
+
+    def forget(self, system_id):
+        """
+        Zwalnia slot systemu (po usunięciu lub zmianie jego pomiarów); kolejne odczyty idą do bazy.
+        """
+        index = self._slot_index(system_id)
+        with self._writing(index) as slot:
+            if int(slot['header']['system_id']) == system_id:
+                slot['header']['system_id'] = 0
+                slot['header']['count'] = 0
+
+    def clear(self):
+        """
+        Zwalnia wszystkie sloty (np. po usunięciu pomiarów poza API).
+        """
+        for index in range(len(self.slots)):
+            with self._writing(index) as slot:
+                slot['header']['system_id'] = 0
+                slot['header']['count'] = 0
+
+
+_window = None
+_window_pid = None
+_window_lock = threading.Lock()
+
+
+def is_enabled():
+    return bool(settings.HOT_WINDOW_PATH)
+
+
+def get_window():
+    """
+    Zwraca okno bieżącego procesu (mapowanie pliku tworzone przy pierwszym użyciu i po fork).
+    """
+    global _window, _window_pid
+    with _window_lock:
+        if _window is None or _window_pid != os.getpid():
+            _window = HotWindow(
+                settings.HOT_WINDOW_PATH, settings.HOT_WINDOW_SYSTEMS, settings.HOT_WINDOW_SIZE, _database_identity()
+            )
+            _window_pid = os.getpid()
+        return _window
+
+
+def record(measurements):
+    """
+    Dopisuje pomiary do okna (wywoływana po zatwierdzeniu transakcji zapisu).
+    """
+    if is_enabled() and measurements:
+        get_window().record(measurements)
+
+
+def forget(system_id):
+    if is_enabled():
+        get_window().forget(system_id)
+
+
+def clear():
+    if is_enabled():
+        get_window().clear()
+
+
+@receiver(post_delete, sender=Measurement)
+@receiver(post_save, sender=Measurement)
+def forget_changed(instance, **kwargs):
+    """
+    Dodanie, zmiana lub usunięcie pomiaru przez model (API, panel administracyjny) zwalnia slot jego systemu
+    po zatwierdzeniu transakcji – także pomiaru zapisanego z pominięciem after_ingest, którego okno by nie zawierało.
+    Zapis przez after_ingest wypełnia potem slot ponownie z bazy.
+    """
+    system_id = instance.hydroponic_system_id
+    transaction.on_commit(lambda: forget(system_id))
+
+
+def to_measurements(system_id, records):
+    """
+    Zamienia rekordy okna na instancje Measurement (jak wczytane z bazy) dla serializerów i szablonów.
+    Okno nie przechowuje kluczy deduplikacji (pole dedup_key jest puste).
+    """
+    # from_db przekazuje wartości pozycyjnie (kolejność pól modelu) – szybciej niż argumenty nazwane
+    return [
+        Measurement.from_db(None, None, (pk, system_id, _moment(micros), ph, temperature, tds, None))
+        for pk, micros, ph, temperature, tds in records.tolist()
+    ]
+
+
+def first_page(system_id, page_size):
+    """
+    Pierwsza strona pomiarów systemu (od najnowszych) w postaci KeysetPage – taka sama jak z paginate().
+    Zwraca None, gdy stronę trzeba odczytać z bazy.
+    """
+    if not is_enabled() or page_size > settings.HOT_WINDOW_SIZE:
+        return None
+    result = get_window().latest(system_id, page_size)
+    if result is None:
+        return None
+    records, has_more = result
+    rows = to_measurements(system_id, records)
+    next_cursor = encode_cursor(rows[-1].timestamp, rows[-1].id) if rows and has_more else None
+    return KeysetPage(rows, next_cursor)
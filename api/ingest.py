@@ -0,0 +1,362 @@
+"""
+Zapis pomiarów w partiach.
+Waliduje wiersze bez tworzenia serializera dla każdego z nich, sprawdza
+uprawnienia do wszystkich systemów jednym zapytaniem i zapisuje pomiary przez bulk_create.
+Pomiary z kluczem deduplikacji (dedup_key) zapisywane są przez INSERT ... ON CONFLICT DO NOTHING –
+ponowione wysłanie tej samej partii (np. po przekroczeniu czasu odpowiedzi) nie tworzy duplikatów.
+"""
+import itertools
+from datetime import datetime, timezone
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+from django.utils.timezone import is_naive, make_aware
+
+from . import alerts, hotwindow, live, response_cache, rollups, summary
+from .authentication import DevicePrincipal
+from .models import HydroponicSystem, Measurement
+from .parsers import NDJSONLineError
+
+# Pola z wartościami pomiarów
+MEASUREMENT_FIELDS = ("ph", "temperature", "tds")
+
+REQUIRED_MESSAGE = "To pole jest wymagane."
+NUMBER_MESSAGE = "Wymagana jest liczba."
+OWNER_MESSAGE = "Nie masz uprawnień do dodawania pomiarów do tego systemu."
+TIMESTAMP_MESSAGE = "Niepoprawny czas pomiaru."
+DEDUP_KEY_MESSAGE = "Klucz deduplikacji musi być tekstem lub liczbą całkowitą (do {max_length} znaków)."
+DEDUP_TIMESTAMP_MESSAGE = "Pomiar z kluczem deduplikacji musi mieć czas pomiaru (timestamp)."
+
+DEDUP_KEY_MAX_LENGTH = Measurement._meta.get_field("dedup_key").max_length
+MEASUREMENT_TABLE = Measurement._meta.db_table
+# Kolumny zapisywane przez INSERT ... ON CONFLICT (pomiary z kluczem deduplikacji)
+INSERT_COLUMNS = ("hydroponic_system_id", "timestamp", *MEASUREMENT_FIELDS, "dedup_key")
+
+
+def _parse_number(value):
+    """
+    Zamienia wartość z JSON na float; zwraca None, jeśli nie jest liczbą.
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+
+def latest_timestamp():
+    """
+    Najpóźniejszy akceptowany czas pomiaru z urządzenia (teraz + dopuszczalne przesunięcie zegara).
+    """
+    return datetime.now(timezone.utc).timestamp() + settings.MEASUREMENT_MAX_CLOCK_SKEW
+
+
+def _parse_timestamp(value):
+    """
+    Zamienia czas pomiaru z JSON (ISO 8601 albo sekundy od epoki Unix) na datę ze strefą czasową;
+    zwraca None dla wartości niepoprawnej albo z przyszłości.
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        if not 0 < value <= latest_timestamp():  # Odrzuca też NaN
+            return None
+        return datetime.fromtimestamp(value, timezone.utc)
+    if not isinstance(value, str):
+        return None
+    try:
+        moment = parse_datetime(value)
+    except ValueError:
+        return None
+    if moment is None:
+        return None
+    if is_naive(moment):
+        moment = make_aware(moment)
+    if not 0 < moment.timestamp() <= latest_timestamp():
+        return None
+    return moment
+
+
+def _parse_dedup_key(value):
+    """
+    Zwraca klucz deduplikacji jako tekst (liczby całkowite, np. numery sekwencyjne, są zamieniane na tekst)
+    albo None, jeśli wartość jest niepoprawna.
+    """
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        return None
+    value = str(value)
+    if not value or len(value) > DEDUP_KEY_MAX_LENGTH:
+        return None
+    return value
+
+
+def parse_row(row):
+    """
+    Waliduje pojedynczy wiersz partii.
+    Zwraca krotkę (dane, błędy) – dokładnie jeden z elementów jest pusty.
+    """
+    if isinstance(row, NDJSONLineError):
+        return None, {"non_field_errors": [row.message]}
+    if not isinstance(row, dict):
+        return None, {"non_field_errors": ["Oczekiwano obiektu JSON."]}
+
+    data, errors = {}, {}
+
+    system_id = row.get("hydroponic_system")
+    if system_id is None:
+        errors["hydroponic_system"] = [REQUIRED_MESSAGE]
+    elif isinstance(system_id, bool) or not isinstance(system_id, (int, str)) or not str(system_id).isdigit():
+        errors["hydroponic_system"] = ["Wymagany jest identyfikator systemu."]
+    else:
+        data["hydroponic_system_id"] = int(system_id)
+
+    for field in MEASUREMENT_FIELDS:
+        if row.get(field) is None:
+            errors[field] = [REQUIRED_MESSAGE]
+            continue
+        value = _parse_number(row[field])
+        if value is None:
+            errors[field] = [NUMBER_MESSAGE]
+        else:
+            data[field] = value
+
+    # Opcjonalny czas pomiaru z urządzenia (domyślnie czas zapisu) i klucz deduplikacji
+    if row.get("timestamp") is not None:
+        moment = _parse_timestamp(row["timestamp"])
+        if moment is None:
+            errors["timestamp"] = [TIMESTAMP_MESSAGE]
+        else:
+            data["timestamp"] = moment
+    if row.get("dedup_key") is not None:
+        dedup_key = _parse_dedup_key(row["dedup_key"])
+        if dedup_key is None:
+            errors["dedup_key"] = [DEDUP_KEY_MESSAGE.format(max_length=DEDUP_KEY_MAX_LENGTH)]
+        elif row.get("timestamp") is None:
+            errors["dedup_key"] = [DEDUP_TIMESTAMP_MESSAGE]
+        else:
+            data["dedup_key"] = dedup_key
+
+    if errors:
+        return None, errors
+    return data, None
+
+
+def owned_system_ids(user, system_ids):
+    """
+    Zwraca zbiór identyfikatorów systemów należących do użytkownika (jedno zapytanie).
+    Dla klucza urządzenia jest to tylko jego system, sprawdzany bez zapytania.
+    """
+    if not system_ids:
+        return set()
+    if isinstance(user, DevicePrincipal):
+        return {user.hydroponic_system_id} & set(system_ids)
+    return set(
+        HydroponicSystem.objects.filter(owner=user, id__in=system_ids).values_list("id", flat=True)
+    )
+
+
+def after_ingest(measurements):
+    """
+    Wykonuje zadania następujące po zapisie pomiarów (aktualizację najnowszego stanu systemów i agregatów
+    oraz sprawdzenie reguł alertów). Wywoływana w tej samej transakcji co zapis pomiarów;
+    powiadomienia i unieważnienie odpowiedzi w pamięci podręcznej następują po jej zatwierdzeniu.
+    """
+    if not measurements:
+        return
+    summary.update_latest(measurements)
+    if settings.MEASUREMENT_ROLLUPS_ON_INGEST:
+        rollups.apply_measurements(measurements)
+    if settings.ALERTS_ON_INGEST:
+        alerts.evaluate(measurements)
+    transaction.on_commit(lambda: hotwindow.record(measurements))
+    transaction.on_commit(
+        lambda: response_cache.invalidate_systems({measurement.hydroponic_system_id for measurement in measurements})
+    )
+    transaction.on_commit(lambda: live.publish_measurements(measurements))
+
+
+def dedup_identity(measurement):
+    """
+    Wartości unikalnego ograniczenia measurement_dedup_unique dla pomiaru.
+    """
+    return measurement.hydroponic_system_id, measurement.dedup_key, measurement.timestamp
+
+
+def _insert_keyed(measurements):
+    """
+    Zapisuje pomiary z kluczem deduplikacji przez INSERT ... ON CONFLICT DO NOTHING w partiach.
+    Pomiary już zapisane są pomijane przez bazę, a powtórzone w tej samej partii – przed zapytaniem.
+    Zapisanym instancjom ustawia identyfikatory (jak bulk_create).
+    """
+    pending = {}
+    for measurement in measurements:
+        pending.setdefault(dedup_identity(measurement), measurement)
+    pending = list(pending.values())
+
+    columns = ", ".join(f'"{column}"' for column in INSERT_COLUMNS)
+    placeholders = "(" + ", ".join(["%s"] * len(INSERT_COLUMNS)) + ")"
+    with connection.cursor() as cursor:
+        for start in range(0, len(pending), settings.MEASUREMENT_BULK_BATCH_SIZE):
+            batch = pending[start:start + settings.MEASUREMENT_BULK_BATCH_SIZE]
+            params = []
+            for measurement in batch:
+                params.extend(getattr(measurement, column) for column in INSERT_COLUMNS)
+            cursor.execute(
+                f'INSERT INTO "{MEASUREMENT_TABLE}" ({columns}) VALUES {", ".join([placeholders] * len(batch))} '
+                f'ON CONFLICT DO NOTHING '
+                f'RETURNING "id", "hydroponic_system_id", "dedup_key", "timestamp"',
+                params,
+            )
+            by_identity = {dedup_identity(measurement): measurement for measurement in batch}
+            for pk, *identity in cursor.fetchall():
+                measurement = by_identity[tuple(identity)]
+                measurement.id = pk
+                measurement._state.adding = False
+                measurement._state.db = connection.alias
+
+
+def write_measurements(measurements):
+    """
+    Zapisuje listę niezapisanych instancji Measurement w partiach.
+    Pomiary z kluczem deduplikacji, które już są w bazie, są pomijane.
+    Zwraca zapisane instancje (z identyfikatorami) – tylko dla nich wykonywane jest after_ingest.
+    """
+    if not measurements:
+        return []
+    keyed = [measurement for measurement in measurements if measurement.dedup_key is not None]
+    plain = [measurement for measurement in measurements if measurement.dedup_key is None] if keyed else measurements
+    try:
+        with transaction.atomic():
+            created = Measurement.objects.bulk_create(plain, batch_size=settings.MEASUREMENT_BULK_BATCH_SIZE)
+            if keyed:
+                _insert_keyed(keyed)
+                # Kolejność wejściowa; pominięte duplikaty pozostają niezapisane (_state.adding)
+                created = [measurement for measurement in measurements if not measurement._state.adding]
+            after_ingest(created)
+    except Exception:
+        # Zapis wycofany – identyfikatory nadane przez wcześniejsze partie są nieważne, a ponowienie
+        # (np. bufor zapisu) musi traktować instancje jako niezapisane
+        for measurement in measurements:
+            measurement.id = None
+            measurement._state.adding = True
+        raise
+    return created
+
+
+def bulk_ingest(user, rows):
+    """
+    Importuje partię wierszy w imieniu użytkownika.
+    Niepoprawne wiersze oraz wiersze dla cudzych systemów są pomijane i raportowane,
+    pozostałe zapisywane są razem; wiersze już zapisane (ten sam klucz deduplikacji) są pomijane bez błędu.
+    Zwraca krotkę (zapisane pomiary, błędy).
+    """
+    errors = []
+    parsed = []
+    for index, row in enumerate(rows):
+        data, row_errors = parse_row(row)
+        if row_errors:
+            errors.append({"index": index, "errors": row_errors})
+        else:
+            parsed.append((index, data))
+
+    # Sprawdzenie uprawnień dla wszystkich systemów jednym zapytaniem
+    allowed = owned_system_ids(user, {data["hydroponic_system_id"] for _, data in parsed})
+
+    measurements = []
+    for index, data in parsed:
+        if data["hydroponic_system_id"] not in allowed:
+            errors.append({
+                "index": index,
+                "errors": {"hydroponic_system": [OWNER_MESSAGE]},
+            })
+            continue
+        measurements.append(Measurement(**data))
+
+    errors.sort(key=lambda error: error["index"])
+    return write_measurements(measurements), errors
+
+
+def _range_message(low, high):
+    return f"Wartość musi być liczbą z zakresu {low}–{high}."
+
+
+def validate_batch(records):
+    """
+    Sprawdza zakresy wszystkich rekordów partii binarnej naraz (operacje na całych kolumnach).
+    Zwraca maskę poprawnych rekordów i listę błędów dla pozostałych.
+    """
+    invalid = {}
+    for field in MEASUREMENT_FIELDS:
+        low, high = settings.MEASUREMENT_VALUE_RANGES[field]
+        column = records[field]
+        # NaN nie spełnia żadnego porównania, więc odpada razem z wartościami spoza zakresu
+        invalid[field] = ~((column >= low) & (column <= high))
+
+    latest = latest_timestamp()
+    invalid["timestamp"] = ~((records["timestamp"] > 0) & (records["timestamp"] <= latest))
+
+    bad = np.zeros(len(records), dtype=bool)
+    for mask in invalid.values():
+        bad |= mask
+
+    errors = []
+    for index in np.flatnonzero(bad).tolist():
+        row_errors = {}
+        for field, mask in invalid.items():
+            if mask[index]:
+                if field == "timestamp":
+                    row_errors[field] = [TIMESTAMP_MESSAGE]
+                else:
+                    row_errors[field] = [_range_message(*settings.MEASUREMENT_VALUE_RANGES[field])]
+        errors.append({"index": index, "errors": row_errors})
+    return ~bad, errors
+
+
+def _widen(column):
+    """
+    Zamienia kolumnę float32 na listę float, zaokrąglając do 6 cyfr znaczących
+    (precyzja float32), żeby np. pH 6.2 nie zapisało się jako 6.199999809265137.
+    """
+    values = column.astype(np.float64)
+    magnitude = np.floor(np.log10(np.abs(values), out=np.zeros_like(values), where=values != 0))
+    scale = 10.0 ** (5 - magnitude)
+    return (np.round(values * scale) / scale).tolist()
+
+
+def binary_ingest(user, batch):
+    """
+    Importuje partię binarną (MeasurementBatch) w imieniu użytkownika.
+    Zwraca krotkę (zapisane pomiary, błędy) jak bulk_ingest; partia dla cudzego
+    systemu jest odrzucana w całości (PermissionError).
+    """
+    if batch.system_id not in owned_system_ids(user, {batch.system_id}):
+        raise PermissionError(OWNER_MESSAGE)
+
+    valid, errors = validate_batch(batch.records)
+    records = batch.records[valid]
+
+    columns = [records["timestamp"].tolist(), *(_widen(records[field]) for field in MEASUREMENT_FIELDS)]
+    # Numery sekwencyjne (format HYD2) są kluczami deduplikacji
+    if "sequence" in records.dtype.names:
+        dedup_keys = map(str, records["sequence"].tolist())
+    else:
+        dedup_keys = itertools.repeat(None)
+    measurements = [
+        Measurement(
+            hydroponic_system_id=batch.system_id,
+            timestamp=datetime.fromtimestamp(timestamp, timezone.utc),
+            ph=ph,
+            temperature=temperature,
+            tds=tds,
+            dedup_key=dedup_key,
+        )
+        for timestamp, ph, temperature, tds, dedup_key in zip(*columns, dedup_keys)
+    ]
+    return write_measurements(measurements), errors
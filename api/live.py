@@ -0,0 +1,121 @@
+"""
+Rozgłaszanie nowych pomiarów do przeglądarek (Server-Sent Events).
+Subskrybenci zapisują się na kanał systemu w ramach procesu; jedno zdarzenie zapisu
+jest serializowane raz i trafia do kolejek wszystkich subskrybentów danego systemu.
+Kanał działa tylko pod serwerem ASGI (hydroponic/asgi.py).
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+
+
+class Subscription:
+    """
+    Kolejka zdarzeń jednego subskrybenta, związana z pętlą zdarzeń jego połączenia.
+    """
+
+    def __init__(self, loop, maxsize):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    def offer(self, message):
+        """
+        Dodaje zdarzenie do kolejki; przy przepełnieniu usuwa najstarsze (wolny klient nie blokuje zapisu).
+        Wywoływana wyłącznie w pętli zdarzeń subskrybenta.
+        """
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+
+class Broadcaster:
+    """
+    Rejestr subskrybentów kanałów systemów w bieżącym procesie.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, system_id):
+        """
+        Zapisuje bieżące połączenie (wywołanie z pętli zdarzeń) na kanał systemu.
+        """
+        subscription = Subscription(asyncio.get_running_loop(), settings.LIVE_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers[system_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, system_id, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(system_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[system_id]
+
+    def has_subscribers(self, system_id):
+        return system_id in self._subscribers
+
+    def publish(self, system_id, message):
+        """
+        Przekazuje zdarzenie wszystkim subskrybentom systemu; bezpieczne z dowolnego wątku.
+        """
+        with self._lock:
+            subscribers = list(self._subscribers.get(system_id, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, message)
+            except RuntimeError:
+                self.unsubscribe(system_id, subscription)  # Pętla połączenia została już zamknięta
+
+
+broadcaster = Broadcaster()
+
+
+def sse_message(event, data):
+    """
+    Formatuje zdarzenie w formacie Server-Sent Events.
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def publish_measurements(measurements):
+    """
+    Rozsyła zapisane pomiary subskrybentom ich systemów (jedno zdarzenie na system).
+    Systemy bez subskrybentów są pomijane bez serializacji.
+    """
+    by_system = defaultdict(list)
+    for measurement in measurements:
+        if broadcaster.has_subscribers(measurement.hydroponic_system_id):
+            by_system[measurement.hydroponic_system_id].append({
+                "id": measurement.id,
+                "timestamp": measurement.timestamp.isoformat(),
+                "ph": measurement.ph,
+                "temperature": measurement.temperature,
+                "tds": measurement.tds,
+            })
+    for system_id, payload in by_system.items():
+        broadcaster.publish(system_id, sse_message("measurements", payload))
+
+
+async def event_stream(system_id):
+    """
+    Strumień zdarzeń SSE dla jednego połączenia. Co LIVE_HEARTBEAT_SECONDS wysyła komentarz,
+    żeby pośrednicy nie zamykali bezczynnego połączenia.
+    """
+    subscription = broadcaster.subscribe(system_id)
+    try:
+        yield "retry: 5000\n\n"
+        while True:
+            try:
+                message = await asyncio.wait_for(subscription.queue.get(), timeout=settings.LIVE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            yield message
+    finally:
+        broadcaster.unsubscribe(system_id, subscription)
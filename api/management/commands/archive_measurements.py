@@ -0,0 +1,48 @@
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import archive
+from api.models import HydroponicSystem, Measurement
+
+
+class Command(BaseCommand):
+    """
+    Przenosi stare pomiary z bazy do archiwum kolumnowego (api/archive.py) – segment na system i miesiąc,
+    każdy w osobnej transakcji. Przerwane zadanie można uruchomić ponownie; przeniesione pomiary nie są
+    archiwizowane drugi raz, a pomiary dopisane później z dawnym czasem trafiają do nowych segmentów.
+    """
+
+    help = "Przenosi całe miesiące pomiarów starszych niż MEASUREMENT_ARCHIVE_AFTER_DAYS dni do plików archiwum kolumnowego."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--system', type=int, action='append', dest='systems', help="Identyfikator systemu (można powtarzać).")
+        parser.add_argument('--older-than-days', type=int, help="Wiek archiwizowanych pomiarów (domyślnie z ustawień).")
+        parser.add_argument('--dry-run', action='store_true', help="Tylko raport: co zostałoby przeniesione.")
+
+    def handle(self, *args, **options):
+        if not archive.is_enabled():
+            raise CommandError("Archiwum jest wyłączone (MEASUREMENT_ARCHIVE_ROOT = None).")
+        cutoff = archive.archive_cutoff(datetime.now(timezone.utc), options['older_than_days'])
+        systems = HydroponicSystem.objects.order_by('id')
+        if options['systems']:
+            systems = systems.filter(id__in=options['systems'])
+
+        total = 0
+        for system_id in systems.values_list('id', flat=True):
+            if options['dry_run']:
+                count = Measurement.objects.filter(hydroponic_system_id=system_id, timestamp__lt=cutoff).count()
+                if count:
+                    self.stdout.write(f"System {system_id}: {count} pomiarów do przeniesienia")
+                total += count
+                continue
+            for month in archive.pending_months(system_id, cutoff):
+                segment = archive.archive_month(system_id, month, cutoff)
+                if segment is not None:
+                    total += segment.count
+                    self.stdout.write(f"System {system_id}: {segment.path} ({segment.count} pomiarów)")
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f"Razem do przeniesienia: {total} (bez zmian w bazie)"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Przeniesiono pomiarów: {total}"))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.authentication import create_key
+from api.models import HydroponicSystem
+
+
+class Command(BaseCommand):
+    """
+    Tworzy klucz urządzenia dla systemu i wypisuje jego token.
+    Token nie jest przechowywany w bazie – należy go od razu zapisać w urządzeniu.
+    """
+
+    help = "Tworzy klucz urządzenia (czujnika) przypisany do systemu hydroponicznego."
+
+    def add_arguments(self, parser):
+        parser.add_argument('system', type=int, help="Identyfikator systemu.")
+        parser.add_argument('--name', default='', help="Opis urządzenia.")
+
+    def handle(self, *args, **options):
+        try:
+            system = HydroponicSystem.objects.get(id=options['system'])
+        except HydroponicSystem.DoesNotExist:
+            raise CommandError(f"System {options['system']} nie istnieje.")
+
+        device_key, token = create_key(system, options['name'])
+        self.stdout.write(f"Klucz {device_key.key_id} dla systemu {system.id} ({system.name})")
+        self.stdout.write(self.style.SUCCESS(f"Authorization: Device {token}"))
@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.partitions import convert_to_partitioned, ensure_partitions, is_partitioned
+
+
+class Command(BaseCommand):
+    """
+    Tworzy z wyprzedzeniem miesięczne partycje tabeli pomiarów.
+    Z opcją --convert jednorazowo zamienia zwykłą tabelę na partycjonowaną.
+    """
+
+    help = "Tworzy miesięczne partycje tabeli pomiarów na kolejne miesiące."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months', type=int, default=settings.MEASUREMENT_PARTITION_MONTHS_AHEAD,
+            help="Liczba miesięcy do przodu, dla których tworzone są partycje.",
+        )
+        parser.add_argument(
+            '--convert', action='store_true',
+            help="Zamienia tabelę pomiarów na partycjonowaną (blokuje tabelę na czas operacji).",
+        )
+
+    def handle(self, *args, **options):
+        months = options['months']
+        if months < 0:
+            raise CommandError("Liczba miesięcy nie może być ujemna.")
+
+        try:
+            if options['convert']:
+                created = convert_to_partitioned(months)
+                self.stdout.write(self.style.SUCCESS("Tabela pomiarów jest teraz partycjonowana."))
+            elif is_partitioned():
+                created = ensure_partitions(months)
+            else:
+                raise CommandError("Tabela pomiarów nie jest partycjonowana. Użyj opcji --convert.")
+        except RuntimeError as exc:
+            raise CommandError(str(exc))
+
+        for name in created:
+            self.stdout.write(f"Utworzono partycję {name}")
+        if not created:
+            self.stdout.write("Wszystkie partycje już istnieją.")
@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api import profiling
+
+
+class Command(BaseCommand):
+    """
+    Wypisuje podpisany token nagłówka X-Profile – żądanie z tym nagłówkiem jest profilowane
+    (api/profiling.py). Token wygasa po PROFILING_TOKEN_MAX_AGE sekundach.
+    """
+
+    help = "Tworzy token nagłówka X-Profile włączającego profilowanie żądania."
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Token ważny przez {settings.PROFILING_TOKEN_MAX_AGE} s")
+        self.stdout.write(self.style.SUCCESS(f"X-Profile: {profiling.make_token()}"))
@@ -0,0 +1,116 @@
+import time
+from datetime import datetime, time as day_time, timedelta, timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api import archive, hotwindow, response_cache, retention, rollups
+
+
+class Command(BaseCommand):
+    """
+    Usuwa surowe pomiary starsze niż okres przechowywania systemu (agregaty zostają).
+    Wygasłe partycje i segmenty archiwum są usuwane w całości, pozostałe pomiary – w krótkich transakcjach
+    obejmujących kolejne zakresy identyfikatorów, z przerwą między nimi.
+    Postęp zapisywany jest po każdym zakresie, więc przerwane zadanie kontynuuje od miejsca przerwania.
+    """
+
+    help = "Usuwa surowe pomiary starsze niż okres przechowywania (raw_retention_days / MEASUREMENT_RAW_RETENTION_DAYS)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Tylko raport: co zostałoby usunięte.")
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.MEASUREMENT_RETENTION_BATCH_SIZE,
+            help="Szerokość zakresu identyfikatorów usuwanego w jednej transakcji.",
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=settings.MEASUREMENT_RETENTION_SLEEP,
+            help="Przerwa między transakcjami (sekundy).",
+        )
+        parser.add_argument('--restart', action='store_true', help="Ignoruje zapisany punkt kontrolny.")
+        parser.add_argument(
+            '--compact', action='store_true',
+            help="Przed usunięciem przelicza agregaty dla usuwanych dni (gdy agregaty nie są aktualizowane przy zapisie).",
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] <= 0:
+            raise CommandError("--batch-size musi być dodatnie.")
+        # Granice liczone od północy UTC – usuwane są zawsze całe dni, więc agregaty dnia pozostają spójne
+        moment = datetime.combine(datetime.now(timezone.utc).date(), day_time.min, tzinfo=timezone.utc)
+
+        if options['dry_run']:
+            self._report(moment)
+            return
+
+        if options['compact']:
+            self._compact(moment)
+
+        for name in retention.expired_partitions(moment):
+            retention.drop_partition(name)
+            hotwindow.clear()  # Okno ostatnich pomiarów nie może zwracać usuniętych wierszy
+            response_cache.invalidate_all()
+            self.stdout.write(f"Usunięto partycję {name}")
+
+        dropped = archive.drop_expired(moment)
+        if dropped:
+            response_cache.invalidate_all()
+            self.stdout.write(f"Usunięto segmenty archiwum: {dropped}")
+
+        first, end = retention.id_range(moment)
+        if first is None:
+            retention.clear_checkpoint()
+            self.stdout.write(self.style.SUCCESS("Brak wygasłych pomiarów."))
+            return
+
+        position = first
+        checkpoint = retention.load_checkpoint()
+        if checkpoint is not None and not options['restart']:
+            position = max(position, checkpoint)
+            self.stdout.write(f"Wznawianie od identyfikatora {position}")
+
+        total = 0
+        while position < end:
+            upper = min(position + options['batch_size'], end)
+            deleted = retention.delete_range(moment, position, upper)
+            total += deleted
+            position = upper
+            retention.save_checkpoint(position)
+            if deleted:
+                self.stdout.write(f"[{position}/{end}] usunięto {deleted}")
+            if options['sleep'] and position < end:
+                time.sleep(options['sleep'])
+
+        retention.clear_checkpoint()
+        if total:
+            hotwindow.clear()
+            response_cache.invalidate_all()
+        self.stdout.write(self.style.SUCCESS(f"Usunięto pomiarów: {total}"))
+
+    def _report(self, moment):
+        for name in retention.expired_partitions(moment):
+            self.stdout.write(f"Partycja do usunięcia: {name}")
+        for segment in archive.expired_segments(moment):
+            self.stdout.write(f"Segment archiwum do usunięcia: {segment.path} ({segment.count} pomiarów)")
+        counts = retention.expired_counts(moment)
+        for system_id, count in counts.items():
+            self.stdout.write(f"System {system_id}: {count} pomiarów do usunięcia")
+        checkpoint = retention.load_checkpoint()
+        if checkpoint is not None:
+            self.stdout.write(f"Przerwane zadanie zostanie wznowione od identyfikatora {checkpoint}")
+        self.stdout.write(self.style.SUCCESS(f"Razem do usunięcia: {sum(counts.values())} (bez zmian w bazie)"))
+
+    def _compact(self, moment):
+        """
+        Przelicza agregaty dzień po dniu dla pełnych dni, które mogą zostać usunięte.
+        """
+        _, latest = retention.cutoff_bounds(moment)
+        first = retention.first_timestamp()
+        if latest is None or first is None:
+            return
+        day = first.date()
+        while day < latest.date():
+            start = datetime.combine(day, day_time.min, tzinfo=timezone.utc)
+            written = rollups.rebuild(start, start + timedelta(days=1))
+            self.stdout.write(f"{day}: przeliczono {written} agregatów")
+            day += timedelta(days=1)
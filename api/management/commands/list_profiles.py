@@ -0,0 +1,86 @@
+import io
+import pstats
+import statistics
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import profiling
+
+
+class Command(BaseCommand):
+    """
+    Wyświetla zapisy profilowania żądań (api/profiling.py): listę zapisów, podsumowanie czasów
+    dla widoków albo szczegóły jednego zapisu – najdroższe funkcje i zapytania SQL z miejscem wywołania.
+    """
+
+    help = "Wyświetla i podsumowuje zapisy profilowania żądań z katalogu PROFILING_DIR."
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', nargs='?', help="Nazwa zapisu do wyświetlenia szczegółów.")
+        parser.add_argument('--view', help="Tylko zapisy danego widoku (np. MeasurementViewSet.list).")
+        parser.add_argument('--limit', type=int, default=20, help="Liczba wyświetlanych zapisów lub pozycji.")
+        parser.add_argument('--by-view', action='store_true', help="Podsumowanie czasów i zapytań dla widoków.")
+        parser.add_argument(
+            '--sort', default='cumulative', choices=['cumulative', 'tottime', 'calls'],
+            help="Kolejność funkcji w szczegółach zapisu.",
+        )
+
+    def handle(self, *args, **options):
+        if options['name']:
+            return self._show(options['name'], options['limit'], options['sort'])
+
+        captures = profiling.load_captures()
+        if options['view']:
+            captures = [capture for capture in captures if capture['view'] == options['view']]
+        if not captures:
+            self.stdout.write("Brak zapisów profilowania.")
+            return
+        if options['by_view']:
+            return self._summary(captures)
+
+        for capture in captures[:options['limit']]:
+            self.stdout.write(
+                f"{capture['name']}  {capture['method']} {capture['path']}  {capture['view']}  "
+                f"{capture['status']}  {capture['duration_ms']:.1f} ms  "
+                f"SQL: {capture['query_count']} / {capture['query_time_ms']:.1f} ms  ({capture['trigger']})"
+            )
+
+    def _summary(self, captures):
+        by_view = defaultdict(list)
+        for capture in captures:
+            by_view[capture['view']].append(capture)
+        for view, items in sorted(by_view.items(), key=lambda item: -len(item[1])):
+            durations = [capture['duration_ms'] for capture in items]
+            self.stdout.write(
+                f"{view}: {len(items)} zapisów, mediana {statistics.median(durations):.1f} ms, "
+                f"maks. {max(durations):.1f} ms, średnio zapytań SQL "
+                f"{statistics.mean(capture['query_count'] for capture in items):.1f} "
+                f"({statistics.mean(capture['query_time_ms'] for capture in items):.1f} ms)"
+            )
+
+    def _show(self, name, limit, sort):
+        try:
+            capture, profile_path = profiling.load_capture(name)
+        except FileNotFoundError:
+            raise CommandError(f"Zapis {name} nie istnieje.")
+
+        self.stdout.write(
+            f"{capture['method']} {capture['path']}{'?' if capture['query_string'] else ''}{capture['query_string']}  "
+            f"{capture['view']}  {capture['status']}  {capture['duration_ms']:.1f} ms  ({capture['trigger']}, {capture['time']})"
+        )
+        self.stdout.write(f"Zapytania SQL: {capture['query_count']}, łącznie {capture['query_time_ms']:.1f} ms")
+
+        # Zapytania pogrupowane po treści i miejscu wywołania (np. N+1 w pętli to jedna pozycja z wieloma wywołaniami)
+        groups = defaultdict(lambda: [0, 0.0])
+        for query in capture['queries']:
+            group = groups[(query['sql'], query['site'])]
+            group[0] += 1
+            group[1] += query['duration_ms']
+        for (sql, site), (count, total) in sorted(groups.items(), key=lambda item: -item[1][1])[:limit]:
+            self.stdout.write(f"  {total:8.1f} ms  {count:4d}x  {site or '-'}")
+            self.stdout.write(f"      {sql[:200]}")
+
+        report = io.StringIO()  # pstats pisze fragmentami wierszy, a OutputWrapper kończy każdy zapis nową linią
+        pstats.Stats(profile_path, stream=report).sort_stats(sort).print_stats(limit)
+        self.stdout.write(report.getvalue())
@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.purge import pending_system_ids, purge_system
+
+
+class Command(BaseCommand):
+    """
+    Usuwa dane systemów oznaczonych jako usunięte, które nie zostały jeszcze wyczyszczone
+    (np. po restarcie procesu w trakcie usuwania w tle albo przy SYSTEM_PURGE_IN_BACKGROUND = False).
+    """
+
+    help = "Usuwa partiami dane systemów oznaczonych jako usunięte, a następnie same systemy."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--system', type=int, action='append', dest='systems', help="Identyfikator systemu (można powtarzać).")
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.SYSTEM_PURGE_BATCH_SIZE,
+            help="Liczba wierszy usuwanych w jednej transakcji.",
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=settings.SYSTEM_PURGE_SLEEP,
+            help="Przerwa między transakcjami (sekundy).",
+        )
+
+    def handle(self, *args, **options):
+        system_ids = options['systems'] or pending_system_ids()
+        for system_id in system_ids:
+            deleted = purge_system(system_id, options['batch_size'], options['sleep'])
+            self.stdout.write(f"System {system_id}: usunięto {deleted} wierszy danych")
+        self.stdout.write(self.style.SUCCESS(f"Przetworzone systemy: {len(system_ids)}"))
@@ -0,0 +1,46 @@
+from datetime import datetime, time, timedelta, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from api import rollups
+
+
+class Command(BaseCommand):
+    """
+    Przelicza agregaty pomiarów z surowych danych.
+    Służy do uzupełnienia agregatów po wyłączeniu aktualizacji przy zapisie lub po imporcie danych.
+    Przetwarza dane dzień po dniu, żeby pojedyncze zapytanie nie obejmowało całej historii.
+    """
+
+    help = "Przelicza agregaty pomiarów (minuta / godzina / dzień) z surowych danych."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help="Pierwszy dzień do przeliczenia (RRRR-MM-DD).")
+        parser.add_argument('--until', help="Ostatni dzień do przeliczenia (RRRR-MM-DD), domyślnie dziś.")
+        parser.add_argument('--days', type=int, default=1, help="Liczba dni wstecz, jeśli nie podano --since.")
+        parser.add_argument('--system', type=int, action='append', dest='systems', help="Identyfikator systemu (można powtarzać).")
+
+    def _parse_day(self, value, name):
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f"Niepoprawna data w {name}: {value}")
+        return day
+
+    def handle(self, *args, **options):
+        today = datetime.now(timezone.utc).date()
+        until = self._parse_day(options['until'], '--until') if options['until'] else today
+        since = self._parse_day(options['since'], '--since') if options['since'] else until - timedelta(days=options['days'] - 1)
+        if since > until:
+            raise CommandError("--since nie może być późniejsze niż --until.")
+
+        day = since
+        total = 0
+        while day <= until:
+            start = datetime.combine(day, time.min, tzinfo=timezone.utc)
+            written = rollups.rebuild(start, start + timedelta(days=1), options['systems'])
+            total += written
+            self.stdout.write(f"{day}: zapisano {written} agregatów")
+            day += timedelta(days=1)
+
+        self.stdout.write(self.style.SUCCESS(f"Przeliczono agregaty: {total}"))
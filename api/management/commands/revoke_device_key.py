@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.authentication import revoke_keys
+from api.models import DeviceKey
+
+
+class Command(BaseCommand):
+    """
+    Unieważnia klucze urządzeń.
+    Działające procesy aplikacji przestają akceptować klucz najpóźniej po DEVICE_KEY_CACHE_TTL sekundach.
+    """
+
+    help = "Unieważnia klucze urządzeń (po identyfikatorze klucza lub wszystkie klucze systemu)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('key_ids', nargs='*', help="Identyfikatory kluczy.")
+        parser.add_argument('--system', type=int, help="Unieważnia wszystkie klucze systemu.")
+
+    def handle(self, *args, **options):
+        if not options['key_ids'] and options['system'] is None:
+            raise CommandError("Podaj identyfikatory kluczy albo --system.")
+
+        keys = DeviceKey.objects.all()
+        if options['key_ids']:
+            keys = keys.filter(key_id__in=options['key_ids'])
+        if options['system'] is not None:
+            keys = keys.filter(hydroponic_system_id=options['system'])
+
+        revoked = revoke_keys(keys)
+        self.stdout.write(self.style.SUCCESS(f"Unieważniono klucze: {revoked}"))
@@ -0,0 +1,171 @@
+"""
+Metryki w formacie Prometheus pod adresem /metrics: czas obsługi, rozmiar odpowiedzi oraz liczba i czas zapytań SQL
+dla każdego widoku, a także liczniki zapisu pomiarów (źródło, wynik, rozmiar partii).
+
+Przy wielu procesach gunicorn każdy proces zapisuje metryki do plików mapowanych w pamięci w katalogu
+PROMETHEUS_MULTIPROC_DIR (zmienna środowiskowa ustawiona przed startem), a /metrics sumuje pliki wszystkich
+procesów – wynik nie zależy od tego, który proces obsłużył pobranie. Katalog czyści przy starcie gunicorn.conf.py.
+Bez tej zmiennej metryki dotyczą tylko bieżącego procesu.
+"""
+import contextvars
+import os
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed, PermissionDenied
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import Http404, HttpResponse
+from django.utils.decorators import sync_and_async_middleware
+from asgiref.sync import iscoroutinefunction
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess,
+)
+
+# Widok żądań, które nie pasują do żadnego adresu (np. 404 ze skanerów) – etykieta o ograniczonej liczbie wartości
+UNMATCHED_VIEW = 'unmatched'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+BATCH_BUCKETS = (1, 10, 100, 500, 1000, 2500, 5000, 10000)
+
+REQUEST_DURATION = Histogram(
+    'hydroponic_http_request_duration_seconds', "Czas obsługi żądania (do wysłania nagłówków odpowiedzi).",
+    ['method', 'view'], buckets=LATENCY_BUCKETS,
+)
+RESPONSES = Counter(
+    'hydroponic_http_responses_total', "Liczba odpowiedzi według widoku i kodu statusu.",
+    ['method', 'view', 'status'],
+)
+RESPONSE_SIZE = Histogram(
+    'hydroponic_http_response_size_bytes', "Rozmiar treści odpowiedzi (bez odpowiedzi strumieniowych).",
+    ['view'], buckets=SIZE_BUCKETS,
+)
+REQUEST_QUERIES = Histogram(
+    'hydroponic_http_request_db_queries', "Liczba zapytań SQL w jednym żądaniu.",
+    ['view'], buckets=QUERY_BUCKETS,
+)
+REQUEST_QUERY_DURATION = Histogram(
+    'hydroponic_http_request_db_duration_seconds', "Łączny czas zapytań SQL w jednym żądaniu.",
+    ['view'], buckets=LATENCY_BUCKETS,
+)
+INGEST_ROWS = Counter(
+    'hydroponic_ingest_measurements_total',
+    "Pomiary przyjęte do zapisu według źródła i wyniku (created, duplicate, rejected, buffered).",
+    ['source', 'result'],
+)
+INGEST_BATCH_ROWS = Histogram(
+    'hydroponic_ingest_batch_rows', "Liczba pomiarów w jednej partii zapisu.",
+    ['source'], buckets=BATCH_BUCKETS,
+)
+
+# Liczniki zapytań SQL bieżącego żądania: [liczba, czas]; zmienna kontekstu przechodzi też do wątku widoku pod ASGI
+_request_queries = contextvars.ContextVar('request_queries', default=None)
+
+
+def record_ingest(source, created=0, duplicates=0, rejected=0, buffered=0):
+    """
+    Zlicza partię pomiarów ze źródła (np. "api", "bulk_json", "bulk_binary", "sensor", "buffer").
+    """
+    INGEST_BATCH_ROWS.labels(source).observe(created + duplicates + rejected + buffered)
+    for result, count in (('created', created), ('duplicate', duplicates), ('rejected', rejected), ('buffered', buffered)):
+        if count:
+            INGEST_ROWS.labels(source, result).inc(count)
+
+
+def count_queries(execute, sql, params, many, context):
+    """
+    Wrapper wykonania zapytań każdego połączenia – dolicza zapytanie do bieżącego żądania.
+    """
+    stats = _request_queries.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats[0] += 1
+        stats[1] += time.perf_counter() - start
+
+
+@receiver(connection_created)
+def install_query_counter(connection, **kwargs):
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_queries)
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return UNMATCHED_VIEW
+    return match.view_name or match._func_path
+
+
+def _observe(request, response, started, stats):
+    view = _view_name(request)
+    REQUEST_DURATION.labels(request.method, view).observe(time.perf_counter() - started)
+    RESPONSES.labels(request.method, view, str(response.status_code)).inc()
+    if not response.streaming:
+        RESPONSE_SIZE.labels(view).observe(len(response.content))
+    REQUEST_QUERIES.labels(view).observe(stats[0])
+    REQUEST_QUERY_DURATION.labels(view).observe(stats[1])
+
+
+@sync_and_async_middleware
+def metrics_middleware(get_response):
+    """
+    Mierzy każde żądanie; powinien być pierwszy na liście MIDDLEWARE, żeby obejmował pozostałe.
+    Czas odpowiedzi strumieniowej (eksport, kanał na żywo) obejmuje tylko przygotowanie odpowiedzi.
+    """
+    if not settings.METRICS_ENABLED:
+        raise MiddlewareNotUsed()
+    # Połączenia otwarte przed załadowaniem middleware (np. przez polecenie zarządzania) nie dostały sygnału
+    for connection in connections.all(initialized_only=True):
+        install_query_counter(connection)
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            started, stats = time.perf_counter(), [0, 0.0]
+            token = _request_queries.set(stats)
+            try:
+                response = await get_response(request)
+            finally:
+                _request_queries.reset(token)
+            _observe(request, response, started, stats)
+            return response
+    else:
+        def middleware(request):
+            started, stats = time.perf_counter(), [0, 0.0]
+            token = _request_queries.set(stats)
+            try:
+                response = get_response(request)
+            finally:
+                _request_queries.reset(token)
+            _observe(request, response, started, stats)
+            return response
+
+    return middleware
+
+
+def _registry():
+    """
+    Rejestr z metrykami wszystkich procesów (tryb wieloprocesowy) albo tylko bieżącego procesu.
+    """
+    if not os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def metrics_view(request):
+    """
+    Metryki w formacie tekstowym Prometheus. Dostęp mają adresy z METRICS_ALLOWED_IPS i administratorzy.
+    """
+    if not settings.METRICS_ENABLED:
+        raise Http404()
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS and not request.user.is_staff:
+        raise PermissionDenied()
+    return HttpResponse(generate_latest(_registry()), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.6 on 2026-10-18 10:29
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # Indeksy budowane są współbieżnie, żeby nie blokować zapisów do dużej tabeli pomiarów
+    atomic = False
+
+    dependencies = [
+        ('api', '0002_hydroponicsystem_measurement'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='measurement',
+            index=models.Index(fields=['hydroponic_system', 'timestamp'], name='measurement_system_ts_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='measurement',
+            index=django.contrib.postgres.indexes.BrinIndex(fields=['timestamp'], name='measurement_ts_brin'),
+        ),
+    ]
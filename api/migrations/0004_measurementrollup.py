@@ -0,0 +1,36 @@
+# Generated by Django 5.1.6 on 2026-10-18 10:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_measurement_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MeasurementRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('1m', 'Minuta'), ('1h', 'Godzina'), ('1d', 'Dzień')], max_length=2)),
+                ('bucket_start', models.DateTimeField()),
+                ('count', models.PositiveIntegerField()),
+                ('ph_min', models.FloatField()),
+                ('ph_max', models.FloatField()),
+                ('ph_sum', models.FloatField()),
+                ('temperature_min', models.FloatField()),
+                ('temperature_max', models.FloatField()),
+                ('temperature_sum', models.FloatField()),
+                ('tds_min', models.FloatField()),
+                ('tds_max', models.FloatField()),
+                ('tds_sum', models.FloatField()),
+                ('hydroponic_system', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='api.hydroponicsystem')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('hydroponic_system', 'resolution', 'bucket_start'), name='rollup_system_bucket_unique')],
+            },
+        ),
+    ]
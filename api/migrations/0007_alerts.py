@@ -0,0 +1,45 @@
+# Generated by Django 5.1.6 on 2026-10-18 10:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_devicekey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(choices=[('ph', 'pH'), ('temperature', 'Temperatura'), ('tds', 'TDS')], max_length=20)),
+                ('min_value', models.FloatField(blank=True, null=True)),
+                ('max_value', models.FloatField(blank=True, null=True)),
+                ('hysteresis', models.FloatField(default=0)),
+                ('sustained_minutes', models.PositiveIntegerField(default=0)),
+                ('is_active', models.BooleanField(default=True)),
+                ('state', models.CharField(choices=[('ok', 'W normie'), ('pending', 'Przekroczenie trwa krócej niż wymagany czas'), ('firing', 'Alert aktywny')], default='ok', max_length=10)),
+                ('breach_started_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('hydroponic_system', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alert_rules', to='api.hydroponicsystem')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AlertEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('triggered', 'Wystąpienie'), ('resolved', 'Wygaśnięcie')], max_length=10)),
+                ('value', models.FloatField()),
+                ('measured_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('hydroponic_system', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alert_events', to='api.hydroponicsystem')),
+                ('rule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='api.alertrule')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['hydroponic_system', '-created_at'], name='alertevent_system_created_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 10:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_retention'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hydroponicsystem',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
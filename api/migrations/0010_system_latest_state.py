@@ -0,0 +1,37 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_hydroponicsystem_deleted_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SystemLatestState',
+            fields=[
+                ('hydroponic_system', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='latest_state', serialize=False, to='api.hydroponicsystem')),
+                ('timestamp', models.DateTimeField()),
+                ('ph', models.FloatField()),
+                ('temperature', models.FloatField()),
+                ('tds', models.FloatField()),
+            ],
+        ),
+        # Stan początkowy z istniejących pomiarów: najnowszy pomiar każdego systemu (skan indeksu system, czas)
+        migrations.RunSQL(
+            """
+            INSERT INTO api_systemlateststate (hydroponic_system_id, timestamp, ph, temperature, tds)
+            SELECT s.id, m.timestamp, m.ph, m.temperature, m.tds
+            FROM api_hydroponicsystem s
+            CROSS JOIN LATERAL (
+                SELECT timestamp, ph, temperature, tds FROM api_measurement
+                WHERE hydroponic_system_id = s.id ORDER BY timestamp DESC, id DESC LIMIT 1
+            ) m
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_measurement_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='measurement',
+            name='dedup_key',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True),
+        ),
+    ]
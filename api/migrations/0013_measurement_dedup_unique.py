@@ -0,0 +1,86 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:24
+
+from django.db import migrations, models
+
+TABLE = 'api_measurement'
+INDEX = 'measurement_dedup_unique'
+DEFINITION = '("hydroponic_system_id", "dedup_key", "timestamp") WHERE "dedup_key" IS NOT NULL'
+
+
+def _drop_invalid(cursor, name):
+    """
+    Usuwa indeks pozostały po przerwanym CREATE INDEX CONCURRENTLY (nieważny), żeby można go było zbudować od nowa.
+    """
+    cursor.execute(
+        "SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)", [name]
+    )
+    row = cursor.fetchone()
+    if row and row[0]:
+        cursor.execute(f'DROP INDEX CONCURRENTLY "{name}"')
+
+
+def create_dedup_index(apps, schema_editor):
+    """
+    Buduje unikalny indeks częściowy współbieżnie – bez blokowania zapisów do tabeli pomiarów.
+    Tabela partycjonowana nie obsługuje CREATE INDEX CONCURRENTLY: indeks powstaje najpierw tylko na tabeli
+    nadrzędnej (ON ONLY), potem współbieżnie na każdej partycji i jest do niego podpinany.
+    """
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [TABLE])
+        if cursor.fetchone()[0] != 'p':
+            _drop_invalid(cursor, INDEX)
+            cursor.execute(f'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS "{INDEX}" ON "{TABLE}" {DEFINITION}')
+            return
+
+        cursor.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS "{INDEX}" ON ONLY "{TABLE}" {DEFINITION}')
+        cursor.execute(
+            """
+            SELECT partition.relname FROM pg_inherits
+            JOIN pg_class partition ON partition.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = to_regclass(%s)
+            ORDER BY partition.relname
+            """,
+            [TABLE],
+        )
+        for (partition,) in cursor.fetchall():
+            name = f"{partition[:38]}_dedup_unique"
+            cursor.execute(
+                "SELECT 1 FROM pg_inherits WHERE inhrelid = to_regclass(%s) AND inhparent = to_regclass(%s)",
+                [name, INDEX],
+            )
+            if cursor.fetchone():
+                continue  # Podpięty przy wcześniejszym, przerwanym uruchomieniu
+            _drop_invalid(cursor, name)
+            cursor.execute(f'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS "{name}" ON "{partition}" {DEFINITION}')
+            cursor.execute(f'ALTER INDEX "{INDEX}" ATTACH PARTITION "{name}"')
+
+
+def drop_dedup_index(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [TABLE])
+        concurrently = '' if cursor.fetchone()[0] == 'p' else 'CONCURRENTLY '
+        cursor.execute(f'DROP INDEX {concurrently}IF EXISTS "{INDEX}"')
+
+
+class Migration(migrations.Migration):
+
+    # Indeks budowany jest współbieżnie, żeby nie blokować zapisów do dużej tabeli pomiarów
+    atomic = False
+
+    dependencies = [
+        ('api', '0012_measurement_dedup_key'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddConstraint(
+                    model_name='measurement',
+                    constraint=models.UniqueConstraint(condition=models.Q(('dedup_key__isnull', False)), fields=('hydroponic_system', 'dedup_key', 'timestamp'), name='measurement_dedup_unique'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(create_dedup_index, drop_dedup_index),
+            ],
+        ),
+    ]
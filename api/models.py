@@ -1,6 +1,8 @@
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.indexes import BrinIndex
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 # Model użytkownika oparty na Django AbstractUser
 class CustomUser(AbstractUser):
@@ -9,12 +11,24 @@ class CustomUser(AbstractUser):
     def __str__(self):
         return self.username
 
+# Menedżer pomijający systemy oznaczone do usunięcia
+class ActiveSystemManager(models.Manager):
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
 # Model systemu hydroponicznego
 class HydroponicSystem(models.Model):
     name = models.CharField(max_length=100)  # Nazwa systemu
     location = models.CharField(max_length=255, blank=True, null=True)  # Opcjonalna lokalizacja
     created_at = models.DateTimeField(auto_now_add=True)  # Data utworzenia
     owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)  # Właściciel systemu
+    raw_retention_days = models.PositiveIntegerField(
+        blank=True, null=True
+    )  # Ile dni przechowywać surowe pomiary (None – ustawienie globalne MEASUREMENT_RAW_RETENTION_DAYS)
+    deleted_at = models.DateTimeField(blank=True, null=True)  # Oznaczenie do usunięcia (dane usuwane są w tle)
+
+    objects = ActiveSystemManager()  # Tylko systemy nieusunięte
+    all_objects = models.Manager()  # Wszystkie systemy, także oczekujące na usunięcie
 
     def __str__(self):
         return self.name
@@ -24,10 +38,174 @@ class Measurement(models.Model):
     hydroponic_system = models.ForeignKey(
         HydroponicSystem, on_delete=models.CASCADE, related_name='measurements'
     )  # Każdy pomiar należy do konkretnego systemu
-    timestamp = models.DateTimeField(auto_now_add=True)  # Czas pomiaru
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)  # Czas pomiaru (z urządzenia lub czas zapisu)
     ph = models.FloatField()  # Pomiar pH
     temperature = models.FloatField()  # Pomiar temperatury wody
     tds = models.FloatField()  # Pomiar całkowitej ilości rozpuszczonych substancji (TDS)
+    # Klucz deduplikacji z urządzenia (np. numer sekwencyjny) – ponowione wysłanie tego samego pomiaru jest pomijane
+    dedup_key = models.CharField(max_length=64, null=True, blank=True, editable=False)
+
+    class Meta:
+        constraints = [
+            # Klucz obejmuje czas pomiaru, bo unikalny indeks tabeli partycjonowanej musi zawierać klucz partycji
+            models.UniqueConstraint(
+                fields=['hydroponic_system', 'dedup_key', 'timestamp'],
+                condition=models.Q(dedup_key__isnull=False),
+                name='measurement_dedup_unique',
+            ),
+        ]
+        indexes = [
+            # Odczyty filtrują po systemie i sortują po czasie – zakres jednego systemu to jeden skan indeksu
+            models.Index(fields=['hydroponic_system', 'timestamp'], name='measurement_system_ts_idx'),
+            # Mały indeks BRIN dla zapytań po samym czasie (pomiary zapisywane są chronologicznie)
+            BrinIndex(fields=['timestamp'], name='measurement_ts_brin'),
+        ]
+
+    def __str__(self):
+        # Nazwa systemu tylko, gdy jest już wczytany (select_related) – bez zapytania dla każdego pomiaru na liście
+        if Measurement.hydroponic_system.is_cached(self):
+            return f"{self.hydroponic_system.name} - {self.timestamp}"
+        return f"System {self.hydroponic_system_id} - {self.timestamp}"
+
+# Agregaty pomiarów w przedziałach czasu (minuta / godzina / dzień)
+class MeasurementRollup(models.Model):
+    RESOLUTION_CHOICES = [
+        ('1m', 'Minuta'),
+        ('1h', 'Godzina'),
+        ('1d', 'Dzień'),
+    ]
+
+    hydroponic_system = models.ForeignKey(
+        HydroponicSystem, on_delete=models.CASCADE, related_name='rollups'
+    )  # System, którego dotyczy agregat
+    resolution = models.CharField(max_length=2, choices=RESOLUTION_CHOICES)  # Długość przedziału
+    bucket_start = models.DateTimeField()  # Początek przedziału
+    count = models.PositiveIntegerField()  # Liczba pomiarów w przedziale
+    # Minimum, maksimum i suma każdej wartości – suma pozwala liczyć średnią przyrostowo
+    ph_min = models.FloatField()
+    ph_max = models.FloatField()
+    ph_sum = models.FloatField()
+    temperature_min = models.FloatField()
+    temperature_max = models.FloatField()
+    temperature_sum = models.FloatField()
+    tds_min = models.FloatField()
+    tds_max = models.FloatField()
+    tds_sum = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['hydroponic_system', 'resolution', 'bucket_start'], name='rollup_system_bucket_unique'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.hydroponic_system_id} - {self.resolution} - {self.bucket_start}"
+
+# Klucz urządzenia (czujnika) przypisany do jednego systemu
+class DeviceKey(models.Model):
+    hydroponic_system = models.ForeignKey(
+        HydroponicSystem, on_delete=models.CASCADE, related_name='device_keys'
+    )  # System, do którego urządzenie może zapisywać pomiary
+    key_id = models.CharField(max_length=32, unique=True)  # Publiczny identyfikator klucza (część tokenu)
+    name = models.CharField(max_length=100, blank=True)  # Opis urządzenia
+    created_at = models.DateTimeField(auto_now_add=True)  # Data utworzenia
+    revoked_at = models.DateTimeField(blank=True, null=True)  # Data unieważnienia (None – klucz aktywny)
+
+    def __str__(self):
+        return f"{self.key_id} ({self.hydroponic_system_id})"
+
+# Reguła alertu: dopuszczalny zakres jednej wartości pomiaru w systemie
+class AlertRule(models.Model):
+    METRIC_CHOICES = [
+        ('ph', 'pH'),
+        ('temperature', 'Temperatura'),
+        ('tds', 'TDS'),
+    ]
+    STATE_CHOICES = [
+        ('ok', 'W normie'),
+        ('pending', 'Przekroczenie trwa krócej niż wymagany czas'),
+        ('firing', 'Alert aktywny'),
+    ]
+
+    hydroponic_system = models.ForeignKey(
+        HydroponicSystem, on_delete=models.CASCADE, related_name='alert_rules'
+    )  # System, którego dotyczy reguła
+    metric = models.CharField(max_length=20, choices=METRIC_CHOICES)  # Sprawdzana wartość
+    min_value = models.FloatField(blank=True, null=True)  # Dolna granica (None – brak)
+    max_value = models.FloatField(blank=True, null=True)  # Górna granica (None – brak)
+    hysteresis = models.FloatField(default=0)  # O ile wartość musi wrócić w głąb zakresu, żeby alert wygasł
+    sustained_minutes = models.PositiveIntegerField(default=0)  # Jak długo przekroczenie musi trwać przed alertem
+    is_active = models.BooleanField(default=True)  # Czy reguła jest sprawdzana
+    state = models.CharField(max_length=10, choices=STATE_CHOICES, default='ok')  # Bieżący stan reguły
+    breach_started_at = models.DateTimeField(blank=True, null=True)  # Początek trwającego przekroczenia
+    created_at = models.DateTimeField(auto_now_add=True)  # Data utworzenia
+
+    def __str__(self):
+        return f"{self.hydroponic_system_id} - {self.metric} [{self.min_value}, {self.max_value}]"
+
+# Zdarzenie alertu (wystąpienie lub wygaśnięcie)
+class AlertEvent(models.Model):
+    KIND_CHOICES = [
+        ('triggered', 'Wystąpienie'),
+        ('resolved', 'Wygaśnięcie'),
+    ]
+
+    rule = models.ForeignKey(AlertRule, on_delete=models.CASCADE, related_name='events')  # Reguła, która zadziałała
+    hydroponic_system = models.ForeignKey(
+        HydroponicSystem, on_delete=models.CASCADE, related_name='alert_events'
+    )  # System (zdenormalizowany, do filtrowania bez złączenia)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)  # Rodzaj zdarzenia
+    value = models.FloatField()  # Wartość pomiaru, która zmieniła stan reguły
+    measured_at = models.DateTimeField()  # Czas tego pomiaru
+    created_at = models.DateTimeField(auto_now_add=True)  # Czas zapisu zdarzenia
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['hydroponic_system', '-created_at'], name='alertevent_system_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.rule_id} - {self.kind} - {self.measured_at}"
+
+# Punkt kontrolny zadania wsadowego (wznowienie po przerwaniu)
+class JobCheckpoint(models.Model):
+    name = models.CharField(max_length=100, unique=True)  # Nazwa zadania, np. "retention"
+    position = models.BigIntegerField()  # Identyfikator, od którego zadanie ma kontynuować
+    updated_at = models.DateTimeField(auto_now=True)  # Czas ostatniego zapisu
+
+    def __str__(self):
+        return f"{self.name}: {self.position}"
+
+# Ostatni pomiar systemu (zdenormalizowany, aktualizowany przy zapisie pomiarów)
+class SystemLatestState(models.Model):
+    hydroponic_system = models.OneToOneField(
+        HydroponicSystem, on_delete=models.CASCADE, primary_key=True, related_name='latest_state'
+    )  # System, którego dotyczy stan
+    timestamp = models.DateTimeField()  # Czas najnowszego pomiaru
+    ph = models.FloatField()  # Najnowsze pH
+    temperature = models.FloatField()  # Najnowsza temperatura wody
+    tds = models.FloatField()  # Najnowsze TDS
+
+    def __str__(self):
+        return f"{self.hydroponic_system_id} - {self.timestamp}"
+
+# Segment archiwum kolumnowego: pomiary systemu przeniesione z bazy do plików .npy (api/archive.py)
+class MeasurementArchive(models.Model):
+    hydroponic_system = models.ForeignKey(
+        HydroponicSystem, on_delete=models.CASCADE, related_name='archives'
+    )  # System, którego pomiary zawiera segment
+    path = models.CharField(max_length=255, unique=True)  # Katalog segmentu względem MEASUREMENT_ARCHIVE_ROOT
+    first_timestamp = models.DateTimeField()  # Czas najstarszego pomiaru w segmencie
+    last_timestamp = models.DateTimeField()  # Czas najnowszego pomiaru w segmencie
+    last_id = models.BigIntegerField()  # Identyfikator najnowszego pomiaru w segmencie
+    count = models.PositiveIntegerField()  # Liczba pomiarów
+    created_at = models.DateTimeField(auto_now_add=True)  # Data utworzenia
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['hydroponic_system', 'last_timestamp'], name='archive_system_last_ts_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.hydroponic_system.name} - {self.timestamp}"
+        return f"{self.hydroponic_system_id} - {self.path}"
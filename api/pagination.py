@@ -0,0 +1,256 @@
+"""
+Stronicowanie kursorowe (keyset) pomiarów po parze (timestamp, id).
+Każda strona to jedno zapytanie z warunkiem na pozycję ostatniego wiersza i LIMIT,
+bez COUNT(*) i bez OFFSET – głęboka strona kosztuje tyle samo co pierwsza.
+"""
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, CursorPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+# Kursor wskazujący ostatnią stronę (pierwsza strona w odwróconej kolejności)
+LAST_CURSOR = 'last'
+
+
+class InvalidCursor(Exception):
+    """
+    Kursor nie daje się zdekodować.
+    """
+
+
+def encode_cursor(timestamp, pk, backwards=False):
+    """
+    Koduje pozycję (timestamp, id) i kierunek w bezpiecznym dla URL ciągu.
+    """
+    raw = f"{'p' if backwards else 'n'}|{timestamp.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Dekoduje kursor do krotki (timestamp, id, wstecz).
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        direction, timestamp, pk = raw.split('|')
+        timestamp = parse_datetime(timestamp)
+        if direction not in ('n', 'p') or timestamp is None:
+            raise ValueError
+        return timestamp, int(pk), direction == 'p'
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor(cursor)
+
+
+def _position(row):
+    """
+    Zwraca pozycję (timestamp, id) wiersza – instancji modelu, krotki z values_list(named=True) lub słownika.
+    """
+    if isinstance(row, dict):
+        return row['timestamp'], row['id']
+    return row.timestamp, row.id
+
+
+def _after(timestamp, pk, descending):
+    """
+    Warunek "wiersze za pozycją" w danej kolejności.
+    Nadmiarowe ograniczenie samego timestamp pozwala użyć go jako granicy skanu indeksu.
+    """
+    if descending:
+        return Q(timestamp__lte=timestamp) & (Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=pk))
+    return Q(timestamp__gte=timestamp) & (Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, id__gt=pk))
+
+
+def _ordering(descending):
+    return ('-timestamp', '-id') if descending else ('timestamp', 'id')
+
+
+class KeysetPage:
+    """
+    Strona wyników stronicowania kursorowego.
+    """
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+def _fetch(queryset, archived, position, descending, limit):
+    """
+    Do `limit` wierszy za pozycją (albo od początku) w danej kolejności – z bazy i z archiwum (ArchivedRows).
+    """
+    if position is not None:
+        queryset = queryset.filter(_after(*position, descending))
+    rows = list(queryset.order_by(*_ordering(descending))[:limit])
+    if archived is not None:
+        # Przy pełnej stronie z bazy wiersze archiwum leżące dalej niż jej ostatni wiersz i tak się nie zmieszczą
+        stop = _position(rows[-1]) if len(rows) == limit else None
+        archived_rows = archived.page(position, descending, limit, stop)
+        if archived_rows:
+            rows = sorted(rows + archived_rows, key=_position, reverse=descending)[:limit]
+    return rows
+
+
+def paginate(queryset, cursor, page_size, descending=True, archived=None):
+    """
+    Zwraca stronę pomiarów wskazaną kursorem.
+    Brak kursora oznacza pierwszą stronę, LAST_CURSOR – ostatnią.
+    Z `archived` (archive.ArchivedRows) strona obejmuje także pomiary przeniesione do archiwum.
+    Rzuca InvalidCursor dla niepoprawnego kursora.
+    """
+    if not cursor:
+        rows = _fetch(queryset, archived, None, descending, page_size + 1)
+        has_more_after, has_more_before = len(rows) > page_size, False
+        rows = rows[:page_size]
+    elif cursor == LAST_CURSOR:
+        rows = _fetch(queryset, archived, None, not descending, page_size + 1)
+        has_more_after, has_more_before = False, len(rows) > page_size
+        rows = rows[:page_size][::-1]
+    else:
+        timestamp, pk, backwards = decode_cursor(cursor)
+        if backwards:
+            # Strona poprzedzająca pozycję: czytamy w odwróconej kolejności i odwracamy wynik
+            rows = _fetch(queryset, archived, (timestamp, pk), not descending, page_size + 1)
+            has_more_after, has_more_before = True, len(rows) > page_size
+            rows = rows[:page_size][::-1]
+        else:
+            rows = _fetch(queryset, archived, (timestamp, pk), descending, page_size + 1)
+            has_more_after, has_more_before = len(rows) > page_size, True
+            rows = rows[:page_size]
+
+    next_cursor = encode_cursor(*_position(rows[-1])) if rows and has_more_after else None
+    previous_cursor = encode_cursor(*_position(rows[0]), backwards=True) if rows and has_more_before else None
+    return KeysetPage(rows, next_cursor, previous_cursor)
+
+
+class MeasurementCursorPagination(BasePagination):
+    """
+    Stronicowanie kursorowe dla API pomiarów.
+    Kierunek wynika z parametru `ordering` (timestamp lub -timestamp, domyślnie od najnowszych).
+    """
+
+    page_size = settings.MEASUREMENT_PAGE_SIZE
+    max_page_size = settings.MEASUREMENT_MAX_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    ordering_query_param = 'ordering'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def is_descending(self, request):
+        return request.query_params.get(self.ordering_query_param, '-timestamp').strip() != 'timestamp'
+
+    def paginate_queryset(self, queryset, request, view=None, archived=None):
+        self.request = request
+        try:
+            self.page = paginate(
+                queryset,
+                request.query_params.get(self.cursor_query_param),
+                self.get_page_size(request),
+                descending=self.is_descending(request),
+                archived=archived,
+            )
+        except InvalidCursor:
+            raise NotFound("Niepoprawny kursor.")
+        return list(self.page)
+
+    def _link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self._link(self.page.next_cursor),
+            'previous': self._link(self.page.previous_cursor),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class AlertEventPagination(CursorPagination):
+    """
+    Stronicowanie kursorowe zdarzeń alertów (od najnowszych).
+    """
+
+    page_size = 100
+    ordering = ('-created_at', '-id')
+
+
+def estimated_count(queryset):
+    """
+    Liczba wierszy querysetu według planu zapytania (EXPLAIN) – bez wykonywania COUNT(*).
+    Szacunek pochodzi ze statystyk PostgreSQL (ANALYZE), więc dla dużych tabel jest przybliżony.
+    """
+    queryset = queryset.order_by().select_related(None).values('pk')
+    sql, params = queryset.query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator panelu administracyjnego dla dużych tabel: liczba wyników powyżej ADMIN_EXACT_COUNT_LIMIT
+    jest szacowana przez planistę (estimated_count) zamiast liczona przez COUNT(*) po całej tabeli.
+    Mniejsze wyniki liczone są dokładnie; `estimated` mówi, czy liczba jest przybliżona.
+    """
+
+    estimated = False
+
+    @cached_property
+    def count(self):
+        if not hasattr(self.object_list, 'query'):
+            return super().count
+        estimate = estimated_count(self.object_list)
+        if estimate < settings.ADMIN_EXACT_COUNT_LIMIT:
+            return super().count
+        self.estimated = True
+        return estimate
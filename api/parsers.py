@@ -0,0 +1,100 @@
+import json
+import struct
+
+import numpy as np
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class NDJSONLineError:
+    """
+    Znacznik wiersza NDJSON, którego nie udało się zdekodować.
+    Pozwala zgłosić błąd dla pojedynczego wiersza bez przerywania całej partii.
+    """
+
+    def __init__(self, message):
+        self.message = message
+
+
+class NDJSONParser(BaseParser):
+    """
+    Parser dla treści w formacie NDJSON (jeden obiekt JSON w każdej linii).
+    Zwraca listę obiektów; niepoprawne linie zastępuje znacznikiem NDJSONLineError.
+    """
+
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+
+        rows = []
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue  # Pomijamy puste linie
+            try:
+                rows.append(json.loads(line.decode(encoding)))
+            except ValueError as exc:  # Obejmuje także UnicodeDecodeError
+                rows.append(NDJSONLineError(f"Niepoprawny JSON: {exc}"))
+        return rows
+
+
+# Nagłówek formatu binarnego: sygnatura i identyfikator systemu (little-endian)
+BINARY_MAGIC = b'HYD1'
+BINARY_HEADER = struct.Struct('<4sQ')
+# Rekord pomiaru: czas (sekundy od epoki Unix), pH, temperatura, TDS
+BINARY_RECORD = np.dtype([
+    ('timestamp', '<f8'),
+    ('ph', '<f4'),
+    ('temperature', '<f4'),
+    ('tds', '<f4'),
+])
+# Wersja 2: rekord kończy numer sekwencyjny pomiaru w urządzeniu (klucz deduplikacji)
+BINARY_MAGIC_V2 = b'HYD2'
+BINARY_RECORD_V2 = np.dtype([*BINARY_RECORD.descr, ('sequence', '<u8')])
+BINARY_RECORDS = {BINARY_MAGIC: BINARY_RECORD, BINARY_MAGIC_V2: BINARY_RECORD_V2}
+
+
+class MeasurementBatch:
+    """
+    Zdekodowana partia pomiarów jednego systemu w formacie binarnym.
+    `records` to tablica NumPy o typie BINARY_RECORD albo BINARY_RECORD_V2 (bez kopiowania danych żądania).
+    """
+
+    def __init__(self, system_id, records):
+        self.system_id = system_id
+        self.records = records
+
+    def __len__(self):
+        return len(self.records)
+
+
+class BinaryMeasurementParser(BaseParser):
+    """
+    Parser upakowanego formatu binarnego dla czujników:
+    nagłówek '<4sQ' (sygnatura HYD1, identyfikator systemu), a po nim rekordy
+    '<f8 f4 f4 f4' (czas w sekundach od epoki Unix, pH, temperatura, TDS).
+    Z sygnaturą HYD2 każdy rekord kończy dodatkowo numer sekwencyjny '<u8', zapisywany jako klucz
+    deduplikacji – ponownie wysłane rekordy są pomijane.
+    Rekordy dekodowane są jednym wywołaniem numpy.frombuffer.
+    """
+
+    media_type = 'application/vnd.hydroponic.measurements'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        body = stream.read() if stream is not None else b''
+        if len(body) < BINARY_HEADER.size:
+            raise ParseError("Brak nagłówka partii pomiarów.")
+
+        magic, system_id = BINARY_HEADER.unpack_from(body)
+        record = BINARY_RECORDS.get(magic)
+        if record is None:
+            raise ParseError("Niepoprawna sygnatura partii pomiarów.")
+
+        payload = memoryview(body)[BINARY_HEADER.size:]
+        if len(payload) % record.itemsize:
+            raise ParseError(f"Długość danych nie jest wielokrotnością rekordu ({record.itemsize} B).")
+
+        return MeasurementBatch(system_id, np.frombuffer(payload, dtype=record))
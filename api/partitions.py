@@ -0,0 +1,211 @@
+"""
+Miesięczne partycjonowanie tabeli pomiarów w PostgreSQL.
+Tabela api_measurement może zostać zamieniona na tabelę partycjonowaną zakresowo po `timestamp`;
+dotychczasowe dane trafiają do jednej partycji archiwalnej, a nowe miesiące dostają własne partycje.
+"""
+import re
+from datetime import date, datetime, timezone
+
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+
+from .models import Measurement
+
+PARENT_TABLE = Measurement._meta.db_table
+LEGACY_TABLE = f"{PARENT_TABLE}_legacy"
+DEFAULT_TABLE = f"{PARENT_TABLE}_default"
+SEQUENCE_NAME = f"{PARENT_TABLE}_id_seq"
+
+# Granice partycji w formacie zwracanym przez pg_get_expr(relpartbound)
+_BOUND_RE = re.compile(r"FROM \((.+)\) TO \((.+)\)")
+
+
+def month_start(value):
+    """
+    Zwraca pierwszy dzień miesiąca dla podanej daty.
+    """
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, months):
+    """
+    Przesuwa pierwszy dzień miesiąca o podaną liczbę miesięcy.
+    """
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    """
+    Nazwa partycji dla danego miesiąca, np. api_measurement_p202503.
+    """
+    return f"{PARENT_TABLE}_p{month:%Y%m}"
+
+
+def _as_datetime(month):
+    return datetime(month.year, month.month, 1, tzinfo=timezone.utc)
+
+
+def is_partitioned():
+    """
+    Sprawdza, czy tabela pomiarów jest tabelą partycjonowaną.
+    """
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [PARENT_TABLE])
+        row = cursor.fetchone()
+    return bool(row) and row[0] == 'p'
+
+
+def _parse_bound(value):
+    value = value.strip()
+    if value in ('MINVALUE', 'MAXVALUE'):
+        return None
+    return parse_datetime(value.strip("'"))
+
+
+def list_partitions():
+    """
+    Zwraca listę partycji jako krotki (nazwa, dolna granica, górna granica).
+    Granica None oznacza brak ograniczenia; partycja domyślna ma obie granice równe None.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.oid = to_regclass(%s)
+            ORDER BY child.relname
+            """,
+            [PARENT_TABLE],
+        )
+        rows = cursor.fetchall()
+
+    partitions = []
+    for name, bound in rows:
+        match = _BOUND_RE.search(bound)
+        if match:
+            partitions.append((name, _parse_bound(match.group(1)), _parse_bound(match.group(2))))
+        else:
+            partitions.append((name, None, None))
+    return partitions
+
+
+def create_partition(month):
+    """
+    Tworzy partycję dla podanego miesiąca, jeśli jeszcze nie istnieje.
+    Zwraca True, gdy partycja została utworzona.
+    """
+    name = partition_name(month)
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s)", [name])
+        if cursor.fetchone()[0] is not None:
+            return False
+        cursor.execute(
+            f'CREATE TABLE "{name}" PARTITION OF "{PARENT_TABLE}" FOR VALUES FROM (%s) TO (%s)',
+            [_as_datetime(month), _as_datetime(add_months(month, 1))],
+        )
+    return True
+
+
+def ensure_partitions(months_ahead, start=None):
+    """
+    Tworzy partycje od miesiąca `start` (domyślnie bieżącego) na `months_ahead` miesięcy do przodu.
+    Miesiące pokryte już przez partycję archiwalną są pomijane. Zwraca nazwy utworzonych partycji.
+    """
+    month = month_start(start or datetime.now(timezone.utc))
+
+    # Partycja archiwalna obejmuje wszystko przed swoją górną granicą
+    covered_until = None
+    for name, lower, upper in list_partitions():
+        if name == LEGACY_TABLE and upper is not None:
+            covered_until = month_start(upper)
+
+    created = []
+    for offset in range(months_ahead + 1):
+        current = add_months(month, offset)
+        if covered_until and current < covered_until:
+            continue
+        if create_partition(current):
+            created.append(partition_name(current))
+    return created
+
+
+def _index_definitions(cursor, table):
+    """
+    Zwraca (nazwa, definicja) indeksów tabeli z pominięciem klucza głównego.
+    """
+    cursor.execute(
+        """
+        SELECT index_class.relname, pg_get_indexdef(pg_index.indexrelid)
+        FROM pg_index
+        JOIN pg_class index_class ON index_class.oid = pg_index.indexrelid
+        WHERE pg_index.indrelid = to_regclass(%s) AND NOT pg_index.indisprimary
+        """,
+        [table],
+    )
+    return cursor.fetchall()
+
+
+def convert_to_partitioned(months_ahead):
+    """
+    Zamienia tabelę pomiarów na tabelę partycjonowaną miesięcznie.
+    Istniejące wiersze pozostają w tabeli api_measurement_legacy, podpiętej jako partycja
+    obejmująca cały dotychczasowy zakres czasu. Operacja blokuje tabelę i jest przeznaczona
+    do jednorazowego uruchomienia w oknie serwisowym.
+    """
+    if connection.vendor != 'postgresql':
+        raise RuntimeError("Partycjonowanie jest dostępne tylko w PostgreSQL.")
+    if is_partitioned():
+        raise RuntimeError("Tabela pomiarów jest już partycjonowana.")
+
+    system_table = Measurement._meta.get_field('hydroponic_system').related_model._meta.db_table
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE "{PARENT_TABLE}" IN ACCESS EXCLUSIVE MODE')
+        cursor.execute(f'SELECT COALESCE(MAX(id), 0), MAX("timestamp") FROM "{PARENT_TABLE}"')
+        max_id, max_timestamp = cursor.fetchone()
+
+        # Dotychczasowa partycja obejmuje wszystko do początku miesiąca po najnowszym pomiarze
+        first_month = add_months(month_start(max(filter(None, [max_timestamp, datetime.now(timezone.utc)]))), 1)
+
+        # Definicje indeksów pobieramy przed zmianą nazwy – wskazują one na nową tabelę nadrzędną
+        indexes = _index_definitions(cursor, PARENT_TABLE)
+        cursor.execute(f'ALTER TABLE "{PARENT_TABLE}" RENAME TO "{LEGACY_TABLE}"')
+        # Partycja dostanie klucz główny (id, timestamp) tabeli nadrzędnej przy podpięciu
+        cursor.execute(f'ALTER TABLE "{LEGACY_TABLE}" DROP CONSTRAINT "{PARENT_TABLE}_pkey"')
+        for index_name, _ in indexes:
+            cursor.execute(f'ALTER INDEX "{index_name}" RENAME TO "{index_name[:56]}_legacy"')
+
+        # Tabele partycjonowane (przed PostgreSQL 17) nie obsługują kolumn IDENTITY – zastępujemy ją sekwencją
+        cursor.execute(f'ALTER TABLE "{LEGACY_TABLE}" ALTER COLUMN id DROP IDENTITY IF EXISTS')
+        cursor.execute(f'CREATE SEQUENCE "{SEQUENCE_NAME}"')
+        cursor.execute("SELECT setval(%s, %s, false)", [SEQUENCE_NAME, max_id + 1])
+
+        cursor.execute(
+            f'CREATE TABLE "{PARENT_TABLE}" (LIKE "{LEGACY_TABLE}" INCLUDING DEFAULTS) '
+            f'PARTITION BY RANGE ("timestamp")'
+        )
+        cursor.execute(f"""ALTER TABLE "{PARENT_TABLE}" ALTER COLUMN id SET DEFAULT nextval('"{SEQUENCE_NAME}"')""")
+        cursor.execute(f'ALTER SEQUENCE "{SEQUENCE_NAME}" OWNED BY "{PARENT_TABLE}".id')
+        # Klucz główny tabeli partycjonowanej musi zawierać kolumnę partycjonującą
+        cursor.execute(f'ALTER TABLE "{PARENT_TABLE}" ADD PRIMARY KEY (id, "timestamp")')
+        cursor.execute(
+            f'ALTER TABLE "{PARENT_TABLE}" ADD CONSTRAINT "{PARENT_TABLE}_hydroponic_system_id_fk" '
+            f'FOREIGN KEY (hydroponic_system_id) REFERENCES "{system_table}" (id) DEFERRABLE INITIALLY DEFERRED'
+        )
+        # Indeksy tworzone na tabeli nadrzędnej zostaną przeniesione na każdą partycję
+        for _, definition in indexes:
+            cursor.execute(definition)
+
+        cursor.execute(
+            f'ALTER TABLE "{PARENT_TABLE}" ATTACH PARTITION "{LEGACY_TABLE}" '
+            f'FOR VALUES FROM (MINVALUE) TO (%s)',
+            [_as_datetime(first_month)],
+        )
+        cursor.execute(f'CREATE TABLE "{DEFAULT_TABLE}" PARTITION OF "{PARENT_TABLE}" DEFAULT')
+
+        return ensure_partitions(months_ahead, start=first_month)
@@ -0,0 +1,20 @@
+"""
+Uprawnienia API.
+"""
+from rest_framework import permissions
+
+from .authentication import DevicePrincipal
+
+
+class DeviceIngestOnly(permissions.BasePermission):
+    """
+    Urządzenia mogą wyłącznie zapisywać pomiary (akcje wymienione w `device_actions` widoku);
+    pozostali uwierzytelnieni użytkownicy nie są ograniczani.
+    """
+
+    message = "Klucz urządzenia pozwala tylko na zapis pomiarów."
+
+    def has_permission(self, request, view):
+        if not isinstance(request.user, DevicePrincipal):
+            return True
+        return view.action in getattr(view, 'device_actions', ())
@@ -0,0 +1,234 @@
+"""
+Profilowanie wybranych żądań (cProfile) razem z zapytaniami SQL – ich czasem i miejscem wywołania w kodzie.
+Middleware może pozostać włączony na stałe: profilowane jest tylko żądanie
+- z nagłówkiem "X-Profile: <token>" (token podpisany, komenda create_profiling_token),
+- z ciasteczkiem "profile" od zalogowanego administratora (is_staff),
+- wylosowane z prawdopodobieństwem PROFILING_SAMPLE_RATE.
+Pozostałe żądania kosztują tylko sprawdzenie nagłówka i ciasteczka.
+
+Profilowany jest widok razem z renderowaniem odpowiedzi (process_view), w wątku, w którym widok działa –
+także pod ASGI. Treść odpowiedzi strumieniowych (eksport, kanał na żywo) powstaje później i nie jest objęta
+profilem. Zapis trafia do PROFILING_DIR: plik .prof (pstats) i .json (żądanie, zapytania SQL);
+najstarsze zapisy ponad PROFILING_MAX_CAPTURES są usuwane. Komenda list_profiles je wyświetla.
+"""
+import cProfile
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.utils.deprecation import MiddlewareMixin
+
+HEADER = 'HTTP_X_PROFILE'
+COOKIE = 'profile'
+TOKEN_SALT = 'api.profiling'
+# Maksymalna liczba zapytań SQL zapisywanych dla jednego żądania
+MAX_RECORDED_QUERIES = 2000
+
+# Od Pythona 3.12 w procesie może działać tylko jeden profiler cProfile naraz
+_profiler_lock = threading.Lock()
+
+_SKIPPED_PATHS = (os.path.dirname(__file__) + os.sep + 'profiling', os.sep + 'site-packages' + os.sep)
+
+
+def make_token():
+    """
+    Zwraca podpisany token nagłówka X-Profile (ważny PROFILING_TOKEN_MAX_AGE sekund).
+    """
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign('profile')
+
+
+def _valid_token(token):
+    try:
+        signing.TimestampSigner(salt=TOKEN_SALT).unsign(token, max_age=settings.PROFILING_TOKEN_MAX_AGE)
+    except signing.BadSignature:  # Obejmuje też przeterminowany token
+        return False
+    return True
+
+
+def _trigger(request):
+    """
+    Zwraca powód profilowania żądania ("header", "staff", "sample") albo None.
+    """
+    token = request.META.get(HEADER)
+    if token is not None and _valid_token(token):
+        return 'header'
+    if COOKIE in request.COOKIES and getattr(request.user, 'is_staff', False):
+        return 'staff'
+    rate = settings.PROFILING_SAMPLE_RATE
+    if rate and random.random() < rate:
+        return 'sample'
+    return None
+
+
+def _call_site():
+    """
+    Pierwsza ramka stosu w kodzie projektu (poza Django, bibliotekami i tym modułem) – "plik:wiersz w funkcji".
+    """
+    base = str(settings.BASE_DIR) + os.sep
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(base) and not any(part in filename for part in _SKIPPED_PATHS):
+            return f"{os.path.relpath(filename, base)}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+
+class QueryRecorder:
+    """
+    Wrapper wykonania zapytań (connection.execute_wrapper) zapisujący SQL, czas i miejsce wywołania.
+    """
+
+    def __init__(self):
+        self.queries = []
+        self.count = 0
+        self.total = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.total += duration
+            if len(self.queries) < MAX_RECORDED_QUERIES:
+                self.queries.append({
+                    'sql': sql,
+                    'many': many,
+                    'duration_ms': round(duration * 1000, 3),
+                    'site': _call_site(),
+                })
+
+
+def _view_name(request, view_func):
+    """
+    Nazwa widoku, np. "MeasurementViewSet.list" albo "system_detail_view".
+    """
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        return getattr(view_func, '__qualname__', repr(view_func))
+    action = (getattr(view_func, 'actions', None) or {}).get(request.method.lower())
+    return f"{cls.__name__}.{action}" if action else cls.__name__
+
+
+def _rotate(directory):
+    """
+    Usuwa najstarsze zapisy ponad PROFILING_MAX_CAPTURES (nazwy zaczynają się od czasu zapisu).
+    """
+    names = sorted(name[:-5] for name in os.listdir(directory) if name.endswith('.json'))
+    for name in names[:max(len(names) - settings.PROFILING_MAX_CAPTURES, 0)]:
+        for suffix in ('.json', '.prof'):
+            try:
+                os.remove(os.path.join(directory, name + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def save_capture(request, view, trigger, profiler, recorder, response, duration):
+    """
+    Zapisuje profil (.prof) i opis żądania z zapytaniami SQL (.json); zwraca nazwę zapisu.
+    """
+    directory = settings.PROFILING_DIR
+    os.makedirs(directory, exist_ok=True)
+    started = datetime.now(timezone.utc)
+    name = f"{started:%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:6]}"
+    profiler.dump_stats(os.path.join(directory, f"{name}.prof"))
+    capture = {
+        'name': name,
+        'time': started.isoformat(),
+        'method': request.method,
+        'path': request.path,
+        'query_string': request.META.get('QUERY_STRING', ''),
+        'view': view,
+        'trigger': trigger,
+        'user': getattr(request.user, 'pk', None),
+        'status': response.status_code,
+        'duration_ms': round(duration * 1000, 3),
+        'query_count': recorder.count,
+        'query_time_ms': round(recorder.total * 1000, 3),
+        'queries': recorder.queries,
+    }
+    # Zapis do pliku tymczasowego i zamiana – list_profiles nie odczyta niepełnego pliku
+    path = os.path.join(directory, f"{name}.json")
+    with open(f"{path}.tmp", 'w') as file:
+        json.dump(capture, file, indent=1)
+    os.replace(f"{path}.tmp", path)
+    _rotate(directory)
+    return name
+
+
+def load_captures(directory=None):
+    """
+    Zwraca opisy zapisanych profili (bez listy zapytań) od najnowszego.
+    """
+    directory = directory or settings.PROFILING_DIR
+    if not os.path.isdir(directory):
+        return []
+    captures = []
+    for filename in sorted(os.listdir(directory), reverse=True):
+        if filename.endswith('.json'):
+            with open(os.path.join(directory, filename)) as file:
+                capture = json.load(file)
+            capture.pop('queries', None)
+            captures.append(capture)
+    return captures
+
+
+def load_capture(name, directory=None):
+    """
+    Zwraca krotkę (opis z zapytaniami, ścieżka pliku .prof); rzuca FileNotFoundError dla nieznanego zapisu.
+    """
+    directory = directory or settings.PROFILING_DIR
+    with open(os.path.join(directory, f"{name}.json")) as file:
+        capture = json.load(file)
+    return capture, os.path.join(directory, f"{name}.prof")
+
+
+class ProfilingMiddleware(MiddlewareMixin):
+    """
+    Profiluje widok wybranych żądań (patrz opis modułu). Powinien być ostatni na liście MIDDLEWARE,
+    żeby wcześniejsze process_view (np. sprawdzenie CSRF) działały przed wywołaniem widoku.
+    Przy PROFILING_DIR = None jest pomijany przez Django.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_DIR:
+            raise MiddlewareNotUsed()
+        super().__init__(get_response)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if iscoroutinefunction(view_func):
+            return None  # Widoki asynchroniczne (kanał na żywo) nie są profilowane
+        trigger = _trigger(request)
+        if trigger is None or not _profiler_lock.acquire(blocking=False):
+            return None  # Widok zostanie wywołany jak zwykle
+        try:
+            profiler = cProfile.Profile()
+            recorder = QueryRecorder()
+            start = time.perf_counter()
+            with connection.execute_wrapper(recorder):
+                profiler.enable()
+                try:
+                    response = view_func(request, *view_args, **view_kwargs)
+                    if hasattr(response, 'render') and callable(response.render):
+                        response = response.render()  # Django nie renderuje odpowiedzi drugi raz
+                finally:
+                    profiler.disable()
+            duration = time.perf_counter() - start
+        finally:
+            _profiler_lock.release()
+        response['X-Profile-Id'] = save_capture(
+            request, _view_name(request, view_func), trigger, profiler, recorder, response, duration
+        )
+        return response
@@ -0,0 +1,129 @@
+"""
+Dwuetapowe usuwanie systemów hydroponicznych.
+Żądanie jedynie oznacza system jako usunięty (deleted_at), co ukrywa go w API i widokach.
+Dane systemu usuwane są później w krótkich transakcjach – przez wątek w tle procesu,
+który obsłużył żądanie, albo przez komendę purge_deleted_systems (np. z crona, po awarii procesu).
+"""
+import logging
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.utils.timezone import now
+
+from . import archive, hotwindow, response_cache
+from .authentication import key_cache
+from .models import AlertEvent, HydroponicSystem, Measurement, MeasurementRollup
+
+logger = logging.getLogger(__name__)
+
+# Tabele, które mogą mieć miliony wierszy systemu – czyszczone partiami przed usunięciem samego systemu.
+# Pozostałe powiązane obiekty (reguły alertów, klucze urządzeń) usuwa kaskada Django.
+BATCHED_MODELS = (Measurement, MeasurementRollup, AlertEvent)
+
+
+def soft_delete(system):
+    """
+    Oznacza system jako usunięty i zleca usunięcie jego danych w tle (po zatwierdzeniu transakcji).
+    """
+    HydroponicSystem.all_objects.filter(id=system.id).update(deleted_at=now())
+    key_cache.clear()  # Klucze urządzeń usuniętego systemu przestają działać w tym procesie od razu
+    hotwindow.forget(system.id)
+    transaction.on_commit(lambda: response_cache.invalidate_systems([system.id], [system.owner_id]))
+    if settings.SYSTEM_PURGE_IN_BACKGROUND:
+        transaction.on_commit(lambda: get_purger().schedule(system.id))
+
+
+def _delete_batch(model, system_id, batch_size):
+    """
+    Usuwa do `batch_size` wierszy systemu z tabeli modelu w jednej transakcji. Zwraca liczbę usuniętych.
+    """
+    table = model._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {table} WHERE id IN "
+            f"(SELECT id FROM {table} WHERE hydroponic_system_id = %s LIMIT %s)",
+            [system_id, batch_size],
+        )
+        return cursor.rowcount
+
+
+def purge_system(system_id, batch_size=None, sleep=None):
+    """
+    Usuwa dane systemu oznaczonego jako usunięty partiami, a na końcu sam system.
+    Można ją bezpiecznie przerwać i wywołać ponownie. Zwraca liczbę usuniętych wierszy danych.
+    """
+    batch_size = batch_size or settings.SYSTEM_PURGE_BATCH_SIZE
+    sleep = settings.SYSTEM_PURGE_SLEEP if sleep is None else sleep
+    if not HydroponicSystem.all_objects.filter(id=system_id, deleted_at__isnull=False).exists():
+        return 0  # System nie istnieje albo nie jest oznaczony do usunięcia
+
+    total = 0
+    for model in BATCHED_MODELS:
+        while True:
+            deleted = _delete_batch(model, system_id, batch_size)
+            total += deleted
+            if deleted < batch_size:
+                break
+            if sleep:
+                time.sleep(sleep)
+
+    archive.remove_system(system_id)
+    with transaction.atomic():
+        HydroponicSystem.all_objects.filter(id=system_id, deleted_at__isnull=False).delete()
+    return total
+
+
+def pending_system_ids():
+    """
+    Identyfikatory systemów oznaczonych do usunięcia, od najdawniej oznaczonych.
+    """
+    return list(
+        HydroponicSystem.all_objects.filter(deleted_at__isnull=False).order_by('deleted_at').values_list('id', flat=True)
+    )
+
+
+class Purger:
+    """
+    Wątek w tle usuwający dane systemów zleconych w bieżącym procesie.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="system-purge", daemon=True)
+        self._thread.start()
+
+    def schedule(self, system_id):
+        self._queue.put(system_id)
+
+    def _run(self):
+        while True:
+            system_id = self._queue.get()
+            close_old_connections()
+            try:
+                purge_system(system_id)
+            except Exception:
+                # System pozostaje oznaczony – dokończy go kolejne zlecenie albo komenda purge_deleted_systems
+                logger.exception("Usuwanie danych systemu %s nie powiodło się", system_id)
+            finally:
+                close_old_connections()
+
+
+_purger = None
+_purger_pid = None
+_purger_lock = threading.Lock()
+
+
+def get_purger():
+    """
+    Zwraca wątek usuwania bieżącego procesu, tworząc go przy pierwszym użyciu.
+    """
+    global _purger, _purger_pid
+    with _purger_lock:
+        if _purger is None or _purger_pid != os.getpid():
+            _purger = Purger()
+            _purger_pid = os.getpid()
+        return _purger
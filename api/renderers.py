@@ -0,0 +1,26 @@
+"""
+Szybki renderer JSON oparty na orjson.
+Wynik jest zgodny z JSONRenderer DRF: daty i czasy mają postać ISO 8601 z "Z" dla UTC,
+a typy spoza JSON (Decimal, UUID, leniwe napisy) zamienia koder DRF.
+"""
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Renderer JSON kodujący odpowiedź w C (orjson), łącznie z datami.
+    Żądanie wcięć (`Accept: application/json; indent=4`) obsługuje zwykły JSONRenderer.
+    """
+
+    _default = JSONEncoder().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return orjson.dumps(data, default=self._default, option=OPTIONS)
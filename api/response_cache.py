@@ -0,0 +1,183 @@
+"""
+Pamięć podręczna odpowiedzi endpointów odczytu (lista systemów, lista pomiarów, szczegóły systemu).
+Klucz wpisu zawiera liczniki wersji zakresów danych, od których zależy odpowiedź: "all" (wszystkie dane),
+"user:<id>" (systemy i pomiary użytkownika) oraz "system:<id>" (jeden system). Zapis pomiarów, zmiana
+i usunięcie systemu podbijają liczniki swoich zakresów – kolejne żądania trafiają pod nowy klucz,
+a nieaktualne wpisy wygasają (TTL) lub są wypierane (LRU) przez backend pamięci podręcznej.
+
+Backend wybiera ustawienie RESPONSE_CACHE_ALIAS spośród CACHES (pamięć procesu, pliki, Redis).
+Pamięć procesu nie jest współdzielona – przy wielu procesach roboczych należy wskazać Redis lub pliki,
+inaczej proces, który nie obsłużył zapisu, zwracałby odpowiedź sprzed niego aż do wygaśnięcia wpisu.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.template.response import SimpleTemplateResponse
+
+from .models import HydroponicSystem, Measurement
+
+VERSION_PREFIX = 'resp-ver'
+OWNER_PREFIX = 'resp-owner'
+ENTRY_PREFIX = 'resp'
+
+# Nagłówki, których nie wolno powtarzać w odpowiedziach z pamięci podręcznej
+SKIPPED_HEADERS = {'set-cookie'}
+
+
+def get_cache():
+    """
+    Zwraca backend pamięci podręcznej odpowiedzi albo None, jeśli jest wyłączona.
+    """
+    alias = settings.RESPONSE_CACHE_ALIAS
+    return caches[alias] if alias else None
+
+
+def _initial_version():
+    # Licznik tworzony od nowa (np. po wyparciu) nie może powtórzyć wcześniejszej wartości
+    return time.time_ns()
+
+
+def _versions(cache, scopes):
+    """
+    Zwraca bieżące wersje zakresów (jedno zapytanie do backendu przy istniejących licznikach).
+    """
+    keys = [f"{VERSION_PREFIX}:{scope}" for scope in scopes]
+    found = cache.get_many(keys)
+    versions = []
+    for key in keys:
+        if key not in found:
+            cache.add(key, _initial_version(), None)
+            found[key] = cache.get(key)
+        versions.append(str(found[key]))
+    return versions
+
+
+def _bump(cache, scopes):
+    for scope in scopes:
+        key = f"{VERSION_PREFIX}:{scope}"
+        try:
+            cache.incr(key)
+        except ValueError:  # Licznik nie istnieje
+            cache.set(key, _initial_version(), None)
+
+
+def _owners(cache, system_ids):
+    """
+    Zwraca słownik {system: właściciel}; brakujące przypisania pobiera jednym zapytaniem.
+    """
+    keys = {system_id: f"{OWNER_PREFIX}:{system_id}" for system_id in system_ids}
+    found = cache.get_many(keys.values())
+    owners = {system_id: found[key] for system_id, key in keys.items() if key in found}
+    missing = [system_id for system_id in keys if system_id not in owners]
+    if missing:
+        rows = dict(HydroponicSystem.all_objects.filter(id__in=missing).values_list('id', 'owner_id'))
+        cache.set_many({keys[system_id]: owner_id for system_id, owner_id in rows.items()}, None)
+        owners.update(rows)
+    return owners
+
+
+def invalidate_systems(system_ids, owner_ids=()):
+    """
+    Unieważnia odpowiedzi zależne od podanych systemów i ich właścicieli.
+    """
+    cache = get_cache()
+    system_ids = set(system_ids)
+    if cache is None or not (system_ids or owner_ids):
+        return
+    owners = set(owner_ids) | set(_owners(cache, system_ids).values())
+    _bump(cache, [*(f"system:{system_id}" for system_id in system_ids), *(f"user:{owner}" for owner in owners)])
+
+
+def invalidate_all():
+    """
+    Unieważnia wszystkie odpowiedzi (np. po usunięciu starych pomiarów przez retencję).
+    """
+    cache = get_cache()
+    if cache is not None:
+        _bump(cache, ['all'])
+
+
+def lookup(request, name, scopes, vary=()):
+    """
+    Zwraca krotkę (klucz, odpowiedź) dla żądania GET użytkownika; odpowiedź jest None przy braku wpisu.
+    Klucz jest None, gdy żądanie nie może korzystać z pamięci podręcznej.
+    `scopes` to zakresy danych, od których zależy odpowiedź, a `vary` – dodatkowe wartości różnicujące wpis
+    (np. format odpowiedzi).
+    """
+    cache = get_cache()
+    user_id = getattr(request.user, 'pk', None)
+    if cache is None or request.method != 'GET' or user_id is None:
+        return None, None
+
+    query = sorted((name_, values) for name_, values in request.GET.lists())
+    digest = hashlib.md5(repr((query, *vary)).encode(), usedforsecurity=False).hexdigest()
+    versions = '.'.join(_versions(cache, ['all', *scopes]))
+    key = f"{ENTRY_PREFIX}:{name}:{user_id}:{versions}:{digest}"
+
+    entry = cache.get(key)
+    if entry is None:
+        return key, None
+    status, headers, content = entry
+    return key, HttpResponse(content, status=status, headers=headers)
+
+
+def _save(key, response):
+    content = response.content
+    if len(content) > settings.RESPONSE_CACHE_MAX_BYTES:
+        return
+    headers = {name: value for name, value in response.items() if name.lower() not in SKIPPED_HEADERS}
+    get_cache().set(key, (response.status_code, headers, content), settings.RESPONSE_CACHE_TTL)
+
+
+def store(key, response):
+    """
+    Zapisuje odpowiedź 200 pod kluczem z lookup(); odpowiedzi DRF zapisywane są po wyrenderowaniu.
+    Zwraca tę samą odpowiedź.
+    """
+    if key is None or response.status_code != 200 or response.streaming:
+        return response
+    if isinstance(response, SimpleTemplateResponse) and not response.is_rendered:
+        response.add_post_render_callback(lambda rendered: _save(key, rendered))
+    else:
+        _save(key, response)
+    return response
+
+
+@receiver(post_delete, sender=HydroponicSystem)
+@receiver(post_save, sender=HydroponicSystem)
+def system_changed(instance, **kwargs):
+    """
+    Utworzenie, zmiana lub usunięcie systemu (API, panel administracyjny) unieważnia jego odpowiedzi
+    po zatwierdzeniu transakcji.
+    """
+    cache = get_cache()
+    if cache is None:
+        return
+
+    system_id, owner_id = instance.id, instance.owner_id  # Po usunięciu instancja traci identyfikator
+
+    def bump():
+        old_owner = cache.get(f"{OWNER_PREFIX}:{system_id}")
+        cache.delete(f"{OWNER_PREFIX}:{system_id}")  # Właściciel mógł zostać zmieniony
+        owners = {owner_id, old_owner} - {None}
+        _bump(cache, [f"system:{system_id}", *(f"user:{owner}" for owner in owners)])
+
+    transaction.on_commit(bump)
+
+
+@receiver(post_delete, sender=Measurement)
+@receiver(post_save, sender=Measurement)
+def measurement_changed(instance, **kwargs):
+    """
+    Dodanie, zmiana lub usunięcie pomiaru przez model (API, panel administracyjny) unieważnia odpowiedzi
+    jego systemu po zatwierdzeniu transakcji – także pomiaru zapisanego z pominięciem after_ingest.
+    Zapis partii (bulk_create, SQL) nie wysyła sygnałów i unieważnia odpowiedzi w after_ingest.
+    """
+    system_id = instance.hydroponic_system_id
+    transaction.on_commit(lambda: invalidate_systems([system_id]))
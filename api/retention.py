@@ -0,0 +1,146 @@
+"""
+Usuwanie surowych pomiarów starszych niż okres przechowywania.
+Okres wynika z pola HydroponicSystem.raw_retention_days, a gdy jest puste – z ustawienia
+MEASUREMENT_RAW_RETENTION_DAYS (None – bez limitu). Agregaty (MeasurementRollup) nie są usuwane.
+Pomiary usuwane są w krótkich transakcjach obejmujących kolejne zakresy identyfikatorów;
+przy tabeli partycjonowanej całe wygasłe partycje są odłączane i usuwane.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Min
+
+from . import partitions
+from .models import HydroponicSystem, JobCheckpoint, Measurement
+
+CHECKPOINT_NAME = 'retention'
+
+MEASUREMENT_TABLE = Measurement._meta.db_table
+SYSTEM_TABLE = HydroponicSystem._meta.db_table
+
+
+def retention_days():
+    """
+    Zwraca zbiór okresów przechowywania (w dniach) obowiązujących w systemach; None oznacza brak limitu.
+    """
+    default = settings.MEASUREMENT_RAW_RETENTION_DAYS
+    days = set(HydroponicSystem.objects.filter(raw_retention_days__isnull=False)
+               .values_list('raw_retention_days', flat=True).distinct())
+    if HydroponicSystem.objects.filter(raw_retention_days__isnull=True).exists():
+        days.add(default)
+    return days
+
+
+def cutoff_bounds(moment):
+    """
+    Zwraca krotkę (najwcześniejsza, najpóźniejsza) granica wygaśnięcia w systemach.
+    Pierwsza jest None, jeśli któryś system przechowuje dane bez limitu; obie – jeśli żaden nie ma limitu.
+    """
+    days = retention_days()
+    limited = [value for value in days if value is not None]
+    if not limited:
+        return None, None
+    latest = moment - timedelta(days=min(limited))
+    earliest = None if None in days else moment - timedelta(days=max(limited))
+    return earliest, latest
+
+
+def expired_partitions(moment):
+    """
+    Partycje, których wszystkie pomiary są starsze niż granica każdego systemu.
+    Partycja domyślna i partycje bez górnej granicy nie są brane pod uwagę.
+    """
+    earliest, _ = cutoff_bounds(moment)
+    if earliest is None or not partitions.is_partitioned():
+        return []
+    return [
+        name for name, lower, upper in partitions.list_partitions()
+        if upper is not None and upper <= earliest
+    ]
+
+
+def drop_partition(name):
+    """
+    Odłącza i usuwa partycję (operacja na metadanych, bez przepisywania wierszy).
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE "{partitions.PARENT_TABLE}" DETACH PARTITION "{name}"')
+        cursor.execute(f'DROP TABLE "{name}"')
+
+
+def _expired_condition():
+    """
+    Warunek SQL "pomiar m wygasł w systemie s" (parametry: chwila odniesienia, domyślny okres).
+    """
+    return (
+        "m.hydroponic_system_id = s.id AND m.timestamp < %s - make_interval("
+        "days => COALESCE(s.raw_retention_days, %s))"
+    )
+
+
+def delete_range(moment, low, high):
+    """
+    Usuwa wygasłe pomiary o identyfikatorach z zakresu [low, high) w jednej krótkiej transakcji.
+    Zwraca liczbę usuniętych wierszy.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {MEASUREMENT_TABLE} m USING {SYSTEM_TABLE} s "
+            f"WHERE m.id >= %s AND m.id < %s AND {_expired_condition()}",
+            [low, high, moment, settings.MEASUREMENT_RAW_RETENTION_DAYS],
+        )
+        return cursor.rowcount
+
+
+def id_range(moment):
+    """
+    Zakres identyfikatorów do przejrzenia: od najmniejszego identyfikatora pomiaru
+    do największego identyfikatora pomiaru starszego niż najpóźniejsza granica (włącznie).
+    Zwraca (None, None), gdy nie ma czego usuwać.
+    """
+    _, latest = cutoff_bounds(moment)
+    if latest is None:
+        return None, None
+    first = Measurement.objects.aggregate(first=Min('id'))['first']
+    last = (
+        Measurement.objects.filter(timestamp__lt=latest).order_by('-id').values_list('id', flat=True).first()
+    )
+    if first is None or last is None:
+        return None, None
+    return first, last + 1
+
+
+def first_timestamp():
+    """
+    Czas najstarszego pomiaru (None, gdy tabela jest pusta).
+    """
+    return Measurement.objects.order_by('timestamp').values_list('timestamp', flat=True).first()
+
+
+def expired_counts(moment):
+    """
+    Liczba wygasłych pomiarów w każdym systemie (raport dla --dry-run): {system_id: liczba}.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT s.id, COUNT(*) FROM {MEASUREMENT_TABLE} m, {SYSTEM_TABLE} s "
+            f"WHERE {_expired_condition()} GROUP BY s.id ORDER BY s.id",
+            [moment, settings.MEASUREMENT_RAW_RETENTION_DAYS],
+        )
+        return dict(cursor.fetchall())
+
+
+def load_checkpoint():
+    """
+    Zwraca identyfikator, od którego należy wznowić przerwane przebieganie, albo None.
+    """
+    return JobCheckpoint.objects.filter(name=CHECKPOINT_NAME).values_list('position', flat=True).first()
+
+
+def save_checkpoint(position):
+    JobCheckpoint.objects.update_or_create(name=CHECKPOINT_NAME, defaults={'position': position})
+
+
+def clear_checkpoint():
+    JobCheckpoint.objects.filter(name=CHECKPOINT_NAME).delete()
@@ -0,0 +1,332 @@
+"""
+Agregaty pomiarów (minuta / godzina / dzień).
+Agregaty aktualizowane są przyrostowo przy zapisie pomiarów, a komenda rebuild_rollups
+przelicza je od nowa z surowych danych. Zapytania o serie czasowe czytają najgrubszą
+rozdzielczość, która pasuje do żądanego przedziału.
+
+Przeliczanie i zapis przyrostowy wykluczają się blokadami doradczymi PostgreSQL (na czas transakcji):
+zapis bierze blokadę współdzieloną ogólną i systemów partii, przeliczanie – wyłączną systemów
+(albo ogólną, gdy obejmuje wszystkie systemy). Dzięki temu przyrost zatwierdzony między odczytem
+surowych danych a nadpisaniem agregatów nie ginie.
+"""
+import re
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from django.db import connection, transaction
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import TruncDay, TruncHour, TruncMinute
+
+from .models import Measurement, MeasurementArchive, MeasurementRollup
+
+# Rozdzielczości agregatów w sekundach, od najdrobniejszej
+RESOLUTIONS = {'1m': 60, '1h': 3600, '1d': 86400}
+
+METRICS = ("ph", "temperature", "tds")
+# Kolumny statystyk agregatu w kolejności (metryka, statystyka)
+STAT_COLUMNS = [f"{metric}_{stat}" for metric in METRICS for stat in ("min", "max", "sum")]
+
+_TRUNC = {'1m': TruncMinute, '1h': TruncHour, '1d': TruncDay}
+_BUCKET_RE = re.compile(r"^(\d+)([mhd])$")
+_UNIT_SECONDS = {'m': 60, 'h': 3600, 'd': 86400}
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Klasa blokad doradczych agregatów ("roll"); drugi klucz to identyfikator systemu, 0 – blokada ogólna
+LOCK_CLASS = 0x726f6c6c
+
+# Sposoby uzupełniania przedziałów bez pomiarów w macierzy wielu systemów
+FILL_METHODS = ('null', 'locf')
+MATRIX_STATS = ('avg', 'min', 'max')
+
+
+def parse_bucket(value):
+    """
+    Zamienia zapis przedziału (np. "15m", "1h", "1d") na liczbę sekund.
+    Zwraca None dla niepoprawnego zapisu.
+    """
+    match = _BUCKET_RE.match(value or "")
+    if not match or int(match.group(1)) == 0:
+        return None
+    return int(match.group(1)) * _UNIT_SECONDS[match.group(2)]
+
+
+def pick_resolution(bucket_seconds):
+    """
+    Wybiera najgrubszą rozdzielczość agregatów, z której da się złożyć przedział o podanej długości.
+    """
+    best = None
+    for resolution, seconds in RESOLUTIONS.items():
+        if seconds <= bucket_seconds and bucket_seconds % seconds == 0:
+            best = resolution
+    return best
+
+
+def bucket_floor(timestamp, seconds):
+    """
+    Zaokrągla znacznik czasu w dół do początku przedziału (przedziały liczone od epoki UTC).
+    """
+    offset = int((timestamp - _EPOCH).total_seconds()) // seconds * seconds
+    return _EPOCH + timedelta(seconds=offset)
+
+
+def _empty_rollup():
+    return {"count": 0, **dict.fromkeys(STAT_COLUMNS)}
+
+
+def _merge(rollup, count, values):
+    """
+    Dołącza do agregatu `count` pomiarów o podanych wartościach (metryka -> (min, max, suma)).
+    """
+    rollup["count"] += count
+    for metric, (low, high, total) in values.items():
+        current_min, current_max = rollup[f"{metric}_min"], rollup[f"{metric}_max"]
+        rollup[f"{metric}_min"] = low if current_min is None else min(current_min, low)
+        rollup[f"{metric}_max"] = high if current_max is None else max(current_max, high)
+        rollup[f"{metric}_sum"] = (rollup[f"{metric}_sum"] or 0.0) + total
+
+
+def aggregate_measurements(measurements):
+    """
+    Grupuje pomiary w agregaty dla wszystkich rozdzielczości.
+    Zwraca słownik (system, rozdzielczość, początek przedziału) -> agregat.
+    """
+    rollups = {}
+    for measurement in measurements:
+        values = {}
+        for metric in METRICS:
+            value = getattr(measurement, metric)
+            values[metric] = (value, value, value)
+        for resolution, seconds in RESOLUTIONS.items():
+            key = (measurement.hydroponic_system_id, resolution, bucket_floor(measurement.timestamp, seconds))
+            _merge(rollups.setdefault(key, _empty_rollup()), 1, values)
+    return rollups
+
+
+def _upsert_sql(rows_count):
+    """
+    Buduje INSERT ... ON CONFLICT, który dokłada nowe pomiary do istniejących agregatów.
+    """
+    table = MeasurementRollup._meta.db_table
+    columns = ["hydroponic_system_id", "resolution", "bucket_start", "count"] + STAT_COLUMNS
+    # SQLite nie zna LEAST/GREATEST, ale jego wieloargumentowe MIN/MAX działają tak samo
+    least, greatest = ("LEAST", "GREATEST") if connection.vendor == 'postgresql' else ("MIN", "MAX")
+
+    updates = [f'"count" = "{table}"."count" + excluded."count"']
+    for metric in METRICS:
+        updates.append(f'"{metric}_min" = {least}("{table}"."{metric}_min", excluded."{metric}_min")')
+        updates.append(f'"{metric}_max" = {greatest}("{table}"."{metric}_max", excluded."{metric}_max")')
+        updates.append(f'"{metric}_sum" = "{table}"."{metric}_sum" + excluded."{metric}_sum"')
+
+    column_list = ", ".join(f'"{column}"' for column in columns)
+    placeholders = "(" + ", ".join(["%s"] * len(columns)) + ")"
+    return (
+        f'INSERT INTO "{table}" ({column_list}) '
+        f'VALUES {", ".join([placeholders] * rows_count)} '
+        f'ON CONFLICT ("hydroponic_system_id", "resolution", "bucket_start") DO UPDATE SET {", ".join(updates)}'
+    )
+
+
+def _lock(system_ids, exclusive):
+    """
+    Bierze blokady doradcze agregatów do końca bieżącej transakcji: ogólną (współdzieloną, a wyłączną przy
+    przeliczaniu wszystkich systemów, czyli `system_ids` = None) i systemów w stałej kolejności.
+    """
+    if connection.vendor != 'postgresql':
+        return
+    function = 'pg_advisory_xact_lock' if exclusive else 'pg_advisory_xact_lock_shared'
+    with connection.cursor() as cursor:
+        if system_ids is None:
+            cursor.execute(f"SELECT {function}(%s, 0)", [LOCK_CLASS])
+            return
+        cursor.execute("SELECT pg_advisory_xact_lock_shared(%s, 0)", [LOCK_CLASS])
+        for system_id in sorted(system_ids):
+            cursor.execute(f"SELECT {function}(%s, %s)", [LOCK_CLASS, system_id])
+
+
+def apply_measurements(measurements, batch_size=500):
+    """
+    Przyrostowo aktualizuje agregaty o nowo zapisane pomiary.
+    Wywoływana w transakcji zapisu pomiarów – blokady systemów trwają do jej zatwierdzenia.
+    """
+    rollups = aggregate_measurements(measurements)
+    _lock({key[0] for key in rollups}, exclusive=False)
+    # Stała kolejność kluczy ogranicza ryzyko zakleszczeń przy równoległym zapisie
+    items = sorted(rollups.items(), key=lambda item: item[0])
+
+    with connection.cursor() as cursor:
+        for start in range(0, len(items), batch_size):
+            batch = items[start:start + batch_size]
+            params = []
+            for (system_id, resolution, bucket_start), rollup in batch:
+                params.extend([system_id, resolution, bucket_start, rollup["count"]])
+                params.extend(rollup[column] for column in STAT_COLUMNS)
+            cursor.execute(_upsert_sql(len(batch)), params)
+
+
+def _archived_spans(start, end, system_ids):
+    """
+    Zakresy czasu segmentów archiwum kolumnowego nachodzące na [start, end): system -> [(pierwszy, ostatni)].
+    """
+    segments = MeasurementArchive.objects.filter(first_timestamp__lt=end, last_timestamp__gte=start)
+    if system_ids:
+        segments = segments.filter(hydroponic_system_id__in=system_ids)
+    spans = {}
+    for system_id, first, last in segments.values_list('hydroponic_system_id', 'first_timestamp', 'last_timestamp'):
+        spans.setdefault(system_id, []).append((first, last))
+    return spans
+
+
+def _overlaps_archive(spans, system_id, bucket_start, seconds):
+    bucket_end = bucket_start + timedelta(seconds=seconds)
+    return any(first < bucket_end and last >= bucket_start for first, last in spans.get(system_id, ()))
+
+
+def rebuild(start, end, system_ids=None):
+    """
+    Przelicza agregaty z surowych pomiarów w przedziale [start, end).
+    Istniejące agregaty są nadpisywane; przedziały bez surowych danych pozostają bez zmian.
+    Przedziały nachodzące na zarchiwizowane pomiary systemu (api/archive.py) też pozostają bez zmian –
+    w bazie jest tylko ich część, a agregaty zostały uzupełnione przy zapisie.
+    Można ją uruchamiać przy działającym zapisie: odczyt i nadpisanie odbywają się w jednej transakcji pod
+    wyłączną blokadą systemów, na którą czeka zapis pomiarów tych systemów (zwykle krótko – jeden dzień danych).
+    Zwraca liczbę zapisanych agregatów.
+    """
+    with transaction.atomic():
+        _lock(set(system_ids) if system_ids else None, exclusive=True)
+        return _rebuild(start, end, system_ids)
+
+
+def _rebuild(start, end, system_ids):
+    measurements = Measurement.objects.filter(timestamp__gte=start, timestamp__lt=end)
+    if system_ids:
+        measurements = measurements.filter(hydroponic_system_id__in=system_ids)
+    archived = _archived_spans(start, end, system_ids)
+
+    aggregates = {"count": Count("id")}
+    for metric in METRICS:
+        aggregates[f"{metric}_min"] = Min(metric)
+        aggregates[f"{metric}_max"] = Max(metric)
+        aggregates[f"{metric}_sum"] = Sum(metric)
+
+    written = 0
+    for resolution, trunc in _TRUNC.items():
+        rows = (
+            measurements
+            .annotate(bucket=trunc("timestamp", tzinfo=timezone.utc))
+            .values("hydroponic_system_id", "bucket")
+            .annotate(**aggregates)
+            .order_by()
+        )
+        rollups = [
+            MeasurementRollup(
+                resolution=resolution,
+                bucket_start=row.pop("bucket"),
+                **row,
+            )
+            for row in rows
+            if not _overlaps_archive(archived, row["hydroponic_system_id"], row["bucket"], RESOLUTIONS[resolution])
+        ]
+        MeasurementRollup.objects.bulk_create(
+            rollups,
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=["hydroponic_system", "resolution", "bucket_start"],
+            update_fields=["count"] + STAT_COLUMNS,
+        )
+        written += len(rollups)
+    return written
+
+
+def series(system_id, bucket_seconds, start, end):
+    """
+    Zwraca serię agregatów systemu w przedziałach o długości `bucket_seconds` dla zakresu [start, end).
+    Dane czytane są z najgrubszej pasującej rozdzielczości i w razie potrzeby scalane.
+    """
+    resolution = pick_resolution(bucket_seconds)
+    rollups = (
+        MeasurementRollup.objects
+        .filter(
+            hydroponic_system_id=system_id,
+            resolution=resolution,
+            bucket_start__gte=bucket_floor(start, bucket_seconds),
+            bucket_start__lt=end,
+        )
+        .order_by("bucket_start")
+        .values_list("bucket_start", "count", *STAT_COLUMNS)
+    )
+
+    buckets = {}
+    for bucket_start, count, *stats in rollups:
+        values = {metric: tuple(stats[index * 3:index * 3 + 3]) for index, metric in enumerate(METRICS)}
+        _merge(buckets.setdefault(bucket_floor(bucket_start, bucket_seconds), _empty_rollup()), count, values)
+
+    return resolution, [
+        {
+            "timestamp": bucket_start,
+            "count": rollup["count"],
+            **{
+                metric: {
+                    "min": rollup[f"{metric}_min"],
+                    "max": rollup[f"{metric}_max"],
+                    "avg": rollup[f"{metric}_sum"] / rollup["count"],
+                }
+                for metric in METRICS
+            },
+        }
+        for bucket_start, rollup in sorted(buckets.items())
+    ]
+
+
+def fill_forward(values):
+    """
+    Uzupełnia braki (NaN) w każdej kolumnie ostatnią wcześniejszą wartością.
+    Braki przed pierwszą wartością kolumny pozostają NaN.
+    """
+    if not values.size:
+        return values
+    rows = np.arange(values.shape[0])[:, None]
+    last = np.maximum.accumulate(np.where(np.isnan(values), 0, rows), axis=0)
+    return values[last, np.arange(values.shape[1])]
+
+
+def matrix(system_ids, bucket_seconds, start, end, metrics=METRICS, stat='avg', fill='null'):
+    """
+    Wyrównana w czasie macierz wielu systemów: wiersze to kolejne przedziały od początku przedziału
+    zawierającego `start` do `end`, kolumny – systemy w kolejności `system_ids`.
+    Wszystkie systemy i wartości czytane są jednym zapytaniem grupującym agregaty.
+    Zwraca krotkę (rozdzielczość, początki przedziałów w sekundach od epoki, {metryka: macierz}).
+    """
+    resolution = pick_resolution(bucket_seconds)
+    first = bucket_floor(start, bucket_seconds)
+    first_epoch = (first - _EPOCH).total_seconds()
+    rows_count = max(0, -(-int((end - first).total_seconds()) // bucket_seconds))
+
+    aggregate = {'avg': 'SUM("{0}_sum") / NULLIF(SUM("count"), 0)', 'min': 'MIN("{0}_min")', 'max': 'MAX("{0}_max")'}
+    values_sql = ", ".join(aggregate[stat].format(metric) for metric in metrics)
+    table = MeasurementRollup._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT "hydroponic_system_id", '
+            f'FLOOR((EXTRACT(EPOCH FROM "bucket_start") - %s) / %s)::integer AS "row", {values_sql} '
+            f'FROM "{table}" '
+            f'WHERE "hydroponic_system_id" = ANY(%s) AND "resolution" = %s '
+            f'AND "bucket_start" >= %s AND "bucket_start" < %s '
+            f'GROUP BY 1, 2',
+            [first_epoch, bucket_seconds, list(system_ids), resolution, first, end],
+        )
+        rows = cursor.fetchall()
+
+    columns = {system_id: index for index, system_id in enumerate(system_ids)}
+    result = {metric: np.full((rows_count, len(system_ids)), np.nan) for metric in metrics}
+    if rows:
+        data = np.array([row[2:] for row in rows], dtype=np.float64)  # None -> NaN
+        row_index = np.fromiter((row[1] for row in rows), dtype=np.int64, count=len(rows))
+        column_index = np.fromiter((columns[row[0]] for row in rows), dtype=np.int64, count=len(rows))
+        for index, metric in enumerate(metrics):
+            result[metric][row_index, column_index] = data[:, index]
+    if fill == 'locf':
+        result = {metric: fill_forward(values) for metric, values in result.items()}
+
+    timestamps = first_epoch + np.arange(rows_count, dtype=np.float64) * bucket_seconds
+    return resolution, timestamps, result
@@ -1,28 +1,193 @@
+from operator import attrgetter
+
 from rest_framework import serializers
-from .models import HydroponicSystem, Measurement
+from . import ingest, summary
+from .models import AlertEvent, AlertRule, HydroponicSystem, Measurement
+
+
+class HydroponicSystemListSerializer(serializers.ListSerializer):
+    """
+    Lista systemów: statystyki 24 h wszystkich systemów pobierane są naraz, a nie osobno dla każdego.
+    """
+
+    def to_representation(self, data):
+        systems = list(data.all() if hasattr(data, 'all') else data)
+        self.context['stats_24h'] = summary.stats_24h(system.id for system in systems)
+        return super().to_representation(systems)
+
 
 class HydroponicSystemSerializer(serializers.ModelSerializer):
     """
     Serializer dla modelu HydroponicSystem.
     Pozwala na konwersję obiektów na JSON i odwrotnie.
     Pole `owner` jest tylko do odczytu i reprezentuje nazwę użytkownika.
+    Pola `latest` (najnowszy pomiar) i `stats_24h` (min/max/średnia z 24 godzin) są tylko do odczytu.
     """
     owner = serializers.ReadOnlyField(source='owner.username')
+    latest = serializers.SerializerMethodField()
+    stats_24h = serializers.SerializerMethodField()
 
     class Meta:
         model = HydroponicSystem
-        fields = ['id', 'name', 'location', 'created_at', 'owner']
+        fields = ['id', 'name', 'location', 'created_at', 'owner', 'raw_retention_days', 'latest', 'stats_24h']
+        list_serializer_class = HydroponicSystemListSerializer
+
+    def get_latest(self, obj):
+        return summary.latest_reading(obj)
+
+    def get_stats_24h(self, obj):
+        stats = self.context.get('stats_24h')
+        if stats is None or obj.id not in stats:
+            stats = summary.stats_24h([obj.id])
+        return stats[obj.id]
+
+
+class ClientTimestampField(serializers.DateTimeField):
+    """
+    Czas pomiaru podany przez urządzenie; nie może wykraczać w przyszłość poza MEASUREMENT_MAX_CLOCK_SKEW.
+    """
+
+    def to_internal_value(self, value):
+        moment = super().to_internal_value(value)
+        if not 0 < moment.timestamp() <= ingest.latest_timestamp():
+            raise serializers.ValidationError(ingest.TIMESTAMP_MESSAGE)
+        return moment
 
 
-class MeasurementSerializer(serializers.ModelSerializer):
+class ClientMeasurementMixin(serializers.Serializer):
+    """
+    Opcjonalne pola zapisu pomiaru z urządzenia: `timestamp` (domyślnie czas zapisu) i `dedup_key`
+    (tylko do zapisu). Pomiar z kluczem deduplikacji musi mieć czas pomiaru – razem tworzą klucz unikalny.
+    """
+    timestamp = ClientTimestampField(required=False)
+    dedup_key = serializers.CharField(max_length=ingest.DEDUP_KEY_MAX_LENGTH, required=False, write_only=True)
+
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        if 'dedup_key' in attrs and 'timestamp' not in attrs:
+            raise serializers.ValidationError({'dedup_key': [ingest.DEDUP_TIMESTAMP_MESSAGE]})
+        return attrs
+
+
+class MeasurementSerializer(ClientMeasurementMixin, serializers.ModelSerializer):
     """
     Serializer dla modelu Measurement.
     Konwertuje pomiary z czujników na format JSON.
-    Pole `timestamp` jest tylko do odczytu, ponieważ generuje się automatycznie.
+    Pole `timestamp` jest opcjonalne – bez niego czasem pomiaru jest czas zapisu.
     """
     hydroponic_system = serializers.PrimaryKeyRelatedField(queryset=HydroponicSystem.objects.all())
-    timestamp = serializers.ReadOnlyField()
 
     class Meta:
         model = Measurement
-        fields = ['id', 'hydroponic_system', 'timestamp', 'ph', 'temperature', 'tds']
+        fields = ['id', 'hydroponic_system', 'timestamp', 'ph', 'temperature', 'tds', 'dedup_key']
+        validators = []  # Duplikaty klucza deduplikacji pomija zapis (ON CONFLICT), a nie walidacja
+
+
+class RowEncoder:
+    """
+    Serializacja tylko do odczytu wierszy z values_list() – bez instancji modeli i pól serializera.
+    `fields` to pary (nazwa w JSON, kolumna). Wartości (także daty) pozostają bez zmian – koduje je FastJSONRenderer.
+    """
+
+    LAYOUTS = ('rows', 'columns')
+
+    def __init__(self, fields):
+        self.names = tuple(name for name, _ in fields)
+        self.columns = tuple(column for _, column in fields)
+        names = self.names
+
+        def encode_row(row):
+            return dict(zip(names, row))
+
+        self._encode_row = encode_row
+        self._from_instance = attrgetter(*self.columns)
+
+    def values_list(self, queryset):
+        """
+        Queryset krotek z kolumnami kodera; krotki mają też atrybuty (np. do stronicowania po timestamp i id).
+        """
+        return queryset.values_list(*self.columns, named=True)
+
+    def from_instances(self, instances):
+        """
+        Zamienia instancje modelu na krotki kolumn kodera.
+        """
+        return [self._from_instance(instance) for instance in instances]
+
+    def encode(self, rows, layout='rows'):
+        """
+        Zwraca listę słowników (layout "rows") albo słownik z jedną listą wartości na pole (layout "columns").
+        """
+        if layout == 'columns':
+            columns = list(zip(*rows)) or [()] * len(self.names)
+            return {name: list(values) for name, values in zip(self.names, columns)}
+        return list(map(self._encode_row, rows))
+
+
+# Odczyt list pomiarów – te same pola co MeasurementSerializer
+MEASUREMENT_ROWS = RowEncoder([
+    ('id', 'id'),
+    ('hydroponic_system', 'hydroponic_system_id'),
+    ('timestamp', 'timestamp'),
+    ('ph', 'ph'),
+    ('temperature', 'temperature'),
+    ('tds', 'tds'),
+])
+
+
+class DeviceMeasurementSerializer(ClientMeasurementMixin, serializers.ModelSerializer):
+    """
+    Serializer pomiarów zapisywanych kluczem urządzenia.
+    System wynika z klucza, więc nie jest pobierany z bazy; pole `hydroponic_system` jest opcjonalne.
+    """
+    hydroponic_system = serializers.IntegerField(source='hydroponic_system_id', required=False)
+
+    class Meta:
+        model = Measurement
+        fields = ['id', 'hydroponic_system', 'timestamp', 'ph', 'temperature', 'tds', 'dedup_key']
+        validators = []  # Duplikaty klucza deduplikacji pomija zapis (ON CONFLICT), a nie walidacja
+
+
+class AlertRuleSerializer(serializers.ModelSerializer):
+    """
+    Serializer dla modelu AlertRule.
+    System można wybrać tylko spośród systemów uwierzytelnionego użytkownika;
+    stan reguły jest tylko do odczytu.
+    """
+    hydroponic_system = serializers.PrimaryKeyRelatedField(queryset=HydroponicSystem.objects.none())
+
+    class Meta:
+        model = AlertRule
+        fields = [
+            'id', 'hydroponic_system', 'metric', 'min_value', 'max_value', 'hysteresis',
+            'sustained_minutes', 'is_active', 'state', 'breach_started_at', 'created_at',
+        ]
+        read_only_fields = ['state', 'breach_started_at', 'created_at']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is not None:
+            self.fields['hydroponic_system'].queryset = HydroponicSystem.objects.filter(owner=request.user)
+
+    def validate(self, attrs):
+        min_value = attrs.get('min_value', getattr(self.instance, 'min_value', None))
+        max_value = attrs.get('max_value', getattr(self.instance, 'max_value', None))
+        if min_value is None and max_value is None:
+            raise serializers.ValidationError("Podaj co najmniej jedną granicę (min_value lub max_value).")
+        if min_value is not None and max_value is not None and min_value >= max_value:
+            raise serializers.ValidationError("min_value musi być mniejsze niż max_value.")
+        if attrs.get('hysteresis', 0) < 0:
+            raise serializers.ValidationError({'hysteresis': ["Histereza nie może być ujemna."]})
+        return attrs
+
+
+class AlertEventSerializer(serializers.ModelSerializer):
+    """
+    Serializer dla modelu AlertEvent (tylko do odczytu).
+    """
+    metric = serializers.ReadOnlyField(source='rule.metric')
+
+    class Meta:
+        model = AlertEvent
+        fields = ['id', 'rule', 'hydroponic_system', 'metric', 'kind', 'value', 'measured_at', 'created_at']
@@ -0,0 +1,124 @@
+"""
+Podsumowanie systemów: najnowszy pomiar i statystyki z ostatnich 24 godzin.
+Najnowszy pomiar trzymany jest w tabeli SystemLatestState, aktualizowanej przy zapisie pomiarów,
+a statystyki liczone są jednym zapytaniem z agregatów godzinowych i zapamiętywane w pamięci podręcznej
+na SUMMARY_STATS_CACHE_TTL sekund. Podsumowanie dowolnej liczby systemów kosztuje stałą liczbę zapytań.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Max, Min, Sum
+from django.utils.timezone import now
+
+from .models import MeasurementRollup, SystemLatestState
+from .rollups import METRICS, bucket_floor
+
+STATE_TABLE = SystemLatestState._meta.db_table
+STATE_COLUMNS = ("hydroponic_system_id", "timestamp", *METRICS)
+
+
+def _latest_per_system(measurements):
+    latest = {}
+    for measurement in measurements:
+        current = latest.get(measurement.hydroponic_system_id)
+        if current is None or (measurement.timestamp, measurement.id or 0) >= (current.timestamp, current.id or 0):
+            latest[measurement.hydroponic_system_id] = measurement
+    return latest
+
+
+def update_latest(measurements):
+    """
+    Zapisuje najnowszy pomiar każdego systemu z partii jednym zapytaniem INSERT ... ON CONFLICT.
+    Pomiar starszy niż zapisany stan (np. spóźniona partia z urządzenia) go nie nadpisuje.
+    """
+    latest = sorted(_latest_per_system(measurements).values(), key=lambda m: m.hydroponic_system_id)
+    if not latest:
+        return
+    columns = ", ".join(f'"{column}"' for column in STATE_COLUMNS)
+    placeholders = "(" + ", ".join(["%s"] * len(STATE_COLUMNS)) + ")"
+    updates = ", ".join(f'"{column}" = excluded."{column}"' for column in STATE_COLUMNS[1:])
+    params = []
+    for measurement in latest:
+        params.extend(getattr(measurement, column) for column in STATE_COLUMNS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO "{STATE_TABLE}" ({columns}) VALUES {", ".join([placeholders] * len(latest))} '
+            f'ON CONFLICT ("hydroponic_system_id") DO UPDATE SET {updates} '
+            f'WHERE "{STATE_TABLE}"."timestamp" <= excluded."timestamp"',
+            params,
+        )
+
+
+def latest_reading(system):
+    """
+    Najnowszy pomiar systemu jako słownik (None, gdy system nie ma pomiarów).
+    Korzysta ze stanu pobranego przez select_related('latest_state').
+    """
+    try:
+        state = system.latest_state
+    except SystemLatestState.DoesNotExist:
+        return None
+    return {"timestamp": state.timestamp, **{metric: getattr(state, metric) for metric in METRICS}}
+
+
+def _cache_key(system_id):
+    return f"system-stats-24h:{system_id}"
+
+
+def _compute_stats(system_ids):
+    """
+    Statystyki z agregatów godzinowych z ostatnich 24 godzin (łącznie z bieżącą, niepełną godziną).
+    """
+    since = bucket_floor(now(), 3600) - timedelta(hours=23)
+    aggregates = {"count": Sum("count")}
+    for metric in METRICS:
+        aggregates[f"{metric}_min"] = Min(f"{metric}_min")
+        aggregates[f"{metric}_max"] = Max(f"{metric}_max")
+        aggregates[f"{metric}_sum"] = Sum(f"{metric}_sum")
+    rows = (
+        MeasurementRollup.objects
+        .filter(hydroponic_system_id__in=system_ids, resolution='1h', bucket_start__gte=since)
+        .values("hydroponic_system_id")
+        .annotate(**aggregates)
+        .order_by()
+    )
+    stats = dict.fromkeys(system_ids)
+    for row in rows:
+        stats[row["hydroponic_system_id"]] = {
+            "count": row["count"],
+            **{
+                metric: {
+                    "min": row[f"{metric}_min"],
+                    "max": row[f"{metric}_max"],
+                    "avg": row[f"{metric}_sum"] / row["count"],
+                }
+                for metric in METRICS
+            },
+        }
+    return stats
+
+
+def stats_24h(system_ids):
+    """
+    Zwraca {system: statystyki z ostatnich 24 godzin albo None}.
+    Brakujące w pamięci podręcznej systemy liczone są razem jednym zapytaniem.
+    """
+    system_ids = list(system_ids)
+    cached = cache.get_many([_cache_key(system_id) for system_id in system_ids])
+    stats, missing = {}, []
+    for system_id in system_ids:
+        key = _cache_key(system_id)
+        if key in cached:
+            stats[system_id] = cached[key] or None  # Pusty słownik – system bez pomiarów
+        else:
+            missing.append(system_id)
+    if missing:
+        computed = _compute_stats(missing)
+        cache.set_many(
+            {_cache_key(system_id): value or {} for system_id, value in computed.items()},
+            settings.SUMMARY_STATS_CACHE_TTL,
+        )
+        stats.update(computed)
+    return stats
@@ -0,0 +1,298 @@
+"""
+Analiza szeregów czasowych pomiarów na tablicach NumPy.
+Pomiary pobierane są kolumnami (bez tworzenia instancji modelu i krotek w Pythonie – na PostgreSQL
+binarnym COPY wprost do tablic), a czas jako liczba sekund od epoki Unix liczona w bazie danych.
+"""
+import io
+import itertools
+
+import numpy as np
+from django.db import connection
+from django.db.models import FloatField, Func
+
+from .models import Measurement
+
+# Analizowane wartości pomiarów
+METRICS = ('ph', 'temperature', 'tds')
+
+
+class WindowTooLarge(Exception):
+    """
+    Zakres obejmuje więcej pomiarów, niż pozwala ANALYTICS_MAX_POINTS.
+    """
+
+
+class Epoch(Func):
+    """
+    Czas jako liczba sekund od epoki Unix (double precision), bez konwersji do datetime w Pythonie.
+    """
+
+    template = 'EXTRACT(EPOCH FROM %(expressions)s)::double precision'
+    output_field = FloatField()
+
+
+# Nagłówek (sygnatura, flagi, długość rozszerzenia) i stopka binarnego formatu COPY PostgreSQL
+COPY_HEADER_SIZE = 19
+COPY_TRAILER_SIZE = 2
+
+
+def _copy_rows(queryset, width):
+    """
+    Pobiera wiersze samych kolumn double precision binarnym COPY i zwraca je jako macierz (wiersze x kolumny).
+    Każdy wiersz formatu ma stałą długość (liczba pól, a dla każdego pola długość i 8 bajtów wartości),
+    więc cały wynik odczytywany jest jednym np.frombuffer. Zwraca None, gdy sterownik nie obsługuje COPY.
+    """
+    sql, params = queryset.query.sql_with_params()
+    buffer = io.BytesIO()
+    with connection.cursor() as cursor:
+        raw = cursor.cursor
+        if not hasattr(raw, 'copy_expert'):
+            return None
+        query = raw.mogrify(sql, params).decode()
+        raw.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT binary)", buffer)
+
+    dtype = np.dtype([('fields', '>i2')] + [(f'{kind}{index}', fmt) for index in range(width)
+                                            for kind, fmt in (('length', '>i4'), ('value', '>f8'))])
+    data = buffer.getbuffer()[COPY_HEADER_SIZE:-COPY_TRAILER_SIZE]
+    rows = np.frombuffer(data, dtype=dtype)
+    result = np.empty((len(rows), width), dtype=np.float64)
+    for index in range(width):
+        result[:, index] = rows[f'value{index}']
+    return result
+
+
+def fetch_columns(queryset, fields=METRICS, limit=None):
+    """
+    Pobiera pomiary w kolejności czasu jako kolumny (kolejność pomiarów o tym samym czasie jest dowolna,
+    dzięki czemu skan indeksu (system, timestamp) nie wymaga dodatkowego sortowania).
+    Zwraca krotkę (czasy w sekundach, {pole: tablica wartości}).
+    """
+    rows = queryset.order_by('timestamp').annotate(epoch=Epoch('timestamp')).values_list('epoch', *fields)
+    if limit is not None:
+        rows = rows[:limit]
+    width = len(fields) + 1
+
+    data = _copy_rows(rows, width) if connection.vendor == 'postgresql' else None
+    if data is not None:
+        # W SQL kolumny modelu poprzedzają adnotacje (values_list przestawia je dopiero w Pythonie)
+        sql_order = [*rows.query.values_select, *rows.query.annotation_select]
+        data = data[:, [sql_order.index(name) for name in ('epoch', *fields)]]
+    else:
+        rows = list(rows)
+        data = np.fromiter(itertools.chain.from_iterable(rows), dtype=np.float64, count=len(rows) * width)
+        data = data.reshape(len(rows), width)
+    return data[:, 0], {field: data[:, index + 1] for index, field in enumerate(fields)}
+
+
+def system_columns(system_id, start, end, fields=METRICS, limit=None):
+    """
+    Pomiary systemu z zakresu [start, end) jako kolumny (patrz fetch_columns).
+    """
+    queryset = Measurement.objects.filter(hydroponic_system_id=system_id, timestamp__gte=start, timestamp__lt=end)
+    return fetch_columns(queryset, fields, limit)
+
+
+def rolling_mean_std(values, window):
+    """
+    Średnia i odchylenie standardowe w oknie `window` ostatnich punktów (łącznie z bieżącym),
+    liczone z sum skumulowanych w czasie O(n). Na początku serii okno jest krótsze.
+    """
+    if not len(values):
+        return values.copy(), values.copy()
+    offset = values.mean()  # Centrowanie ogranicza utratę precyzji przy odejmowaniu sum kwadratów
+    centered = values - offset
+    sums = np.concatenate(([0.0], np.cumsum(centered)))
+    squares = np.concatenate(([0.0], np.cumsum(centered * centered)))
+
+    end = np.arange(1, len(values) + 1)
+    begin = np.maximum(end - window, 0)
+    count = end - begin
+    mean = (sums[end] - sums[begin]) / count
+    variance = np.maximum((squares[end] - squares[begin]) / count - mean * mean, 0.0)
+    return mean + offset, np.sqrt(variance)
+
+
+def rate_of_change(timestamps, values, per_seconds=60):
+    """
+    Zmiana wartości na `per_seconds` sekund względem poprzedniego punktu (pierwszy punkt: NaN).
+    """
+    rate = np.full(len(values), np.nan)
+    if len(values) > 1:
+        elapsed = np.diff(timestamps)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rate[1:] = np.where(elapsed > 0, np.diff(values) / elapsed * per_seconds, np.nan)
+    return rate
+
+
+def zscores(values, mean, std, window):
+    """
+    Odchylenie każdego punktu od statystyk pełnego okna kończącego się na poprzednim punkcie
+    (anomalia nie zawyża statystyk, względem których jest oceniana).
+    Pierwsze `window` punktów nie ma pełnej historii i dostaje NaN.
+    """
+    scores = np.full(len(values), np.nan)
+    if len(values) > window:
+        previous_std = std[window - 1:-1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scores[window:] = np.where(
+                previous_std > 0, (values[window:] - mean[window - 1:-1]) / previous_std, np.nan
+            )
+    return scores
+
+
+def analyze(timestamps, columns, window, threshold):
+    """
+    Statystyki kroczące, tempo zmian i z-score dla każdej kolumny.
+    Zwraca {pole: {mean, std, rate, zscore, anomalies}}, gdzie `anomalies` to indeksy punktów z |z| > threshold.
+    """
+    result = {}
+    for field, values in columns.items():
+        mean, std = rolling_mean_std(values, window)
+        scores = zscores(values, mean, std, window)
+        with np.errstate(invalid='ignore'):
+            anomalies = np.flatnonzero(np.abs(scores) > threshold)
+        result[field] = {
+            'mean': mean,
+            'std': std,
+            'rate': rate_of_change(timestamps, values),
+            'zscore': scores,
+            'anomalies': anomalies,
+        }
+    return result
+
+
+def to_list(values):
+    """
+    Zamienia tablicę na listę dla JSON (NaN jako None).
+    """
+    return [None if value != value else value for value in values.tolist()]
+
+
+def iso_timestamps(timestamps):
+    """
+    Zamienia sekundy od epoki na napisy ISO 8601 w UTC (jedna operacja na całej tablicy).
+    """
+    moments = np.round(timestamps * 1e6).astype('datetime64[us]')
+    return [f"{value}Z" for value in np.datetime_as_string(moments, unit='ms')]
+
+
+def _bucket_edges(count, buckets, first=0):
+    """
+    Granice `buckets` przedziałów o (prawie) równej liczbie punktów obejmujących indeksy [first, first + count).
+    """
+    return first + np.linspace(0, count, buckets + 1).astype(np.int64)
+
+
+def lttb(timestamps, values, points):
+    """
+    Largest-Triangle-Three-Buckets: wybiera `points` punktów zachowujących kształt wykresu.
+    Pierwszy i ostatni punkt są zawsze wybierane; z każdego z pozostałych przedziałów – punkt tworzący
+    największy trójkąt z punktem wybranym wcześniej i średnią następnego przedziału.
+    Średnie przedziałów liczone są naraz; pętla obejmuje tylko przedziały (a nie punkty). Zwraca indeksy.
+    """
+    count = len(values)
+    if points >= count or points < 3:
+        return np.arange(count)
+
+    x = timestamps - timestamps[0]  # Mniejsze liczby – dokładniejsze pola trójkątów
+    edges = _bucket_edges(count - 2, points - 2, first=1)
+    sizes = np.diff(edges)
+    average_x = np.append(np.add.reduceat(x, edges[:-1]) / sizes, x[-1])
+    average_y = np.append(np.add.reduceat(values, edges[:-1]) / sizes, values[-1])
+
+    selected = np.empty(points, dtype=np.int64)
+    selected[0], selected[-1] = 0, count - 1
+    previous = 0
+    for bucket in range(points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_x, next_y = average_x[bucket + 1], average_y[bucket + 1]
+        previous_x, previous_y = x[previous], values[previous]
+        area = np.abs(
+            (previous_x - next_x) * (values[start:end] - previous_y)
+            - (previous_x - x[start:end]) * (next_y - previous_y)
+        )
+        previous = start + int(area.argmax())
+        selected[bucket + 1] = previous
+    return selected
+
+
+def minmax(values, points):
+    """
+    Minimum i maksimum z każdego z `points // 2` przedziałów o równej liczbie punktów (w kolejności czasu),
+    bez pętli w Pythonie. Zachowuje wszystkie skoki wartości. Zwraca indeksy.
+    """
+    count = len(values)
+    buckets = points // 2
+    if points >= count or buckets < 1:
+        return np.arange(count)
+
+    edges = _bucket_edges(count, buckets)
+    starts, sizes = edges[:-1], np.diff(edges)
+    bucket_of = np.repeat(np.arange(buckets), sizes)
+    # Pierwsze wystąpienie minimum i maksimum w każdym przedziale
+    low = np.flatnonzero(values == np.repeat(np.minimum.reduceat(values, starts), sizes))
+    high = np.flatnonzero(values == np.repeat(np.maximum.reduceat(values, starts), sizes))
+    low = low[np.unique(bucket_of[low], return_index=True)[1]]
+    high = high[np.unique(bucket_of[high], return_index=True)[1]]
+    return np.unique(np.concatenate((low, high)))
+
+
+DOWNSAMPLING = {'lttb': lttb, 'minmax': lambda timestamps, values, points: minmax(values, points)}
+
+
+def downsample(queryset, points, algorithm='lttb', fields=METRICS, max_points=None):
+    """
+    Pobiera pomiary z querysetu kolumnami i zmniejsza każdą serię do najwyżej `points` punktów.
+    Zwraca krotkę (liczba pobranych pomiarów, {pole: {timestamp, value}}).
+    """
+    timestamps, columns = fetch_columns(queryset, fields, None if max_points is None else max_points + 1)
+    if max_points is not None and len(timestamps) > max_points:
+        raise WindowTooLarge(max_points)
+
+    method = DOWNSAMPLING[algorithm]
+    series = {}
+    for field, values in columns.items():
+        selected = method(timestamps, values, points)
+        series[field] = {"timestamp": iso_timestamps(timestamps[selected]), "value": values[selected].tolist()}
+    return len(timestamps), series
+
+
+def report(system_id, start, end, window, threshold, max_points, max_series_points, max_anomalies):
+    """
+    Raport analityczny pomiarów systemu z zakresu [start, end):
+    podsumowanie i anomalie każdej wartości oraz seria (co k-ty punkt, najwyżej `max_series_points`).
+    """
+    timestamps, columns = system_columns(system_id, start, end, limit=max_points + 1)
+    if len(timestamps) > max_points:
+        raise WindowTooLarge(max_points)
+
+    analysis = analyze(timestamps, columns, window, threshold)
+    step = max(1, -(-len(timestamps) // max_series_points))
+    sampled = slice(None, None, step)
+
+    metrics, series = {}, {"timestamp": iso_timestamps(timestamps[sampled])}
+    for field, values in columns.items():
+        stats = analysis[field]
+        anomalies = stats['anomalies'][:max_anomalies]
+        anomaly_times = iso_timestamps(timestamps[anomalies])
+        metrics[field] = {
+            "min": float(values.min()) if len(values) else None,
+            "max": float(values.max()) if len(values) else None,
+            "mean": float(values.mean()) if len(values) else None,
+            "std": float(values.std()) if len(values) else None,
+            "anomaly_count": len(stats['anomalies']),
+            "anomalies": [
+                {"timestamp": moment, "value": value, "zscore": score}
+                for moment, value, score in zip(
+                    anomaly_times, values[anomalies].tolist(), stats['zscore'][anomalies].tolist()
+                )
+            ],
+        }
+        series[field] = {
+            "value": to_list(values[sampled]),
+            "rolling_mean": to_list(stats['mean'][sampled]),
+            "rolling_std": to_list(stats['std'][sampled]),
+            "rate_per_minute": to_list(stats['rate'][sampled]),
+        }
+
+    return {"points": len(timestamps), "series_step": step, "metrics": metrics, "series": series}
@@ -4,14 +4,16 @@ from rest_framework.routers import DefaultRouter
 
 from .views import (
     RegisterView, UserView, dashboard_view,
-    HydroponicSystemViewSet, MeasurementViewSet,
-    system_detail_view, add_system, add_sensor, delete_system
+    HydroponicSystemViewSet, MeasurementViewSet, AlertRuleViewSet, AlertEventViewSet,
+    system_detail_view, system_live_view, add_system, add_sensor, delete_system
 )
 
 # Router dla API
 router = DefaultRouter()
 router.register(r'hydroponic-systems', HydroponicSystemViewSet, basename='hydroponic-system')
 router.register(r'measurements', MeasurementViewSet, basename='measurement')
+router.register(r'alert-rules', AlertRuleViewSet, basename='alert-rule')
+router.register(r'alert-events', AlertEventViewSet, basename='alert-event')
 
 # URL patterns
 urlpatterns = [
@@ -25,6 +27,7 @@ urlpatterns = [
     path('', include(router.urls)),
     path("dashboard/", dashboard_view, name="dashboard"),
     path("system/<int:system_id>/", system_detail_view, name="system_detail"), 
+    path("system/<int:system_id>/live/", system_live_view, name="system_live"),
     path("system/add/", add_system, name="add_system"),  
     path('system/<int:system_id>/add-sensor/', add_sensor, name='add_sensor'),  
     path('system/<int:system_id>/delete/', delete_system, name='delete_system'),
@@ -1,37 +1,130 @@
 # Standardowe importy
 import random
-from datetime import datetime
+from datetime import timedelta
 
 # Importy Django
+from django.conf import settings
+from django.core.cache import cache
 from django.contrib.auth import get_user_model, login
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
-from django.db import connection
-from django.http import JsonResponse
+from django.db import connection, transaction
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
-from django.utils.dateparse import parse_date
 from django.utils.timezone import now
 
 # Importy Django REST Framework
-from rest_framework import generics, viewsets, permissions, filters
+from rest_framework import generics, viewsets, permissions, filters, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import JSONParser
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.serializers import ModelSerializer
 
 # Importy DRF Simple JWT
+from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
 # Lokalne importy
-from .models import HydroponicSystem, Measurement
-from .serializers import HydroponicSystemSerializer, MeasurementSerializer
+from .authentication import DeviceKeyAuthentication, DevicePrincipal
+from .models import AlertEvent, AlertRule, HydroponicSystem, Measurement, MeasurementArchive
+from .serializers import (
+    AlertEventSerializer, AlertRuleSerializer, DeviceMeasurementSerializer,
+    HydroponicSystemSerializer, MEASUREMENT_ROWS, MeasurementSerializer,
+)
 from .forms import CustomUserCreationForm
+from .export import EXPORT_FORMATS, IgnoreClientContentNegotiation, export_response
+from .filters import MeasurementFilterBackend, filter_measurements, has_filters, parse_bound, parse_measurement_filters
+from .archive import ArchivedRows
+from .buffer import BufferFull, get_buffer, is_buffered
+from .live import event_stream
+from . import hotwindow, purge, response_cache, rollups, summary, timeseries
+from .ingest import OWNER_MESSAGE, after_ingest, binary_ingest, bulk_ingest, write_measurements
+from .metrics import record_ingest
+from .pagination import AlertEventPagination, InvalidCursor, MeasurementCursorPagination, paginate
+from .permissions import DeviceIngestOnly
+from .renderers import FastJSONRenderer
+from .parsers import BinaryMeasurementParser, MeasurementBatch, NDJSONParser
 
 # Pobranie modelu użytkownika
 User = get_user_model()
 
 
+def _parse_datetime_param(name, value, end=False):
+    """
+    Zamienia parametr zapytania (data lub data z czasem) na świadomy strefy datetime.
+    Sama data jako koniec zakresu oznacza początek następnego dnia (zakres półotwarty).
+    """
+    if not value:
+        return None
+    moment = parse_bound(value, end)
+    if moment is None:
+        raise ValidationError({name: ["Niepoprawna data."]})
+    return moment
+
+
+def _bucket_range(request):
+    """
+    Odczytuje parametry serii z agregatów: `bucket` (np. 15m, 1h, 1d) oraz `from` i `to` (domyślnie ostatnia doba).
+    Zwraca krotkę (bucket, długość przedziału w sekundach, początek, koniec).
+    """
+    bucket = request.query_params.get('bucket', '1h')
+    bucket_seconds = rollups.parse_bucket(bucket)
+    if bucket_seconds is None or rollups.pick_resolution(bucket_seconds) is None:
+        raise ValidationError({"bucket": ["Dozwolone są wielokrotności minut, godzin lub dni, np. 15m, 1h, 1d."]})
+
+    end = _parse_datetime_param('to', request.query_params.get('to'), end=True) or now()
+    start = _parse_datetime_param('from', request.query_params.get('from')) or end - timedelta(days=1)
+    if start >= end:
+        raise ValidationError({"from": ["Początek zakresu musi być wcześniejszy niż koniec."]})
+    if (end - start).total_seconds() / bucket_seconds > settings.ROLLUP_MAX_POINTS:
+        raise ValidationError({"bucket": [f"Zakres obejmuje więcej niż {settings.ROLLUP_MAX_POINTS} przedziałów."]})
+    return bucket, bucket_seconds, start, end
+
+
+def _parse_metrics(request):
+    """
+    Odczytuje parametr `metrics` (lista wartości po przecinku, domyślnie wszystkie) bez powtórzeń.
+    """
+    metrics = [value for value in request.query_params.get('metrics', ','.join(rollups.METRICS)).split(',') if value]
+    if not metrics or set(metrics) - set(rollups.METRICS):
+        raise ValidationError({"metrics": [f"Dozwolone wartości: {', '.join(rollups.METRICS)}."]})
+    return list(dict.fromkeys(metrics))
+
+
+def _cached_api_response(request, name, scope):
+    """
+    Szuka odpowiedzi JSON endpointu w pamięci podręcznej odpowiedzi (response_cache.lookup).
+    Przeglądarkowy widok API nie jest zapisywany – zawiera token CSRF i formularze.
+    Odnośniki stronicowania zawierają nazwę hosta, więc wpis zależy także od niej.
+    """
+    if request.accepted_renderer.format != 'json':
+        return None, None
+    return response_cache.lookup(request, name, [scope], [request.get_host()])
+
+
+def _export_measurements(request, queryset, segments, filename, ordering=('timestamp', 'id')):
+    """
+    Zwraca strumieniowy eksport pomiarów z filtrami takimi jak w widoku szczegółów systemu.
+    Pomiary z segmentów archiwum `segments` (queryset MeasurementArchive) są scalane z pomiarami z bazy.
+    Parametry: `output` (csv lub ndjson) i `compress=gzip`.
+    """
+    output = request.query_params.get('output', 'csv')
+    if output not in EXPORT_FORMATS:
+        raise ValidationError({"output": [f"Dozwolone formaty: {', '.join(EXPORT_FORMATS)}."]})
+    compress = request.query_params.get('compress') == 'gzip'
+
+    measurement_filters = parse_measurement_filters(request.query_params)
+    queryset = filter_measurements(queryset, measurement_filters)
+    archived = ArchivedRows(segments, measurement_filters)
+    asynchronous = isinstance(request._request, ASGIRequest)
+    return export_response(queryset, output, compress, filename, ordering, archived, asynchronous)
+
+
 class RegisterSerializer(ModelSerializer):
     """
     Serializer do rejestracji użytkownika.
@@ -99,9 +192,19 @@ class HydroponicSystemViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         """
-        Zwraca queryset instancji HydroponicSystem należących do uwierzytelnionego użytkownika.
+        Zwraca queryset instancji HydroponicSystem należących do uwierzytelnionego użytkownika
+        (razem z właścicielem i najnowszym pomiarem, bez osobnych zapytań dla każdego systemu).
+        """
+        return HydroponicSystem.objects.filter(owner=self.request.user).select_related('owner', 'latest_state')
+
+    def list(self, request, *args, **kwargs):
+        """
+        Lista systemów z pamięci podręcznej odpowiedzi; unieważniana przy zapisie pomiarów i zmianie systemów użytkownika.
         """
-        return HydroponicSystem.objects.filter(owner=self.request.user)
+        key, cached = _cached_api_response(request, 'systems', f"user:{request.user.pk}")
+        if cached is not None:
+            return cached
+        return response_cache.store(key, super().list(request, *args, **kwargs))
 
     def perform_create(self, serializer):
         """
@@ -109,6 +212,207 @@ class HydroponicSystemViewSet(viewsets.ModelViewSet):
         """
         serializer.save(owner=self.request.user)
 
+    def perform_destroy(self, instance):
+        """
+        Oznacza system jako usunięty; pomiary i sam system usuwane są partiami w tle.
+        """
+        purge.soft_delete(instance)
+
+    @action(detail=True, methods=['get'], url_path='series')
+    def series(self, request, pk=None):
+        """
+        Zwraca serię min/max/średnich pH, temperatury i TDS w przedziałach czasu.
+        Parametry: `bucket` (np. 15m, 1h, 1d), `from` i `to` (data lub data z czasem).
+        Dane czytane są z agregatów, a nie z surowych pomiarów.
+        Z parametrem `points` zwraca zamiast tego surowe pomiary zmniejszone do tylu punktów (patrz _downsampled_series).
+        """
+        system = self.get_object()
+        if 'points' in request.query_params:
+            return self._downsampled_series(request, system)
+        bucket, bucket_seconds, start, end = _bucket_range(request)
+
+        resolution, points = rollups.series(system.id, bucket_seconds, start, end)
+        return Response({
+            "system": system.id,
+            "bucket": bucket,
+            "resolution": resolution,
+            "from": start,
+            "to": end,
+            "points": points,
+        })
+
+    def _downsampled_series(self, request, system):
+        """
+        Seria surowych pomiarów zmniejszona do najwyżej `points` punktów na wartość:
+        `algorithm=lttb` (domyślnie, zachowuje kształt wykresu) albo `minmax` (minimum i maksimum z każdego przedziału).
+        Pomiary z zakresu `from`–`to` zawężane są tymi samymi filtrami co w widoku szczegółów systemu.
+        """
+        try:
+            points = int(request.query_params['points'])
+        except ValueError:
+            raise ValidationError({"points": ["Liczba punktów musi być liczbą całkowitą."]})
+        if not 3 <= points <= settings.SERIES_MAX_POINTS:
+            raise ValidationError({"points": [f"Liczba punktów musi mieścić się w zakresie 3–{settings.SERIES_MAX_POINTS}."]})
+        algorithm = request.query_params.get('algorithm', 'lttb')
+        if algorithm not in timeseries.DOWNSAMPLING:
+            raise ValidationError({"algorithm": [f"Dozwolone wartości: {', '.join(timeseries.DOWNSAMPLING)}."]})
+        metrics = _parse_metrics(request)
+
+        end = _parse_datetime_param('to', request.query_params.get('to'), end=True) or now()
+        start = _parse_datetime_param('from', request.query_params.get('from')) or end - timedelta(days=1)
+        if start >= end:
+            raise ValidationError({"from": ["Początek zakresu musi być wcześniejszy niż koniec."]})
+
+        measurements = Measurement.objects.filter(hydroponic_system=system, timestamp__gte=start, timestamp__lt=end)
+        measurements = filter_measurements(measurements, parse_measurement_filters(request.query_params))
+        try:
+            raw_points, series = timeseries.downsample(
+                measurements, points, algorithm, metrics, max_points=settings.SERIES_MAX_RAW_POINTS
+            )
+        except timeseries.WindowTooLarge:
+            raise ValidationError({"from": [f"Zakres obejmuje więcej niż {settings.SERIES_MAX_RAW_POINTS} pomiarów."]})
+
+        return Response({
+            "system": system.id,
+            "algorithm": algorithm,
+            "from": start,
+            "to": end,
+            "raw_points": raw_points,
+            "series": series,
+        })
+
+    @action(detail=True, methods=['get'], url_path='recent')
+    def recent(self, request, pk=None):
+        """
+        Ostatnie pomiary systemu (parametr `limit`, domyślnie 100), od najnowszych.
+        Czytane z okna ostatnich pomiarów w pamięci współdzielonej, a gdy go nie ma – z bazy.
+        """
+        system = self.get_object()
+        try:
+            limit = int(request.query_params.get('limit', 100))
+        except ValueError:
+            raise ValidationError({"limit": ["Limit musi być liczbą całkowitą."]})
+        if not 1 <= limit <= settings.MEASUREMENT_MAX_PAGE_SIZE:
+            raise ValidationError({"limit": [f"Limit musi mieścić się w zakresie 1–{settings.MEASUREMENT_MAX_PAGE_SIZE}."]})
+
+        page = hotwindow.first_page(system.id, limit)
+        if page is None:
+            page = paginate(Measurement.objects.filter(hydroponic_system=system), None, limit)
+        return Response({
+            "system": system.id,
+            "results": MeasurementSerializer(page.object_list, many=True).data,
+        })
+
+    @action(detail=True, methods=['get'], url_path='analytics')
+    def analytics(self, request, pk=None):
+        """
+        Statystyki kroczące (średnia, odchylenie), tempo zmian i anomalie (z-score) pH, temperatury i TDS.
+        Parametry: `from` i `to` (domyślnie ostatnia doba), `window` (liczba punktów okna, domyślnie 30)
+        i `threshold` (próg |z|, domyślnie 3). Wynik jest zapamiętywany do czasu nadejścia nowego pomiaru.
+        """
+        system = self.get_object()
+
+        try:
+            window = int(request.query_params.get('window', 30))
+            threshold = float(request.query_params.get('threshold', 3))
+        except ValueError:
+            raise ValidationError("Parametry window i threshold muszą być liczbami.")
+        if not 2 <= window <= 100000:
+            raise ValidationError({"window": ["Okno musi obejmować od 2 do 100000 punktów."]})
+        if threshold <= 0:
+            raise ValidationError({"threshold": ["Próg musi być dodatni."]})
+
+        # Domyślny koniec zaokrąglony w górę do pełnej minuty, żeby kolejne żądania trafiały w ten sam wpis pamięci podręcznej
+        end = _parse_datetime_param('to', request.query_params.get('to'), end=True)
+        end = end or now().replace(second=0, microsecond=0) + timedelta(minutes=1)
+        start = _parse_datetime_param('from', request.query_params.get('from')) or end - timedelta(days=1)
+        if start >= end:
+            raise ValidationError({"from": ["Początek zakresu musi być wcześniejszy niż koniec."]})
+
+        # Każdy nowy pomiar systemu zmienia klucz, więc wynik nie wymaga jawnego unieważniania. Najnowszy pomiar
+        # według czasu wskazuje indeks (system, timestamp); pomiar dopisany z dawnym czasem klienta nie zmienia klucza
+        # i pojawi się w wyniku po ANALYTICS_CACHE_TTL
+        latest_id = (
+            Measurement.objects.filter(hydroponic_system=system)
+            .order_by('-timestamp', '-id').values_list('id', flat=True).first()
+        )
+        cache_key = f"analytics:{system.id}:{latest_id}:{start.timestamp()}:{end.timestamp()}:{window}:{threshold}"
+        result = cache.get(cache_key)
+        if result is None:
+            try:
+                result = timeseries.report(
+                    system.id, start, end, window, threshold,
+                    max_points=settings.ANALYTICS_MAX_POINTS,
+                    max_series_points=settings.ANALYTICS_MAX_SERIES_POINTS,
+                    max_anomalies=settings.ANALYTICS_MAX_ANOMALIES,
+                )
+            except timeseries.WindowTooLarge:
+                raise ValidationError({"from": [f"Zakres obejmuje więcej niż {settings.ANALYTICS_MAX_POINTS} pomiarów."]})
+            cache.set(cache_key, result, settings.ANALYTICS_CACHE_TTL)
+
+        return Response({
+            "system": system.id,
+            "from": start,
+            "to": end,
+            "window": window,
+            "threshold": threshold,
+            **result,
+        })
+
+    @action(detail=True, methods=['get'], url_path='export', content_negotiation_class=IgnoreClientContentNegotiation)
+    def export(self, request, pk=None):
+        """
+        Strumieniowy eksport całej historii pomiarów systemu (CSV lub NDJSON, opcjonalnie gzip).
+        """
+        system = self.get_object()
+        return _export_measurements(
+            request, Measurement.objects.filter(hydroponic_system=system), system.archives.all(), f"system-{system.id}"
+        )
+
+    @action(detail=False, methods=['get'], url_path='compare')
+    def compare(self, request):
+        """
+        Wyrównana w czasie macierz wartości wielu systemów (wiersze – przedziały, kolumny – systemy).
+        Parametry: `systems` (lista identyfikatorów po przecinku), `metrics` (domyślnie ph,temperature,tds),
+        `stat` (avg, min lub max), `fill` (null lub locf – ostatnia znana wartość) oraz `bucket`, `from` i `to` jak w /series/.
+        Wszystkie systemy czytane są jednym zapytaniem do agregatów.
+        """
+        try:
+            system_ids = list(dict.fromkeys(int(value) for value in request.query_params.get('systems', '').split(',') if value))
+        except ValueError:
+            raise ValidationError({"systems": ["Podaj identyfikatory systemów oddzielone przecinkami."]})
+        if not system_ids:
+            raise ValidationError({"systems": ["Podaj co najmniej jeden system."]})
+        if len(system_ids) > settings.COMPARE_MAX_SYSTEMS:
+            raise ValidationError({"systems": [f"Można porównać najwyżej {settings.COMPARE_MAX_SYSTEMS} systemów."]})
+        missing = set(system_ids) - set(self.get_queryset().filter(id__in=system_ids).values_list('id', flat=True))
+        if missing:
+            raise ValidationError({"systems": [f"Nie znaleziono systemów: {', '.join(map(str, sorted(missing)))}."]})
+
+        metrics = _parse_metrics(request)
+        stat = request.query_params.get('stat', 'avg')
+        if stat not in rollups.MATRIX_STATS:
+            raise ValidationError({"stat": [f"Dozwolone wartości: {', '.join(rollups.MATRIX_STATS)}."]})
+        fill = request.query_params.get('fill', 'null')
+        if fill not in rollups.FILL_METHODS:
+            raise ValidationError({"fill": [f"Dozwolone wartości: {', '.join(rollups.FILL_METHODS)}."]})
+
+        bucket, bucket_seconds, start, end = _bucket_range(request)
+        resolution, timestamps, values = rollups.matrix(
+            system_ids, bucket_seconds, start, end, metrics, stat, fill
+        )
+        return Response({
+            "systems": system_ids,
+            "bucket": bucket,
+            "resolution": resolution,
+            "stat": stat,
+            "fill": fill,
+            "from": start,
+            "to": end,
+            "timestamps": timeseries.iso_timestamps(timestamps),
+            "values": {metric: [timeseries.to_list(row) for row in matrix] for metric, matrix in values.items()},
+        })
+
 
 def register_view(request):
     """
@@ -130,9 +434,14 @@ def register_view(request):
 def dashboard_view(request):
     """
     Widok panelu użytkownika.
-    Wyświetla listę systemów hydroponicznych należących do uwierzytelnionego użytkownika.
+    Wyświetla listę systemów hydroponicznych należących do uwierzytelnionego użytkownika
+    z najnowszym pomiarem i statystykami z 24 godzin (stała liczba zapytań niezależnie od liczby systemów).
     """
-    user_systems = HydroponicSystem.objects.filter(owner=request.user)
+    user_systems = list(HydroponicSystem.objects.filter(owner=request.user).select_related('latest_state'))
+    stats = summary.stats_24h(system.id for system in user_systems)
+    for system in user_systems:
+        system.latest = summary.latest_reading(system)
+        system.stats_24h = stats[system.id]
     return render(request, "dashboard.html", {"systems": user_systems})
 
 
@@ -140,13 +449,18 @@ class MeasurementViewSet(viewsets.ModelViewSet):
     """
     ViewSet do operacji CRUD na modelach Measurement.
     Zezwala tylko na dostęp do pomiarów powiązanych z systemami należącymi do uwierzytelnionego użytkownika.
-    Obsługuje sortowanie według znacznika czasu.
+    Obsługuje filtrowanie (MeasurementFilterBackend), sortowanie według znacznika czasu i stronicowanie kursorowe.
     """
 
     serializer_class = MeasurementSerializer
-    permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [filters.OrderingFilter]
+    authentication_classes = [JWTAuthentication, DeviceKeyAuthentication]
+    permission_classes = [permissions.IsAuthenticated, DeviceIngestOnly]
+    device_actions = ('create', 'bulk')  # Akcje dostępne dla kluczy urządzeń
+    pagination_class = MeasurementCursorPagination
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+    filter_backends = [MeasurementFilterBackend, filters.OrderingFilter]
     ordering_fields = ['timestamp']
+    ordering = ['-timestamp']
 
     def get_queryset(self):
         """
@@ -154,14 +468,215 @@ class MeasurementViewSet(viewsets.ModelViewSet):
         """
         return Measurement.objects.filter(hydroponic_system__owner=self.request.user)
 
-    def perform_create(self, serializer):
+    def _archive_segments(self):
+        """
+        Segmenty archiwum z pomiarami systemów uwierzytelnionego użytkownika.
+        """
+        return MeasurementArchive.objects.filter(hydroponic_system__owner=self.request.user)
+
+    def list(self, request, *args, **kwargs):
+        """
+        Lista pomiarów tylko do odczytu: wiersze z values_list() kodowane przez MEASUREMENT_ROWS, bez instancji
+        modeli i pól MeasurementSerializer (ten obsługuje zapisy i pojedyncze pomiary).
+        Parametr `layout=columns` zwraca w `results` jedną tablicę na pole zamiast listy obiektów.
+        Odpowiedzi są zapisywane w pamięci podręcznej odpowiedzi – dla `?system=<id>` unieważniane przy zmianach
+        tego systemu, bez niego przy zmianach dowolnego systemu użytkownika.
+        """
+        layout = request.query_params.get('layout', 'rows')
+        if layout not in MEASUREMENT_ROWS.LAYOUTS:
+            raise ValidationError({"layout": [f"Dozwolone układy: {', '.join(MEASUREMENT_ROWS.LAYOUTS)}."]})
+
+        system_id = request.query_params.get('system', '')
+        scope = f"system:{system_id}" if system_id.isdigit() else f"user:{request.user.pk}"
+        key, cached = _cached_api_response(request, 'measurements', scope)
+        if cached is not None:
+            return cached
+
+        page = self._recent_page(request, system_id)
+        if page is None:
+            queryset = MEASUREMENT_ROWS.values_list(self.filter_queryset(self.get_queryset()))
+            archived = ArchivedRows(self._archive_segments(), parse_measurement_filters(request.query_params))
+            rows = self.paginator.paginate_queryset(queryset, request, view=self, archived=archived)
+        else:
+            rows = MEASUREMENT_ROWS.from_instances(page)
+        response = self.paginator.get_paginated_response(MEASUREMENT_ROWS.encode(rows, layout))
+        return response_cache.store(key, response)
+
+    def _recent_page(self, request, system_id):
+        """
+        Pierwsza strona pomiarów jednego systemu (`?system=<id>` bez innych filtrów, od najnowszych)
+        jest zwracana z okna ostatnich pomiarów w pamięci współdzielonej, bez zapytania o pomiary.
+        Zwraca None, gdy żądanie nie dotyczy takiej strony albo okno jej nie zawiera.
+        """
+        params = request.query_params
+        recent_only = (
+            system_id.isdigit() and not params.get(self.paginator.cursor_query_param)
+            and self.paginator.is_descending(request)
+            and not has_filters({**parse_measurement_filters(params), 'system': None})
+        )
+        if recent_only and HydroponicSystem.objects.filter(id=system_id, owner=request.user).exists():
+            page = hotwindow.first_page(int(system_id), self.paginator.get_page_size(request))
+            if page is not None:
+                self.paginator.request, self.paginator.page = request, page
+                return page
+        return None
+
+    def get_serializer_class(self):
+        if isinstance(self.request.user, DevicePrincipal):
+            return DeviceMeasurementSerializer
+        return MeasurementSerializer
+
+    def _new_measurement(self, serializer):
+        """
+        Tworzy niezapisany pomiar po sprawdzeniu, czy użytkownik jest właścicielem systemu
+        (albo czy klucz urządzenia jest przypisany do tego systemu – bez zapytania do bazy).
+        """
+        user = self.request.user
+        data = dict(serializer.validated_data)
+        if isinstance(user, DevicePrincipal):
+            system_id = data.pop("hydroponic_system_id", user.hydroponic_system_id)
+            allowed = system_id == user.hydroponic_system_id
+        else:
+            hydroponic_system = data.pop("hydroponic_system")
+            system_id, allowed = hydroponic_system.id, hydroponic_system.owner_id == user.id
+        if not allowed:
+            raise ValidationError(OWNER_MESSAGE)
+        timestamp = data.pop("timestamp", None) or now()
+        return Measurement(hydroponic_system_id=system_id, timestamp=timestamp, **data)
+
+    def create(self, request, *args, **kwargs):
+        """
+        Zapisuje pojedynczy pomiar. W trybie buforowanym potwierdza go po walidacji (202)
+        i zostawia zapis wątkowi bufora; przy pełnym buforze zwraca 503 z nagłówkiem Retry-After.
+        Ponowione wysłanie pomiaru z tym samym kluczem deduplikacji i czasem zwraca zapisany wcześniej pomiar (200).
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        measurement = self._new_measurement(serializer)
+
+        if is_buffered():
+            try:
+                get_buffer().put([measurement])
+            except BufferFull:
+                return Response(
+                    {"detail": "Bufor pomiarów jest pełny, spróbuj ponownie później."},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    headers={"Retry-After": "1"},
+                )
+            record_ingest('api', buffered=1)
+            return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+        created = write_measurements([measurement])
+        record_ingest('api', created=len(created), duplicates=1 - len(created))
+        if created:
+            return Response(self.get_serializer(measurement).data, status=status.HTTP_201_CREATED)
+        # Duplikat – pomiar był już zapisany (np. klient ponowił żądanie po przekroczeniu czasu odpowiedzi)
+        existing = Measurement.objects.filter(
+            hydroponic_system_id=measurement.hydroponic_system_id,
+            dedup_key=measurement.dedup_key,
+            timestamp=measurement.timestamp,
+        ).first()
+        return Response(self.get_serializer(existing or measurement).data, status=status.HTTP_200_OK)
+
+    @action(
+        detail=False, methods=['post'], url_path='bulk',
+        parser_classes=[JSONParser, NDJSONParser, BinaryMeasurementParser],
+    )
+    def bulk(self, request):
+        """
+        Importuje partię pomiarów (tablica JSON, NDJSON lub format binarny) jednym zapisem.
+        Błędne wiersze są raportowane z indeksem i nie przerywają zapisu pozostałych;
+        pominięte duplikaty (ten sam klucz deduplikacji) są tylko liczone.
+        """
+        rows = request.data
+        if not isinstance(rows, (list, MeasurementBatch)):
+            raise ValidationError("Oczekiwano tablicy pomiarów.")
+        if len(rows) > settings.MEASUREMENT_BULK_MAX_ROWS:
+            raise ValidationError(f"Maksymalna liczba pomiarów w jednym żądaniu to {settings.MEASUREMENT_BULK_MAX_ROWS}.")
+
+        if isinstance(rows, MeasurementBatch):
+            source = 'bulk_binary'
+            try:
+                created, errors = binary_ingest(request.user, rows)
+            except PermissionError as exc:
+                record_ingest(source, rejected=len(rows))
+                raise ValidationError({"hydroponic_system": [str(exc)]})
+        else:
+            source = 'bulk_json'
+            created, errors = bulk_ingest(request.user, rows)
+
+        duplicates = len(rows) - len(errors) - len(created)
+        record_ingest(source, created=len(created), duplicates=duplicates, rejected=len(errors))
+        if not errors:
+            response_status = status.HTTP_201_CREATED
+        elif created or duplicates:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+
+        return Response({
+            "created": len(created),
+            "duplicates": duplicates,
+            "failed": len(errors),
+            "ids": [measurement.id for measurement in created],
+            "errors": errors,
+        }, status=response_status)
+
+    @action(detail=False, methods=['get'], url_path='export', content_negotiation_class=IgnoreClientContentNegotiation)
+    def export(self, request):
+        """
+        Strumieniowy eksport pomiarów ze wszystkich systemów użytkownika (CSV lub NDJSON, opcjonalnie gzip).
+        """
+        return _export_measurements(
+            request, self.get_queryset(), self._archive_segments(), f"measurements-{request.user.id}",
+            ordering=('hydroponic_system_id', 'timestamp', 'id'),
+        )
+
+    @action(detail=False, methods=['get'], url_path='buffer', permission_classes=[permissions.IsAdminUser])
+    def buffer(self, request):
         """
-        Sprawdza, czy uwierzytelniony użytkownik jest właścicielem systemu, zanim zapisze pomiar.
+        Liczniki bufora zapisu bieżącego procesu (tylko dla administratorów).
         """
-        hydroponic_system = serializer.validated_data["hydroponic_system"]
-        if hydroponic_system.owner != self.request.user:
-            raise serializers.ValidationError("Nie masz uprawnień do dodawania pomiarów do tego systemu.")
-        serializer.save()
+        stats = get_buffer().stats() if is_buffered() else {}
+        return Response({"mode": settings.MEASUREMENT_INGEST_MODE, **stats})
+
+
+class AlertRuleViewSet(viewsets.ModelViewSet):
+    """
+    ViewSet do operacji CRUD na regułach alertów systemów uwierzytelnionego użytkownika.
+    Opcjonalny parametr `system` zawęża listę do jednego systemu.
+    """
+
+    serializer_class = AlertRuleSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        queryset = AlertRule.objects.filter(hydroponic_system__owner=self.request.user).order_by('id')
+        system_id = self.request.query_params.get('system')
+        if system_id and system_id.isdigit():
+            queryset = queryset.filter(hydroponic_system_id=system_id)
+        return queryset
+
+
+class AlertEventViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    ViewSet tylko do odczytu dla zdarzeń alertów (od najnowszych).
+    Opcjonalny parametr `system` zawęża listę do jednego systemu.
+    """
+
+    serializer_class = AlertEventSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = AlertEventPagination
+
+    def get_queryset(self):
+        queryset = (
+            AlertEvent.objects.filter(hydroponic_system__owner=self.request.user)
+            .select_related('rule')
+        )
+        system_id = self.request.query_params.get('system')
+        if system_id and system_id.isdigit():
+            queryset = queryset.filter(hydroponic_system_id=system_id)
+        return queryset
 
 
 @login_required
@@ -169,25 +684,24 @@ def system_detail_view(request, system_id):
     """
     Widok szczegółów systemu hydroponicznego.
     Obsługuje filtrowanie, paginację i zoptymalizowane zapytania do bazy danych.
+    Strony są zapisywane w pamięci podręcznej odpowiedzi do najbliższej zmiany systemu; wpis zależy też
+    od ciasteczka CSRF, bo strona zawiera token CSRF.
     """
-    system = get_object_or_404(HydroponicSystem.objects.prefetch_related("measurements"), id=system_id)
+    csrf_cookie = request.COOKIES.get(settings.CSRF_COOKIE_NAME)
+    key, cached = None, None
+    if csrf_cookie:  # Bez ciasteczka renderowanie strony musi je ustawić
+        key, cached = response_cache.lookup(request, 'system-detail', [f"system:{system_id}"], [csrf_cookie])
+    if cached is not None:
+        return cached
 
-    # Pobieranie pomiarów dla systemu z optymalizacją zapytań
-    measurements = Measurement.objects.filter(hydroponic_system=system).select_related("hydroponic_system__owner").order_by('-timestamp')
+    system = get_object_or_404(HydroponicSystem, id=system_id)
 
-    # Filtrowanie po dacie
-    start_date = request.GET.get('start_date')
-    end_date = request.GET.get('end_date')
+    # Pobieranie pomiarów dla systemu
+    measurements = Measurement.objects.filter(hydroponic_system=system)
 
-    if start_date:
-        start_date = parse_date(start_date)
-        if start_date:
-            measurements = measurements.filter(timestamp__date__gte=start_date)
-
-    if end_date:
-        end_date = parse_date(end_date)
-        if end_date:
-            measurements = measurements.filter(timestamp__date__lte=end_date)
+    # Filtrowanie po dacie i wartościach
+    measurement_filters = parse_measurement_filters(request.GET)
+    measurements = filter_measurements(measurements, measurement_filters)
 
     # Filtrowanie po typie pomiaru
     show_ph = request.GET.get('show_ph') == 'on'
@@ -197,54 +711,65 @@ def system_detail_view(request, system_id):
     if not (show_ph or show_temperature or show_tds):
         show_ph = show_temperature = show_tds = True
 
-    # Filtrowanie po wartościach
-    filter_type = request.GET.get('filter_type', '')
-    min_value = request.GET.get('min_value')
-    max_value = request.GET.get('max_value')
-
-    try:
-        min_value = float(min_value) if min_value else None
-        max_value = float(max_value) if max_value else None
-
-        if filter_type == 'ph':
-            if min_value: measurements = measurements.filter(ph__gte=min_value)
-            if max_value: measurements = measurements.filter(ph__lte=max_value)
-        elif filter_type == 'temperature':
-            if min_value: measurements = measurements.filter(temperature__gte=min_value)
-            if max_value: measurements = measurements.filter(temperature__lte=max_value)
-        elif filter_type == 'tds':
-            if min_value: measurements = measurements.filter(tds__gte=min_value)
-            if max_value: measurements = measurements.filter(tds__lte=max_value)
-    except ValueError:
-        pass  # Ignorowanie błędów konwersji
-
-    # Paginacja
-    paginator = Paginator(measurements, 10)
-    page = request.GET.get('page', 1)
-
-    try:
-        page = int(page)
-    except ValueError:
-        page = 1  # Domyślnie pierwsza strona, jeśli podano nieprawidłowy numer strony
-
-    measurements = paginator.get_page(page)
+    # Pierwsza strona bez filtrów – z okna ostatnich pomiarów w pamięci współdzielonej, jeśli je zawiera
+    page = None
+    if not request.GET.get('cursor') and not has_filters(measurement_filters):
+        page = hotwindow.first_page(system.id, 10)
+
+    # Paginacja kursorowa – każda strona kosztuje tyle samo, niezależnie od głębokości;
+    # pomiary przeniesione do archiwum kolumnowego są dołączane do stron z ich zakresu czasu
+    if page is None:
+        archived = ArchivedRows(system.archives.all(), measurement_filters)
+        try:
+            page = paginate(measurements, request.GET.get('cursor'), 10, archived=archived)
+        except InvalidCursor:
+            page = paginate(measurements, None, 10, archived=archived)  # Domyślnie pierwsza strona
+    measurements = page
+
+    # Parametry filtrów do odnośników paginacji
+    querystring = request.GET.copy()
+    querystring.pop('cursor', None)
+    querystring.pop('page', None)
+
+    # Nowe pomiary dopisywane są na żywo tylko do pierwszej strony bez filtrów
+    live = not request.GET.get('cursor') and not has_filters(measurement_filters)
 
     # Kontekst dla szablonu
     context = {
         'system': system,
         'measurements': measurements,
-        'start_date': start_date or '',
-        'end_date': end_date or '',
+        'start_date': measurement_filters['start_date'],
+        'end_date': measurement_filters['end_date'],
         'show_ph': show_ph,
         'show_temperature': show_temperature,
         'show_tds': show_tds,
-        'filter_type': filter_type,
-        'min_value': min_value or '',
-        'max_value': max_value or '',
-        'request': request  # Przekazanie requestu do paginacji
+        'filter_type': measurement_filters['filter_type'],
+        'min_value': '' if measurement_filters['min_value'] is None else measurement_filters['min_value'],
+        'max_value': '' if measurement_filters['max_value'] is None else measurement_filters['max_value'],
+        'querystring': querystring.urlencode(),
+        'live': live,
     }
 
-    return render(request, 'system_detail.html', context)
+    return response_cache.store(key, render(request, 'system_detail.html', context))
+
+
+@login_required
+async def system_live_view(request, system_id):
+    """
+    Kanał Server-Sent Events z nowymi pomiarami systemu.
+    Wymaga serwera ASGI – pod WSGI połączenie zajmowałoby wątek roboczy na stałe.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse("Kanał na żywo wymaga serwera ASGI.", status=501)
+
+    user = await request.auser()
+    if not await HydroponicSystem.objects.filter(id=system_id, owner=user).aexists():
+        raise Http404
+
+    response = StreamingHttpResponse(event_stream(system_id), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # Wyłączenie buforowania odpowiedzi w nginx
+    return response
 
 
 @login_required
@@ -268,13 +793,26 @@ def add_sensor(request, system_id):
     system = get_object_or_404(HydroponicSystem, id=system_id, owner=request.user)
 
     # Tworzenie nowego pomiaru z losowymi wartościami
-    measurement = Measurement.objects.create(
+    measurement = Measurement(
         hydroponic_system=system,
         ph=round(random.uniform(5.5, 8.5), 2),
         temperature=round(random.uniform(18, 26), 2),
         tds=random.randint(300, 1500),
         timestamp=now()
     )
+    if is_buffered():
+        try:
+            get_buffer().put([measurement])
+        except BufferFull:
+            response = JsonResponse({"error": "Bufor pomiarów jest pełny, spróbuj ponownie później."}, status=503)
+            response["Retry-After"] = "1"
+            return response
+        record_ingest('sensor', buffered=1)
+    else:
+        with transaction.atomic():
+            measurement.save()
+            after_ingest([measurement])
+        record_ingest('sensor', created=1)
 
     return JsonResponse({
         "message": "Czujnik dodany, wygenerowano pomiary!",
@@ -291,7 +829,8 @@ def add_sensor(request, system_id):
 def delete_system(request, system_id):
     """
     Widok do usuwania systemu hydroponicznego.
+    System jest od razu ukrywany, a jego dane usuwane partiami w tle.
     """
     system = get_object_or_404(HydroponicSystem, id=system_id, owner=request.user)
-    system.delete()
+    purge.soft_delete(system)
     return redirect("dashboard")
\ No newline at end of file
@@ -0,0 +1,26 @@
+"""
+Konfiguracja gunicorn (wczytywana automatycznie z katalogu roboczego).
+Przygotowuje katalog metryk Prometheus wspólny dla procesów roboczych (api/metrics.py).
+"""
+import os
+import shutil
+
+from prometheus_client import multiprocess
+
+
+def on_starting(server):
+    """
+    Czyści metryki poprzedniego uruchomienia – pliki martwych procesów zawyżałyby liczniki.
+    """
+    directory = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory)
+
+
+def child_exit(server, worker):
+    """
+    Usuwa pliki wskaźników (gauge) zakończonego procesu; liczniki i histogramy zostają w sumie.
+    """
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(worker.pid)
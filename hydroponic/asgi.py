@@ -2,6 +2,8 @@
 ASGI config for hydroponic project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+It also serves the live measurement feed (Server-Sent Events), which is
+not available under WSGI.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
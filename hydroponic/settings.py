@@ -5,6 +5,7 @@ Generated by 'django-admin startproject' using Django 5.1.6.
 
 """
 import os
+import tempfile
 from pathlib import Path
 from datetime import timedelta
 
@@ -45,6 +46,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.metrics_middleware',  # Pierwszy – mierzy czas obsługi całego żądania
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -52,6 +54,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.profiling.ProfilingMiddleware',  # Ostatni – profiluje tylko widok wybranych żądań
 ]
 
 ROOT_URLCONF = 'hydroponic.urls'
@@ -89,6 +92,27 @@ DATABASES = {
     }
 }
 
+# Pamięć podręczna (wyniki analiz, statystyki systemów). Pamięć procesu z limitem wpisów
+# wystarczającym dla paneli z setkami systemów; przy wielu procesach można wskazać Redis lub Memcached.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+    # Odpowiedzi endpointów odczytu (api/response_cache.py) – osobny magazyn, żeby nie wypierały statystyk.
+    # Przy wielu procesach roboczych: 'django.core.cache.backends.redis.RedisCache' (LOCATION 'redis://...')
+    # albo 'django.core.cache.backends.filebased.FileBasedCache' (LOCATION – katalog wspólny dla procesów).
+    'responses': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'responses',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+
+RESPONSE_CACHE_ALIAS = 'responses'  # Alias z CACHES dla odpowiedzi endpointów odczytu (None – wyłączone)
+RESPONSE_CACHE_TTL = 60  # Maksymalny czas życia odpowiedzi w sekundach (statystyki 24h starzeją się też bez zapisów)
+RESPONSE_CACHE_MAX_BYTES = 1024 * 1024  # Większe odpowiedzi nie są zapisywane
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -159,3 +183,102 @@ LOGIN_REDIRECT_URL = '/dashboard/'
 
 # Po wylogowaniu użytkownik zostanie przekierowany na stronę login
 LOGOUT_REDIRECT_URL = '/accounts/login/'
+
+# Import pomiarów w partiach (MeasurementViewSet.bulk)
+MEASUREMENT_BULK_MAX_ROWS = 10000  # Maksymalna liczba pomiarów w jednym żądaniu
+MEASUREMENT_BULK_BATCH_SIZE = 1000  # Liczba wierszy w pojedynczym INSERT
+
+# Partycjonowanie tabeli pomiarów (komenda create_measurement_partitions)
+MEASUREMENT_PARTITION_MONTHS_AHEAD = 3  # Na ile miesięcy do przodu tworzyć partycje
+
+# Agregaty pomiarów (minuta / godzina / dzień)
+MEASUREMENT_ROLLUPS_ON_INGEST = True  # Aktualizacja agregatów przy każdym zapisie pomiarów
+ROLLUP_MAX_POINTS = 5000  # Maksymalna liczba przedziałów w odpowiedzi /series/ i /compare/
+COMPARE_MAX_SYSTEMS = 100  # Maksymalna liczba systemów w jednym żądaniu /compare/
+SERIES_MAX_POINTS = 10000  # Maksymalna liczba punktów serii zmniejszanej parametrem ?points=
+SERIES_MAX_RAW_POINTS = 5000000  # Maksymalna liczba surowych pomiarów pobieranych do zmniejszenia serii
+SUMMARY_STATS_CACHE_TTL = 60  # Czas życia statystyk 24 h systemu w pamięci podręcznej (panel, lista systemów; sekundy)
+
+# Stronicowanie kursorowe pomiarów w API
+MEASUREMENT_PAGE_SIZE = 100  # Domyślna liczba pomiarów na stronie
+MEASUREMENT_MAX_PAGE_SIZE = 1000  # Maksymalna wartość parametru page_size
+
+# Eksport pomiarów
+MEASUREMENT_EXPORT_CHUNK_SIZE = 5000  # Liczba wierszy pobieranych z kursora serwera naraz
+
+# Kanał pomiarów na żywo (Server-Sent Events, wymaga ASGI)
+LIVE_QUEUE_SIZE = 100  # Maksymalna liczba zaległych zdarzeń na połączenie
+LIVE_HEARTBEAT_SECONDS = 15  # Odstęp komentarzy podtrzymujących połączenie
+
+# Tryb zapisu pomiarów z API i symulatora czujnika
+MEASUREMENT_INGEST_MODE = 'sync'  # 'sync' – zapis w żądaniu, 'buffered' – potwierdzenie po walidacji i zapis partiami w tle
+MEASUREMENT_BUFFER_MAX_ROWS = 50000  # Pojemność bufora (na proces); po jej przekroczeniu API zwraca 503
+MEASUREMENT_BUFFER_BATCH_SIZE = 1000  # Liczba pomiarów, po której bufor jest zapisywany od razu
+MEASUREMENT_BUFFER_MAX_DELAY = 1.0  # Maksymalny czas oczekiwania pomiaru w buforze (sekundy)
+MEASUREMENT_BUFFER_PUT_TIMEOUT = 0.5  # Jak długo żądanie czeka na miejsce w pełnym buforze (sekundy)
+MEASUREMENT_BUFFER_RETRY_DELAY = 0.5  # Pierwsza przerwa przed ponowieniem zapisu, gdy baza jest niedostępna (sekundy)
+MEASUREMENT_BUFFER_RETRY_MAX_DELAY = 30  # Najdłuższa przerwa między ponowieniami (przerwa rośnie dwukrotnie)
+
+# Walidacja partii binarnych (application/vnd.hydroponic.measurements)
+MEASUREMENT_VALUE_RANGES = {  # Dopuszczalne zakresy wartości (włącznie)
+    'ph': (0, 14),
+    'temperature': (-10, 60),
+    'tds': (0, 10000),
+}
+MEASUREMENT_MAX_CLOCK_SKEW = 300  # O ile sekund czas z urządzenia może wyprzedzać czas serwera
+
+# Klucze urządzeń (nagłówek "Authorization: Device <token>")
+DEVICE_KEY_SECRET = os.getenv('DEVICE_KEY_SECRET', '')  # Klucz podpisu tokenów (pusty – SECRET_KEY)
+DEVICE_KEY_CACHE_SIZE = 10000  # Maksymalna liczba kluczy w pamięci procesu
+DEVICE_KEY_CACHE_TTL = 60  # Po ilu sekundach klucz jest ponownie sprawdzany w bazie (opóźnienie unieważnienia)
+
+# Reguły alertów sprawdzane przy zapisie pomiarów
+ALERTS_ON_INGEST = True  # Sprawdzanie reguł dla każdej zapisanej partii pomiarów
+ALERT_RULE_CACHE_TTL = 30  # Co ile sekund reguły są ponownie wczytywane z bazy
+ALERT_HOOKS = []  # Ścieżki funkcji wywoływanych z listą nowych zdarzeń AlertEvent (po zatwierdzeniu zapisu)
+
+# Analiza pomiarów (/api/hydroponic-systems/{id}/analytics/)
+ANALYTICS_MAX_POINTS = 2000000  # Maksymalna liczba pomiarów w analizowanym zakresie
+ANALYTICS_MAX_SERIES_POINTS = 5000  # Maksymalna liczba punktów serii w odpowiedzi (co k-ty pomiar)
+ANALYTICS_MAX_ANOMALIES = 1000  # Maksymalna liczba zwracanych anomalii na wartość
+ANALYTICS_CACHE_TTL = 600  # Czas życia wyniku w pamięci podręcznej (sekundy)
+
+# Okres przechowywania surowych pomiarów (komenda enforce_retention)
+MEASUREMENT_RAW_RETENTION_DAYS = None  # Domyślny okres w dniach dla systemów bez własnego (None – bez limitu)
+MEASUREMENT_RETENTION_BATCH_SIZE = 10000  # Szerokość zakresu identyfikatorów usuwanego w jednej transakcji
+MEASUREMENT_RETENTION_SLEEP = 0.1  # Przerwa między transakcjami (sekundy)
+
+# Archiwum kolumnowe starych pomiarów (komenda archive_measurements, api/archive.py)
+# Katalog plików archiwum (None – archiwum wyłączone). Przeniesione pomiary są usuwane z bazy, więc musi to być trwały
+# wolumen, dostępny dla wszystkich serwerów i objęty kopią zapasową razem z bazą – nie system plików kontenera
+MEASUREMENT_ARCHIVE_ROOT = os.getenv('MEASUREMENT_ARCHIVE_ROOT') or None
+MEASUREMENT_ARCHIVE_AFTER_DAYS = 90  # Pomiary starsze niż tyle dni są przenoszone do archiwum
+MEASUREMENT_ARCHIVE_OPEN_SEGMENTS = 64  # Liczba segmentów mapowanych do pamięci naraz (na proces)
+
+# Usuwanie systemów (oznaczenie w żądaniu, dane usuwane partiami)
+SYSTEM_PURGE_IN_BACKGROUND = True  # Usuwanie danych w wątku w tle zaraz po oznaczeniu (inaczej: komenda purge_deleted_systems)
+SYSTEM_PURGE_BATCH_SIZE = 5000  # Liczba wierszy usuwanych w jednej transakcji
+SYSTEM_PURGE_SLEEP = 0.05  # Przerwa między transakcjami (sekundy)
+
+# Okno ostatnich pomiarów w pamięci współdzielonej procesów węzła (api/hotwindow.py)
+HOT_WINDOW_PATH = os.path.join(
+    '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(), 'hydroponic-hot-window'
+)  # Plik mapowany do pamięci (None – wyłączone, np. gdy zapisy i odczyty obsługuje kilka węzłów)
+HOT_WINDOW_SYSTEMS = 4096  # Liczba slotów (systemy o identyfikatorach różniących się o wielokrotność dzielą slot)
+HOT_WINDOW_SIZE = 256  # Liczba ostatnich pomiarów przechowywanych dla systemu
+
+# Panel administracyjny dużych tabel (api/admin.py)
+ADMIN_EXACT_COUNT_LIMIT = 10000  # Poniżej tylu wierszy (szacunek planisty) liczba wyników jest liczona dokładnie
+ADMIN_KEYSET_WINDOW = 3600  # Początkowa szerokość zakresu czasu czytanego dla strony pomiarów (sekundy)
+ADMIN_TIME_BOUNDS_CACHE_TTL = 300  # Czas życia zakresu czasu pomiarów (filtr okresu, stronicowanie; sekundy)
+
+# Profilowanie wybranych żądań (api/profiling.py, komendy list_profiles i create_profiling_token)
+PROFILING_DIR = os.path.join(BASE_DIR, 'profiles')  # Katalog zapisów profili (None – middleware wyłączony)
+PROFILING_SAMPLE_RATE = 0.0  # Ułamek żądań profilowanych losowo (0 – tylko nagłówek X-Profile lub ciasteczko administratora)
+PROFILING_MAX_CAPTURES = 200  # Liczba przechowywanych zapisów; starsze są usuwane
+PROFILING_TOKEN_MAX_AGE = 3600  # Ważność tokenu nagłówka X-Profile (sekundy)
+
+# Metryki Prometheus pod adresem /metrics (api/metrics.py); przy wielu procesach gunicorn
+# ustaw zmienną środowiskową PROMETHEUS_MULTIPROC_DIR (patrz gunicorn.conf.py)
+METRICS_ENABLED = True  # False – bez pomiarów, /metrics zwraca 404
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']  # Adresy z dostępem do /metrics bez logowania (administratorzy mają go zawsze)
@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth import views as auth_views
 from django.urls import path, include
+from api.metrics import metrics_view
 from api.views import register_view, dashboard_view 
 
 urlpatterns = [
@@ -17,4 +18,7 @@ urlpatterns = [
 
     # Dashboard użytkownika
     path("dashboard/", dashboard_view, name="dashboard"),
+
+    # Metryki Prometheus
+    path("metrics", metrics_view, name="metrics"),
 ]